@@ -0,0 +1,59 @@
+"""
+Micro-benchmarks for the bit and word codecs of the modbus module
+with maximum sized frames (2000 bits and 125 registers) compared to
+the former per-element implementations.
+
+Usage:
+    python benchmarks/bench_codecs.py
+"""
+import random
+import timeit
+from pyhoff.modbus import _get_bits, _get_words, _from_bits, _from_words, \
+    _get_bits_packed, _get_words_array, _from_bits_packed
+
+
+def legacy_get_bits(data: bytes, bit_number: int) -> list[bool]:
+    return [bool(data[i // 8] >> (i % 8) & 0x01)
+            for i in range(bit_number)]
+
+
+def legacy_get_words(data: bytes) -> list[int]:
+    return [(data[i * 2] << 8) + data[i * 2 + 1]
+            for i in range(len(data) // 2)]
+
+
+def legacy_from_bits(values: list[bool]) -> bytes:
+    return bytes(sum(((1 << j) * bool(values[8 * i + j]))
+                     for j in range(8)) for i in range(len(values) // 8))
+
+
+def legacy_from_words(values: list[int]) -> bytes:
+    return b''.join(word.to_bytes(2, byteorder='big') for word in values)
+
+
+def main() -> None:
+    bit_data = random.randbytes(250)
+    bit_values = _get_bits(bit_data, 2000)
+    word_data = random.randbytes(250)
+    word_values = _get_words(word_data)
+
+    cases = [
+        ('get_bits 2000', lambda: legacy_get_bits(bit_data, 2000), lambda: _get_bits(bit_data, 2000)),
+        ('get_bits_packed 2000', None, lambda: _get_bits_packed(bit_data, 2000)),
+        ('from_bits 2000', lambda: legacy_from_bits(bit_values), lambda: _from_bits(bit_values)),
+        ('from_bits_packed 2000', None, lambda: _from_bits_packed(0, 2000)),
+        ('get_words 125', lambda: legacy_get_words(word_data), lambda: _get_words(word_data)),
+        ('get_words_array 125', None, lambda: _get_words_array(word_data)),
+        ('from_words 125', lambda: legacy_from_words(word_values), lambda: _from_words(word_values)),
+    ]
+
+    number = 2000
+    print(f"{'codec':24}{'before (us)':>12}{'after (us)':>12}")
+    for name, before, after in cases:
+        t_before = min(timeit.repeat(before, number=number, repeat=5)) / number * 1e6 if before else float('nan')
+        t_after = min(timeit.repeat(after, number=number, repeat=5)) / number * 1e6
+        print(f"{name:24}{t_before:12.2f}{t_after:12.2f}")
+
+
+if __name__ == '__main__':
+    main()
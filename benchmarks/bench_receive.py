@@ -0,0 +1,117 @@
+"""
+Benchmark for the receive path of SimpleModbusClient: counts socket
+calls and the peak of allocated memory per read_input_registers
+transaction for the current implementation and the former bytes
+based one.
+
+Usage:
+    python benchmarks/bench_receive.py
+"""
+import socket
+import struct
+import time
+import tracemalloc
+from pyhoff.modbus import SimpleModbusClient
+
+
+class FakeSocket:
+    """
+    Socket pair end that answers read input register requests
+    by the peer end and counts the recv calls
+    """
+
+    def __init__(self) -> None:
+        self.socket, self.peer = socket.socketpair()
+        self.recv_calls = 0
+
+    def sendall(self, data: bytes) -> None:
+        transaction_id, _, _, unit_id, function_code, _, count = struct.unpack('>HHHBBHH', data)
+        self.peer.sendall(struct.pack('>HHHBBB', transaction_id, 0, count * 2 + 3,
+                                      unit_id, function_code, count * 2) + bytes(count * 2))
+
+    def recv(self, number_of_bytes: int) -> bytes:
+        self.recv_calls += 1
+        return self.socket.recv(number_of_bytes)
+
+    def recv_into(self, buffer: memoryview, number_of_bytes: int = 0) -> int:
+        self.recv_calls += 1
+        return self.socket.recv_into(buffer, number_of_bytes)
+
+    def close(self) -> None:
+        self.socket.close()
+        self.peer.close()
+
+
+class LegacyClient(SimpleModbusClient):
+    """
+    Client with the former receive path: growing bytes buffer
+    and separate recv calls for header and payload
+    """
+
+    def _recv_bytes(self, number_of_bytes: int) -> bytes:
+        if not self._socket:
+            return bytes()
+
+        buffer = bytes()
+        while len(buffer) < number_of_bytes:
+            try:
+                tx_data = self._socket.recv(number_of_bytes - len(buffer))
+            except socket.error:
+                return bytes()
+
+            if tx_data:
+                buffer += tx_data
+            else:
+                return bytes()
+
+        return buffer
+
+    def _receive_frame(self) -> tuple[int, bytes]:  # type: ignore[override]
+        header = self._recv_bytes(7)
+        if not header:
+            return 0, self.close()
+
+        transaction_id, protocol_identifier, length, unit_id = struct.unpack('>HHHB', header)
+        return transaction_id, self._recv_bytes(length - 1)
+
+
+def run(client: SimpleModbusClient, transactions: int, word_lengths: int) -> dict[str, float]:
+    fake_socket = FakeSocket()
+    client._socket = fake_socket  # type: ignore
+
+    client.read_input_registers(0, word_lengths)  # warm up
+
+    # peak memory of the receive path of a single transaction,
+    # the response is queued before to exclude the send path
+    fake_socket.sendall(struct.pack('>HHHBBHH', client._transaction_id + 1, 0, 6, 1, 4, 0, word_lengths))
+    client._send = lambda data: len(data)  # type: ignore
+    tracemalloc.start()
+    client.read_input_registers(0, word_lengths)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del client._send
+
+    fake_socket.recv_calls = 0
+    start = time.perf_counter()
+    for _ in range(transactions):
+        client.read_input_registers(0, word_lengths)
+    duration = time.perf_counter() - start
+    fake_socket.close()
+
+    return {'recv calls': fake_socket.recv_calls / transactions,
+            'peak allocated bytes': peak,
+            'us per transaction': duration / transactions * 1e6}
+
+
+def main() -> None:
+    transactions = 10000
+    for word_lengths in (1, 125):
+        for name, client in (('before', LegacyClient('localhost')),
+                             ('after', SimpleModbusClient('localhost'))):
+            result = run(client, transactions, word_lengths)
+            print(f"{word_lengths:3} registers, {name:6}: " +
+                  ', '.join(f"{k}: {v:.2f}" for k, v in result.items()))
+
+
+if __name__ == '__main__':
+    main()
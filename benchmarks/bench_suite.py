@@ -0,0 +1,213 @@
+"""
+Benchmark suite for the hot paths of pyhoff. Runs offline against the
+simulator of pyhoff.simulator in a separate process and reports for
+each case the latency (mean, p50, p99 in us), the throughput and the
+memory blocks and bytes allocated per operation. Allocations are
+counted as the net growth of the traced memory over all calls divided
+by the number of calls, so they can be compared between runs; memory
+freed within the same call is not counted.
+
+Results can be stored as JSON baseline and compared with a later run;
+cases with a median latency above the baseline by more than the
+threshold are listed as regressions and the exit code is 1.
+
+Usage:
+    python benchmarks/bench_suite.py [--number N] [--save baseline.json]
+    python benchmarks/bench_suite.py --compare baseline.json [--threshold 0.2]
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from multiprocessing.connection import Connection
+from typing import Any, Callable
+from pyhoff import BusTerminal
+from pyhoff.devices import BK9050, KL1104, KL2404, KL3202, KL4002
+from pyhoff.modbus import OfflineModbusClient, SimpleModbusClient
+from pyhoff.simulator import Simulator
+
+SCAN_TERMINALS: list[type[BusTerminal]] = [KL1104, KL2404, KL3202, KL4002] * 5
+
+
+def measure(function: Callable[[], Any], number: int) -> dict[str, float]:
+    """
+    Measure latency, throughput and allocations per call of a function
+    """
+    for _ in range(min(number, 100)):
+        function()  # warm up
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(number):
+        function()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    statistics_diff = after.compare_to(before, 'filename')
+    alloc_blocks = sum(stat.count_diff for stat in statistics_diff) / number
+    alloc_bytes = sum(stat.size_diff for stat in statistics_diff) / number
+
+    samples: list[int] = []
+    for _ in range(number):
+        start = time.perf_counter_ns()
+        function()
+        samples.append(time.perf_counter_ns() - start)
+
+    samples.sort()
+    mean = statistics.fmean(samples) / 1000
+    return {'mean_us': mean,
+            'p50_us': samples[len(samples) // 2] / 1000,
+            'p99_us': samples[min(len(samples) - 1, len(samples) * 99 // 100)] / 1000,
+            'ops_per_s': 1e6 / mean if mean else 0.0,
+            'alloc_blocks_per_op': alloc_blocks,
+            'alloc_bytes_per_op': alloc_bytes}
+
+
+def measure_import(number: int) -> dict[str, float]:
+    """
+    Measure the time of importing pyhoff.devices in a fresh interpreter
+    """
+    code = ('import time; t = time.perf_counter_ns(); import pyhoff.devices; '
+            'print(time.perf_counter_ns() - t)')
+    samples = sorted(int(subprocess.check_output([sys.executable, '-c', code]))
+                     for _ in range(number))
+    mean = statistics.fmean(samples) / 1000
+    return {'mean_us': mean,
+            'p50_us': samples[len(samples) // 2] / 1000,
+            'p99_us': samples[-1] / 1000,
+            'ops_per_s': 1e6 / mean,
+            'alloc_blocks_per_op': 0.0,
+            'alloc_bytes_per_op': 0.0}
+
+
+def serve(connection: Connection) -> None:
+    """
+    Run the simulator until a message is received
+    """
+    with Simulator() as sim:
+        coupler = sim.add_coupler(BK9050, SCAN_TERMINALS)
+        connection.send(coupler.port)
+        connection.recv()
+
+
+def run(number: int) -> dict[str, dict[str, float]]:
+    results: dict[str, dict[str, float]] = dict()
+
+    # separate process, so that the server neither competes for
+    # the GIL nor shows up in the allocation measurement
+    connection, child_connection = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=serve, args=(child_connection,), daemon=True)
+    server.start()
+    try:
+        bk = BK9050('127.0.0.1', connection.recv(), timeout=5)
+        bk.add_bus_terminals(SCAN_TERMINALS)
+        client: SimpleModbusClient = bk.modbus
+
+        cases: dict[str, Callable[[], Any]] = {
+            'client.read_coils': lambda: client.read_coils(0, 16),
+            'client.read_discrete_inputs': lambda: client.read_discrete_inputs(0, 16),
+            'client.read_holding_registers': lambda: client.read_holding_registers(0x0800, 16),
+            'client.read_input_registers': lambda: client.read_input_registers(0, 40),
+            'client.write_single_coil': lambda: client.write_single_coil(1, True),
+            'client.write_single_register': lambda: client.write_single_register(0x0801, 1234),
+            'client.write_multiple_coils': lambda: client.write_multiple_coils(0, [True, False] * 8),
+            'client.write_multiple_registers': lambda: client.write_multiple_registers(0x0800, [1, 2, 3, 4]),
+            'client.read_write_multiple_registers':
+                lambda: client.read_write_multiple_registers(0, 40, 0x0800, [1, 2, 3, 4]),
+            'terminal.read_temperature': lambda: bk.select(KL3202).read_temperature(1),
+            'terminal.write_coil': lambda: bk.select(KL2404).write_coil(1, True),
+            'terminal.set_voltage': lambda: bk.select(KL4002).set_voltage(1, 5.0),
+            'coupler.scan': lambda: scan(bk.bus_terminals),
+            'coupler.select': lambda: bk.select(KL3202, 4),
+        }
+
+        for name, function in cases.items():
+            results[name] = measure(function, number)
+
+        client.close()
+    finally:
+        connection.send(None)
+        server.join()
+
+    large_layout = [KL1104, KL2404, KL3202, KL4002] * 250
+    results['coupler.add_bus_terminals_1000'] = measure(
+        lambda: BK9050('benchmark', modbus=OfflineModbusClient()).add_bus_terminals(large_layout),
+        max(number // 100, 10))
+    results['import pyhoff.devices'] = measure_import(max(number // 200, 5))
+
+    return results
+
+
+def scan(terminals: list[BusTerminal]) -> None:
+    """
+    Read all inputs of a bus coupler channel by channel
+    """
+    for terminal in terminals:
+        if isinstance(terminal, KL1104):
+            for channel in range(1, 5):
+                terminal.read_input(channel)
+        elif isinstance(terminal, KL3202):
+            for channel in range(1, 3):
+                terminal.read_temperature(channel)
+
+
+def compare(results: dict[str, dict[str, float]], baseline: dict[str, Any], threshold: float) -> bool:
+    """
+    Print the change of the median latency relative to a baseline
+
+    Returns:
+        True if no case is slower than the baseline by more than threshold
+    """
+    ok = True
+    print(f"{'case':40}{'baseline p50 us':>16}{'p50 us':>10}{'change':>10}")
+    for name, result in results.items():
+        reference = baseline['results'].get(name)
+        if not reference:
+            print(f"{name:40}{'':>16}{result['p50_us']:10.2f}{'new':>10}")
+            continue
+        change = result['p50_us'] / reference['p50_us'] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            ok = False
+        print(f"{name:40}{reference['p50_us']:16.2f}{result['p50_us']:10.2f}{change:+10.1%}{flag}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=2000, help='iterations per case')
+    parser.add_argument('--save', help='store the results as JSON baseline')
+    parser.add_argument('--compare', help='compare with a JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative slow down that counts as regression')
+    args = parser.parse_args()
+
+    results = run(args.number)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        ok = compare(results, baseline, args.threshold)
+    else:
+        ok = True
+        print(f"{'case':40}{'mean us':>10}{'p50 us':>10}{'p99 us':>10}{'ops/s':>10}"
+              f"{'blocks/op':>10}{'B/op':>10}")
+        for name, r in results.items():
+            print(f"{name:40}{r['mean_us']:10.2f}{r['p50_us']:10.2f}{r['p99_us']:10.2f}"
+                  f"{r['ops_per_s']:10.0f}{r['alloc_blocks_per_op']:10.2f}{r['alloc_bytes_per_op']:10.1f}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': sys.version, 'platform': platform.platform(),
+                       'number': args.number, 'results': results}, f, indent=2)
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
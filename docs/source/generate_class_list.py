@@ -64,5 +64,23 @@ if __name__ == "__main__":
         write_classes(f, ['*Terminal*'], 'pyhoff.devices', title='Generic bus terminals')
         write_classes(f, ['*'], 'pyhoff', title='Base classes',
                       description='These classes are base classes for devices and are typically not used directly.')
+        write_classes(f, ['*'], 'pyhoff.aio', title='Asyncio',
+                      description='These classes provide the bus coupler and modbus functions for asyncio.')
+        write_classes(f, ['*'], 'pyhoff.pool', title='Connection pool',
+                      description='Shared modbus connections for bus couplers with limited connection slots.')
+        write_classes(f, ['*'], 'pyhoff.poller', title='Poller',
+                      description='Single thread polling of many modbus connections.')
+        write_classes(f, ['*'], 'pyhoff.stats', title='Metrics',
+                      description='Transaction metrics of modbus connections.')
+        write_classes(f, ['*'], 'pyhoff.trace', title='Wire trace',
+                      description='Recording of transmitted and received modbus frames.')
+        write_classes(f, ['*'], 'pyhoff.replay', title='Replay',
+                      description='Offline replay of recorded modbus traffic.')
+        write_classes(f, ['*'], 'pyhoff.simulator', title='Simulator',
+                      description='Simulated bus couplers for tests without hardware.')
+        write_classes(f, ['*'], 'pyhoff.threaded', title='Thread-safe client',
+                      description='Modbus client for concurrent callers with a dedicated I/O thread.')
+        write_classes(f, ['*'], 'pyhoff.scan', title='Scan engine',
+                      description='Cyclic reading of inputs and writing of outputs like a PLC task.')
         write_classes(f, ['*'], 'pyhoff.modbus', title='Modbus',
                       description='This modbus implementation is used internally.')
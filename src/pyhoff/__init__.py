@@ -1,7 +1,65 @@
-from .modbus import SimpleModbusClient
-from typing import Iterable, TypeVar
+import copy
+import time
+from array import array
+from collections import deque
+from .modbus import SimpleModbusClient, _get_bits
+from typing import Callable, Iterable, NamedTuple, TypeVar, cast
 
 _BT = TypeVar('_BT', bound='BusTerminal')
+_V = TypeVar('_V')
+
+# ModBus limits of write_multiple_coils and write_multiple_registers
+_MAX_WRITE_BITS = 1968
+_MAX_WRITE_WORDS = 123
+
+
+def _merge_runs(addresses: Iterable[int], values: dict[int, _V], max_count: int) -> list[tuple[int, list[_V]]]:
+    """
+    Group addresses to runs of consecutive addresses. Gaps between two
+    runs are bridged if the values of all addresses in the gap are known.
+
+    Args:
+        addresses: addresses to group
+        values: values by address, must contain all addresses
+        max_count: maximum number of values per run
+
+    Returns:
+        List of (first address, values) tuples in address order
+    """
+    runs: list[tuple[int, list[_V]]] = []
+    for address in sorted(addresses):
+        if runs:
+            first, run = runs[-1]
+            end = first + len(run)
+            if address - first < max_count and all(a in values for a in range(end, address)):
+                run.extend(values[a] for a in range(end, address + 1))
+                continue
+        runs.append((address, [values[address]]))
+    return runs
+
+
+def _record_writes(written_values: dict[int, _V], dirty: set[int], address: int,
+                   values: list[_V], written: bool) -> None:
+    """
+    Record the result of writing outputs starting at address in the output
+    shadow image. The value of failed writes on the bus coupler is unknown,
+    they are repeated by the next flush.
+
+    Args:
+        written_values: values last written by address
+        dirty: addresses of outputs to write by the next flush
+        address: address of the first output
+        values: written values
+        written: True if the write succeeded
+    """
+    addresses = range(address, address + len(values))
+    if written:
+        written_values.update(zip(addresses, values))
+        dirty.difference_update(addresses)
+    else:
+        for a in addresses:
+            written_values.pop(a, None)
+        dirty.update(addresses)
 
 
 def _is_bus_terminal(bt_type: type['BusTerminal']) -> bool:
@@ -16,7 +74,8 @@ class BusTerminal():
     Base class for all bus terminals.
 
     Attributes:
-        bus_coupler: The bus coupler to which this terminal is connected.
+        bus_coupler: The bus coupler to which this terminal is connected,
+            or the process image for terminals of a `ProcessImage`.
         parameters: The parameters of the terminal.
     """
     parameters: dict[str, int] = {}
@@ -37,7 +96,7 @@ class BusTerminal():
             output_word_addresses: List of addresses of output words.
             input_word_addresses: List of addresses of input words.
         """
-        self.bus_coupler = bus_coupler
+        self.bus_coupler: BusCoupler | ProcessImage = bus_coupler
         self._output_bit_addresses = output_bit_addresses
         self._input_bit_addresses = input_bit_addresses
         self._output_word_addresses = output_word_addresses
@@ -59,10 +118,13 @@ class BusTerminal():
         Returns:
             The selected bus terminal instance.
         """
-        terminal_list = [bt for bt in bus_coupler.bus_terminals if isinstance(bt, cls)]
+        terminal_list = bus_coupler._selections.get(cls)
+        if terminal_list is None:
+            terminal_list = bus_coupler._selections[cls] = [bt for bt in bus_coupler.bus_terminals
+                                                            if isinstance(bt, cls)]
         assert terminal_list, f"No instance of {cls.__name__} configured at this BusCoupler"
         assert 0 <= terminal_number < len(terminal_list), f"Out of range, select in range: 0..{len(terminal_list) - 1}"
-        return terminal_list[terminal_number]
+        return cast(_BT, terminal_list[terminal_number])
 
 
 class DigitalInputTerminal(BusTerminal):
@@ -84,7 +146,7 @@ class DigitalInputTerminal(BusTerminal):
         """
         if channel < 1 or channel > self.parameters['input_bit_width']:
             raise Exception("address out of range")
-        return self.bus_coupler.modbus.read_discrete_input(self._input_bit_addresses[channel - 1])
+        return self.bus_coupler._read_input_bit(self._input_bit_addresses[channel - 1])
 
 
 class DigitalOutputTerminal(BusTerminal):
@@ -107,7 +169,7 @@ class DigitalOutputTerminal(BusTerminal):
         """
         if channel < 1 or channel > self.parameters['output_bit_width']:
             raise Exception("address out of range")
-        return self.bus_coupler.modbus.write_single_coil(self._output_bit_addresses[channel - 1], value)
+        return self.bus_coupler._write_output_bit(self._output_bit_addresses[channel - 1], value)
 
     def read_coil(self, channel: int) -> bool | None:
         """
@@ -124,7 +186,7 @@ class DigitalOutputTerminal(BusTerminal):
         """
         if channel < 1 or channel > self.parameters['output_bit_width']:
             raise Exception("address out of range")
-        return self.bus_coupler.modbus.read_coil(self._output_bit_addresses[channel - 1])
+        return self.bus_coupler._read_output_bit(self._output_bit_addresses[channel - 1])
 
 
 class AnalogInputTerminal(BusTerminal):
@@ -148,9 +210,9 @@ class AnalogInputTerminal(BusTerminal):
         assert 1 <= channel <= self.parameters['input_word_width'], \
             f"channel out of range, must be between {1} and {self.parameters['input_word_width']}"
 
-        value = self.bus_coupler.modbus.read_input_registers(self._input_word_addresses[channel - 1], 1)
+        value = self.bus_coupler._read_input_word(self._input_word_addresses[channel - 1])
 
-        return value[0] if value else error_value
+        return error_value if value is None else value
 
     def read_normalized(self, channel: int) -> float:
         """
@@ -187,9 +249,9 @@ class AnalogOutputTerminal(BusTerminal):
         assert 1 <= channel <= self.parameters['output_word_width'], \
             f"channel out of range, must be between {1} and {self.parameters['output_word_width']}"
 
-        value = self.bus_coupler.modbus.read_holding_registers(self._output_word_addresses[channel - 1], 1)
+        value = self.bus_coupler._read_output_word(self._output_word_addresses[channel - 1])
 
-        return value[0] if value else error_value
+        return error_value if value is None else value
 
     def write_channel_word(self, channel: int, value: int) -> bool:
         """
@@ -207,7 +269,7 @@ class AnalogOutputTerminal(BusTerminal):
         assert 1 <= channel <= self.parameters['output_word_width'], \
             f"channel out of range, must be between {1} and {self.parameters['output_word_width']}"
 
-        return self.bus_coupler.modbus.write_single_register(self._output_word_addresses[channel - 1], value)
+        return self.bus_coupler._write_output_word(self._output_word_addresses[channel - 1], value)
 
     def set_normalized(self, channel: int, value: float) -> bool:
         """
@@ -223,6 +285,31 @@ class AnalogOutputTerminal(BusTerminal):
         return self.write_channel_word(channel, int(value * 0x7FFF))
 
 
+class Channel(NamedTuple):
+    """
+    Channel of a bus terminal, returned by `BusCoupler.tag` and `BusCoupler.channel`
+    """
+    terminal: BusTerminal
+    """The bus terminal"""
+    channel: int
+    """Channel number (1 based index)"""
+
+
+class InputEvent(NamedTuple):
+    """
+    Change of a digital input detected by `BusCoupler.poll_inputs`
+    or `BusCoupler.read_process_image`
+    """
+    timestamp: float
+    """Monotonic time of the read that detected the change"""
+    terminal: DigitalInputTerminal
+    """Terminal of the input"""
+    channel: int
+    """Channel number (1 based index)"""
+    value: bool
+    """New value, True for a rising edge"""
+
+
 class BusCoupler():
     """
     Base class for ModBus TCP bus coupler
@@ -231,10 +318,20 @@ class BusCoupler():
         bus_terminals (list[BusTerminal]): A list of bus terminal classes according to the
             connected terminals.
         modbus (SimpleModbusClient): The underlying modbus client used for the connection.
+        buffer_outputs (bool): If True, output writes of the bus terminals only update
+            the output shadow image and are sent by `flush_outputs`. Default is False.
+        events (deque[InputEvent]): Sequence of events log with the most recent
+            changes of digital inputs, oldest first; bounded to 1000 events by
+            default, replace it by a deque with another maxlen to change this.
+        input_bit_addresses (array[int]): Addresses of all input bits in terminal order.
+        output_bit_addresses (array[int]): Addresses of all output bits in terminal order.
+        input_word_addresses (array[int]): Addresses of all input words in terminal order.
+        output_word_addresses (array[int]): Addresses of all output words in terminal order.
     """
 
     def __init__(self, host: str, port: int = 502, bus_terminals: Iterable[type[BusTerminal]] = [],
-                 timeout: float = 5, watchdog: float = 0, debug: bool = False):
+                 timeout: float = 5, watchdog: float = 0, debug: bool = False,
+                 modbus: SimpleModbusClient | None = None):
         """
         Instantiate a new bus coupler base class.
 
@@ -248,6 +345,8 @@ class BusCoupler():
             watchdog: time in seconds after the device sets all outputs to
                 default state. A value of 0 deactivates the watchdog.
             debug: If True, debug information is printed.
+            modbus: existing modbus client to use instead of creating a
+                new one; host, port, timeout and debug are ignored in this case
 
         Examples:
             >>> from pyhoff.devices import *
@@ -265,13 +364,43 @@ class BusCoupler():
         self._channel_spacing = 1
         self._channel_offset = 0
         self._mixed_mapping = True
-        self.modbus = SimpleModbusClient(host, port, timeout=timeout, debug=debug)
+        self._read_write_supported = True
+        self.modbus = modbus or SimpleModbusClient(host, port, timeout=timeout, debug=debug)
+        self.buffer_outputs = False
+        self._output_bits: dict[int, bool] = dict()
+        self._output_words: dict[int, int] = dict()
+        self._written_bits: dict[int, bool] = dict()
+        self._written_words: dict[int, int] = dict()
+        self._dirty_bits: set[int] = set()
+        self._dirty_words: set[int] = set()
+        self.events: deque[InputEvent] = deque(maxlen=1000)
+        self._input_channels: dict[int, tuple[DigitalInputTerminal, int]] = dict()
+        self._input_subscriptions: dict[int, list[tuple[Callable[[InputEvent], None], bool, bool]]] = dict()
+        self._input_image: tuple[int, int, int] | None = None
+        self._selections: dict[type[BusTerminal], list[BusTerminal]] = dict()
+        self._tags: dict[str, tuple[int, int]] = dict()
+        self.input_bit_addresses = array('H')
+        self.output_bit_addresses = array('H')
+        self.input_word_addresses = array('H')
+        self.output_word_addresses = array('H')
+        self._input_bit_range = (0, 0)
+        self._input_word_range = (0, 0)
 
         self.add_bus_terminals(bus_terminals)
         self._init_hardware(watchdog)
 
     def _init_hardware(self, watchdog: float) -> None:
-        pass
+        for address, value in self._init_registers(watchdog):
+            self.modbus.write_single_register(address, value)
+
+    def _init_registers(self, watchdog: float) -> list[tuple[int, int]]:
+        """
+        Registers written to initialize the bus coupler hardware
+
+        Returns:
+            List of (register address, value) tuples in write order
+        """
+        return []
 
     def add_bus_terminals(self, *new_bus_terminals: type[BusTerminal] | Iterable[type[BusTerminal]]) -> list[BusTerminal]:
         """
@@ -323,6 +452,20 @@ class BusCoupler():
             self._next_input_word_offset += input_word_width * self._channel_spacing
 
             self.bus_terminals.append(new_terminal)
+            if isinstance(new_terminal, DigitalInputTerminal):
+                for i, address in enumerate(new_terminal._input_bit_addresses):
+                    self._input_channels[address] = (new_terminal, i + 1)
+
+            self.input_bit_addresses.extend(new_terminal._input_bit_addresses)
+            self.output_bit_addresses.extend(new_terminal._output_bit_addresses)
+            self.input_word_addresses.extend(new_terminal._input_word_addresses)
+            self.output_word_addresses.extend(new_terminal._output_word_addresses)
+
+        self._selections.clear()
+        if self.input_bit_addresses:
+            self._input_bit_range = (min(self.input_bit_addresses), max(self.input_bit_addresses) + 1)
+        if self.input_word_addresses:
+            self._input_word_range = (min(self.input_word_addresses), max(self.input_word_addresses) + 1)
 
         return self.bus_terminals
 
@@ -348,6 +491,452 @@ class BusCoupler():
         """
         return bus_terminal_type.select(self, terminal_number)
 
+    def channel(self, bus_terminal_type: type[BusTerminal], terminal_number: int, channel: int) -> Channel:
+        """
+        Returns a channel of the n-th bus terminal of the given type. The
+        selection is cached, so the lookup takes constant time.
+
+        Args:
+            bus_terminal_type: The bus terminal class to select from.
+            terminal_number: The index of the bus terminal, see `select`.
+            channel: The channel number (1 based index).
+
+        Returns:
+            The terminal and channel number.
+        """
+        terminal = bus_terminal_type.select(self, terminal_number)
+        parameters = terminal.parameters
+        assert 1 <= channel <= max(parameters.get('input_bit_width', 0), parameters.get('output_bit_width', 0),
+                                   parameters.get('input_word_width', 0), parameters.get('output_word_width', 0)), \
+            'channel out of range'
+        return Channel(terminal, channel)
+
+    def add_tag(self, name: str, bus_terminal_type: type[BusTerminal], terminal_number: int, channel: int) -> Channel:
+        """
+        Add a name for a channel of a bus terminal. The name is
+        resolved once, looking it up by `tag` takes constant time.
+
+        Args:
+            name: The tag name, e.g. 'boiler.temp'.
+            bus_terminal_type: The bus terminal class to select from.
+            terminal_number: The index of the bus terminal, see `select`.
+            channel: The channel number (1 based index).
+
+        Returns:
+            The terminal and channel number.
+
+        Example:
+            >>> from pyhoff.devices import *
+            >>> bk = BK9050("172.16.17.1", bus_terminals=[KL3202, KL3202])
+            >>> bk.add_tag('boiler.temp', KL3202, 1, 2)
+            >>> terminal, channel = bk.tag('boiler.temp')
+            >>> print(terminal.read_temperature(channel))
+        """
+        tag = self.channel(bus_terminal_type, terminal_number, channel)
+        self._tags[name] = (self.bus_terminals.index(tag.terminal), channel)
+        return tag
+
+    def tag(self, name: str) -> Channel:
+        """
+        Returns the channel of a tag added by `add_tag`. For a process image
+        the terminal of the snapshot is returned.
+
+        Args:
+            name: The tag name.
+
+        Returns:
+            The terminal and channel number.
+
+        Raises:
+            KeyError: If the tag does not exist.
+        """
+        index, channel = self._tags[name]
+        return Channel(self.bus_terminals[index], channel)
+
+    @property
+    def tags(self) -> list[str]:
+        """
+        Names of all tags
+        """
+        return list(self._tags)
+
+    def exchange_registers(self, write_address: int, values: list[int],
+                           read_address: int, read_lengths: int) -> list[int] | None:
+        """
+        Write output registers and read input registers in a single
+        transaction (ModBus function 0x17). If the bus coupler does not
+        support this function, separate write and read requests are used.
+
+        Args:
+            write_address: Register address of the first output word.
+            values: Output words to write.
+            read_address: Register address of the first input word.
+            read_lengths: Number of input words to read.
+
+        Returns:
+            The input words or None if a request failed.
+        """
+        if self._read_write_supported:
+            words = self.modbus.read_write_multiple_registers(read_address, read_lengths, write_address, values)
+            if not self._read_write_unsupported(words, self.modbus.last_exception_code):
+                self._record_exchanged_words(write_address, values, words is not None)
+                return words
+
+        written = self.modbus.write_multiple_registers(write_address, values)
+        self._record_exchanged_words(write_address, values, written)
+        if not written:
+            return None
+        return self.modbus.read_input_registers(read_address, read_lengths)
+
+    def _read_write_unsupported(self, words: list[int] | None, exception_code: int) -> bool:
+        """
+        Check the result of a read/write multiple registers request of
+        `exchange_registers`. If the bus coupler does not support the
+        function, separate requests are used from now on.
+
+        Returns:
+            True if the request has to be repeated as separate requests
+        """
+        if words is None and exception_code == 0x01:
+            self._read_write_supported = False
+            return True
+        return False
+
+    def _record_exchanged_words(self, address: int, words: list[int], written: bool) -> None:
+        """
+        Set output words written by `exchange_registers` in the output
+        shadow image and record the result of the write, so later
+        buffered writes are compared with the exchanged values
+        """
+        self._output_words.update(zip(range(address, address + len(words)), words))
+        self._record_word_writes(address, words, written)
+
+    def exchange_channel_words(self, output_terminal: AnalogOutputTerminal, channel: int, value: int,
+                               input_terminal: AnalogInputTerminal) -> list[int] | None:
+        """
+        Write a word to a channel of an analog output terminal and read all
+        channel words of an analog input terminal in a single transaction.
+
+        Args:
+            output_terminal: The analog output terminal to write to.
+            channel: The output channel number (1 based index).
+            value: The word to write.
+            input_terminal: The analog input terminal to read from.
+
+        Returns:
+            The words of all input channels or None if a request failed.
+
+        Example:
+            >>> from pyhoff.devices import *
+            >>> bk = BK9050("172.16.17.1", bus_terminals=[KL4002, KL3202])
+            >>> words = bk.exchange_channel_words(bk.select(KL4002), 1, 0x3FFF, bk.select(KL3202))
+        """
+        assert 1 <= channel <= output_terminal.parameters['output_word_width'], \
+            f"channel out of range, must be between {1} and {output_terminal.parameters['output_word_width']}"
+
+        addresses = input_terminal._input_word_addresses
+        words = self.exchange_registers(output_terminal._output_word_addresses[channel - 1], [value],
+                                        addresses[0], addresses[-1] - addresses[0] + 1)
+        if words is None:
+            return None
+        return [words[a - addresses[0]] for a in addresses]
+
+    def read_process_image(self) -> 'ProcessImage | None':
+        """
+        Read all input bits and input words of the connected bus terminals.
+        Each address range is fetched with as few requests as the ModBus
+        limits allow (2000 bits or 125 words per request), typically one
+        request for bits and one for words. Changes of digital inputs
+        are dispatched like by `poll_inputs`.
+
+        Returns:
+            Snapshot of the inputs or None if a request failed.
+
+        Example:
+            >>> from pyhoff.devices import *
+            >>> bk = BK9050("172.16.17.1", bus_terminals=[KL1104, KL3202, KL3202])
+            >>> image = bk.read_process_image()
+            >>> print(image.select(KL1104).read_input(1))
+            >>> print(image.select(KL3202, 1).read_temperature(2))
+        """
+        bits: list[bool] = []
+        bit_offset, bit_end = self._input_bit_range
+        if bit_end:
+            packed = self._read_input_bits(bit_offset, bit_end)
+            if packed is None:
+                return None
+            bits = _get_bits(packed.to_bytes((bit_end - bit_offset + 7) // 8, 'little'), bit_end - bit_offset)
+
+        words: list[int] = []
+        word_offset, word_end = self._input_word_range
+        if word_end:
+            for address in range(word_offset, word_end, 125):
+                word_values = self.modbus.read_input_registers(address, min(125, word_end - address))
+                if word_values is None:
+                    return None
+                words += word_values
+
+        return ProcessImage(self, tuple(bits), bit_offset, tuple(words), word_offset)
+
+    def subscribe(self, terminal: DigitalInputTerminal, channel: int, callback: Callable[[InputEvent], None],
+                  rising: bool = True, falling: bool = True) -> None:
+        """
+        Call a function on changes of a digital input. Changes are detected
+        by `poll_inputs` and `read_process_image`, which compare the whole
+        input image with the previous one at once; the callbacks of
+        unchanged inputs cost nothing.
+
+        Args:
+            terminal: The digital input terminal.
+            channel: The channel number (1 based index) or 0 for all
+                channels of the terminal.
+            callback: Function called with the `InputEvent`.
+            rising: If True, the function is called on rising edges.
+            falling: If True, the function is called on falling edges.
+
+        Example:
+            >>> from pyhoff.devices import *
+            >>> bk = BK9050("172.16.17.1", bus_terminals=[KL1104, KL1408])
+            >>> bk.subscribe(bk.select(KL1408), 0, print, falling=False)
+            >>> while True:
+            ...     bk.poll_inputs()
+            ...     time.sleep(0.01)
+        """
+        assert 0 <= channel <= terminal.parameters['input_bit_width'], \
+            f"channel out of range, must be between {0} and {terminal.parameters['input_bit_width']}"
+
+        addresses = terminal._input_bit_addresses
+        for address in (addresses if channel == 0 else [addresses[channel - 1]]):
+            self._input_subscriptions.setdefault(address, []).append((callback, rising, falling))
+
+    def unsubscribe(self, callback: Callable[[InputEvent], None]) -> None:
+        """
+        Remove a function from all inputs it was subscribed to by `subscribe`
+
+        Args:
+            callback: The function to remove.
+        """
+        for address in list(self._input_subscriptions):
+            subscriptions = [s for s in self._input_subscriptions[address] if s[0] != callback]
+            if subscriptions:
+                self._input_subscriptions[address] = subscriptions
+            else:
+                del self._input_subscriptions[address]
+
+    def poll_inputs(self) -> bool:
+        """
+        Read all digital inputs and dispatch their changes since the last
+        read to the subscribed functions and the `events` log. The first
+        read only stores the input image.
+
+        Returns:
+            True if the read succeeded, otherwise False.
+        """
+        bit_offset, bit_end = self._input_bit_range
+        if not bit_end:
+            return True
+        return self._read_input_bits(bit_offset, bit_end) is not None
+
+    def _read_input_bits(self, bit_offset: int, bit_end: int) -> int | None:
+        """
+        Read the packed input bits of an address range and detect changes
+
+        Returns:
+            The packed bits, bit 0 is the input at bit_offset,
+            or None if a request failed
+        """
+        packed = 0
+        for address in range(bit_offset, bit_end, 2000):
+            bits = self.modbus.read_discrete_inputs_packed(address, min(2000, bit_end - address))
+            if bits is None:
+                return None
+            packed |= bits << (address - bit_offset)
+
+        previous = self._input_image
+        self._input_image = (bit_offset, bit_end, packed)
+        if previous and previous[:2] == (bit_offset, bit_end):
+            self._dispatch_input_changes(bit_offset, previous[2], packed)
+        return packed
+
+    def _dispatch_input_changes(self, bit_offset: int, previous: int, packed: int) -> None:
+        """
+        Log and dispatch the changed bits of two packed input images,
+        only changed bits are visited
+        """
+        changed = previous ^ packed
+        timestamp = time.monotonic()
+        while changed:
+            lowest = changed & -changed
+            changed ^= lowest
+            address = bit_offset + lowest.bit_length() - 1
+            channel = self._input_channels.get(address)
+            if not channel:
+                continue
+            event = InputEvent(timestamp, channel[0], channel[1], bool(packed & lowest))
+            self.events.append(event)
+            for callback, rising, falling in self._input_subscriptions.get(address, ()):
+                if rising if event.value else falling:
+                    callback(event)
+
+    def _read_input_bit(self, address: int) -> bool | None:
+        """
+        Read an input bit for a bus terminal
+        """
+        return self.modbus.read_discrete_input(address)
+
+    def _read_output_bit(self, address: int) -> bool | None:
+        """
+        Read an output bit back for a bus terminal
+        """
+        return self.modbus.read_coil(address)
+
+    def _read_input_word(self, address: int) -> int | None:
+        """
+        Read an input word for a bus terminal
+        """
+        words = self.modbus.read_input_registers(address, 1)
+        return words[0] if words else None
+
+    def _read_output_word(self, address: int) -> int | None:
+        """
+        Read an output word back for a bus terminal
+        """
+        words = self.modbus.read_holding_registers(address, 1)
+        return words[0] if words else None
+
+    def _write_output_bit(self, address: int, value: bool) -> bool:
+        """
+        Write an output bit, or only set it in the output shadow image
+        if outputs are buffered
+        """
+        value = bool(value)
+        if not self._set_output_bit(address, value):
+            return True
+
+        written = self.modbus.write_single_coil(address, value)
+        self._record_bit_writes(address, [value], written)
+        return written
+
+    def _write_output_word(self, address: int, value: int) -> bool:
+        """
+        Write an output word, or only set it in the output shadow image
+        if outputs are buffered
+        """
+        if not self._set_output_word(address, value):
+            return True
+
+        written = self.modbus.write_single_register(address, value)
+        self._record_word_writes(address, [value], written)
+        return written
+
+    def _set_output_bit(self, address: int, value: bool) -> bool:
+        """
+        Set an output bit in the output shadow image
+
+        Returns:
+            True if the bit has to be written now, False if outputs are buffered
+        """
+        self._output_bits[address] = value
+        if self.buffer_outputs:
+            self._dirty_bits.add(address)
+            return False
+        return True
+
+    def _set_output_word(self, address: int, value: int) -> bool:
+        """
+        Set an output word in the output shadow image
+
+        Returns:
+            True if the word has to be written now, False if outputs are buffered
+        """
+        self._output_words[address] = value
+        if self.buffer_outputs:
+            self._dirty_words.add(address)
+            return False
+        return True
+
+    def _output_runs(self) -> tuple[list[tuple[int, list[bool]]], list[tuple[int, list[int]]]]:
+        """
+        Take the outputs changed in the output shadow image since the last
+        flush that differ from the values last written, merged to runs of
+        close addresses. The runs have to be written and their results
+        recorded by `_record_bit_writes` and `_record_word_writes`.
+
+        Returns:
+            Runs of bits and runs of words as (first address, values) tuples
+        """
+        changed_bits = [a for a in self._dirty_bits if self._written_bits.get(a) != self._output_bits[a]]
+        changed_words = [a for a in self._dirty_words if self._written_words.get(a) != self._output_words[a]]
+        self._dirty_bits.clear()
+        self._dirty_words.clear()
+        return (_merge_runs(changed_bits, self._output_bits, _MAX_WRITE_BITS),
+                _merge_runs(changed_words, self._output_words, _MAX_WRITE_WORDS))
+
+    def _record_bit_writes(self, address: int, bits: list[bool], written: bool) -> None:
+        """
+        Record the result of writing output bits starting at address
+        """
+        _record_writes(self._written_bits, self._dirty_bits, address, bits, written)
+
+    def _record_word_writes(self, address: int, words: list[int], written: bool) -> None:
+        """
+        Record the result of writing output words starting at address
+        """
+        _record_writes(self._written_words, self._dirty_words, address, words, written)
+
+    def flush_outputs(self) -> bool:
+        """
+        Write the outputs changed in the output shadow image since the
+        last flush. Outputs set to the value last written to the bus
+        coupler are skipped; changed outputs with close addresses are
+        merged into one write_multiple_coils or write_multiple_registers
+        request. Failed writes are repeated by the next flush.
+
+        Returns:
+            True if all requests succeeded, otherwise False.
+
+        Example:
+            >>> from pyhoff.devices import *
+            >>> bk = BK9050("172.16.17.1", bus_terminals=[KL2404, KL4002])
+            >>> bk.buffer_outputs = True
+            >>> while True:
+            ...     bk.select(KL2404).write_coil(1, True)  # only sent by the first flush
+            ...     bk.select(KL4002).set_voltage(1, 5.0)
+            ...     bk.flush_outputs()
+        """
+        success = True
+        bit_runs, word_runs = self._output_runs()
+
+        for address, bits in bit_runs:
+            if len(bits) == 1:
+                written = self.modbus.write_single_coil(address, bits[0])
+            else:
+                written = self.modbus.write_multiple_coils(address, bits)
+            self._record_bit_writes(address, bits, written)
+            success = success and written
+
+        for address, words in word_runs:
+            if len(words) == 1:
+                written = self.modbus.write_single_register(address, words[0])
+            else:
+                written = self.modbus.write_multiple_registers(address, words)
+            self._record_word_writes(address, words, written)
+            success = success and written
+
+        return success
+
+    def invalidate_outputs(self) -> None:
+        """
+        Forget which output values were written to the bus coupler, so
+        that the next `flush_outputs` writes all outputs of the output
+        shadow image, e.g. after the watchdog of the bus coupler reset
+        the outputs.
+        """
+        self._written_bits.clear()
+        self._written_words.clear()
+        self._dirty_bits.update(self._output_bits)
+        self._dirty_words.update(self._output_words)
+
     def get_error(self) -> str:
         """
         Get the last error message.
@@ -356,3 +945,156 @@ class BusCoupler():
             The last error message.
         """
         return self.modbus.last_error
+
+
+class ProcessImage():
+    """
+    Immutable snapshot of all inputs of a bus coupler, returned by
+    `BusCoupler.read_process_image`. Its bus terminals are views of the
+    bus terminals of the bus coupler, so input methods of the terminals
+    like `read_input` or `read_temperature` are served from the snapshot
+    without network access. Output writes of the terminals like
+    `write_coil` or `set_voltage` are set in the output shadow image of
+    the source bus coupler and sent by `write_outputs`; reading outputs
+    fails.
+
+    Attributes:
+        source (BusCoupler): The bus coupler the snapshot was read from.
+        input_bits (tuple[bool, ...]): Input bits starting at input_bit_offset.
+        input_bit_offset (int): Address of the first input bit.
+        input_words (tuple[int, ...]): Input words starting at input_word_offset.
+        input_word_offset (int): Register address of the first input word.
+        timestamp (float): Monotonic time when the snapshot was completed.
+        last_error (str): Error of the last failed terminal access or `write_outputs`.
+    """
+
+    def __init__(self, source: BusCoupler, input_bits: tuple[bool, ...], input_bit_offset: int,
+                 input_words: tuple[int, ...], input_word_offset: int):
+        """
+        Instantiate a process image, see `BusCoupler.read_process_image`
+        """
+        self.source = source
+        self.input_bits = input_bits
+        self.input_bit_offset = input_bit_offset
+        self.input_words = input_words
+        self.input_word_offset = input_word_offset
+        self.timestamp = time.monotonic()
+        self.last_error = ''
+        self._views: dict[BusTerminal, BusTerminal] = dict()
+
+    def _view(self, bus_terminal: _BT) -> _BT:
+        """
+        Get the view of a bus terminal of the source bus coupler that
+        accesses the snapshot, created on first use
+        """
+        view = self._views.get(bus_terminal)
+        if view is None:
+            view = self._views[bus_terminal] = copy.copy(bus_terminal)
+            view.bus_coupler = self
+        return cast(_BT, view)
+
+    @property
+    def bus_terminals(self) -> list[BusTerminal]:
+        """
+        Views of all bus terminals of the source bus coupler
+        """
+        return [self._view(bt) for bt in self.source.bus_terminals]
+
+    def select(self, bus_terminal_type: type[_BT], terminal_number: int = 0) -> _BT:
+        """
+        Returns the view of the n-th bus terminal of the given type,
+        see `BusCoupler.select`
+
+        Args:
+            bus_terminal_type: The bus terminal class to select from.
+            terminal_number: The index of the bus terminal.
+
+        Returns:
+            The selected bus terminal view.
+        """
+        return self._view(self.source.select(bus_terminal_type, terminal_number))
+
+    def tag(self, name: str) -> Channel:
+        """
+        Returns the channel of a tag of the source bus coupler with
+        the bus terminal view of the snapshot, see `BusCoupler.tag`
+
+        Args:
+            name: The tag name.
+
+        Returns:
+            The terminal and channel number.
+
+        Raises:
+            KeyError: If the tag does not exist.
+        """
+        terminal, channel = self.source.tag(name)
+        return Channel(self._view(terminal), channel)
+
+    @property
+    def tags(self) -> list[str]:
+        """
+        Names of all tags
+        """
+        return self.source.tags
+
+    def _read_input_bit(self, address: int) -> bool | None:
+        index = address - self.input_bit_offset
+        if not 0 <= index < len(self.input_bits):
+            self.last_error = 'not part of the process image'
+            return None
+        return self.input_bits[index]
+
+    def _read_input_word(self, address: int) -> int | None:
+        index = address - self.input_word_offset
+        if not 0 <= index < len(self.input_words):
+            self.last_error = 'not part of the process image'
+            return None
+        return self.input_words[index]
+
+    def _read_output_bit(self, address: int) -> bool | None:
+        self.last_error = 'not part of the process image'
+        return None
+
+    def _read_output_word(self, address: int) -> int | None:
+        self.last_error = 'not part of the process image'
+        return None
+
+    def _write_output_bit(self, address: int, value: bool) -> bool:
+        self.source._output_bits[address] = bool(value)
+        self.source._dirty_bits.add(address)
+        return True
+
+    def _write_output_word(self, address: int, value: int) -> bool:
+        self.source._output_words[address] = value
+        self.source._dirty_words.add(address)
+        return True
+
+    def write_outputs(self) -> bool:
+        """
+        Write the outputs set on the terminals of the snapshot to the bus
+        coupler, see `BusCoupler.flush_outputs`. Unchanged outputs are
+        not written again.
+
+        Returns:
+            True if all requests succeeded, otherwise False.
+
+        Example:
+            >>> image = bk.read_process_image()
+            >>> image.select(KL2404).write_coil(1, image.select(KL1104).read_input(1))
+            >>> image.select(KL4002).set_voltage(1, 5.0)
+            >>> image.write_outputs()
+        """
+        if not self.source.flush_outputs():
+            self.last_error = self.source.get_error()
+            return False
+        return True
+
+    def get_error(self) -> str:
+        """
+        Get the last error message.
+
+        Returns:
+            The last error message.
+        """
+        return self.last_error
@@ -0,0 +1,613 @@
+import asyncio
+import random
+import struct
+from typing import Any, Awaitable, Callable, Iterable, TypeVar, cast
+from . import BusCoupler, BusTerminal, ProcessImage
+from .modbus import OfflineModbusClient, _modbus_exceptions, _get_bits, _get_words
+from .modbus import _read_response_error, _write_response_error, _read_bits_request, _read_registers_request
+from .modbus import _read_write_registers_request, _write_single_coil_request, _write_single_register_request
+from .modbus import _write_multiple_coils_request, _write_multiple_registers_request
+from .modbus import _READ_COILS, _READ_DISCRETE_INPUTS, _READ_HOLDING_REGISTERS, _READ_INPUT_REGISTERS
+from .modbus import _WRITE_SINGLE_COIL, _WRITE_SINGLE_REGISTER, _WRITE_MULTIPLE_COILS
+from .modbus import _WRITE_MULTIPLE_REGISTERS, _READ_WRITE_MULTIPLE_REGISTERS
+
+_T = TypeVar('_T')
+
+
+class AsyncModbusClient:
+    """
+    A Modbus TCP client for asyncio. Concurrent requests of different tasks
+    are pipelined on one connection and matched by transaction id.
+
+    Attributes:
+        host (str): hostname or IP address
+        port (int): server port
+        unit_id (int): ModBus id
+        timeout (float): connect and response timeout in seconds
+        last_error (str): contains last error message or empty string if no error occurred
+        last_exception_code (int): exception code of the last response or 0 if the
+            server returned no exception
+        max_in_flight (int): maximum number of requests awaiting a response
+    """
+
+    def __init__(self, host: str, port: int = 502, unit_id: int = 1, timeout: float = 5,
+                 max_in_flight: int = 8):
+        """
+        Instantiate an asyncio Modbus TCP client
+
+        Args:
+            host: hostname or IP address
+            port: server port
+            unit_id: ModBus id
+            timeout: connect and response timeout in seconds
+            max_in_flight: maximum number of requests awaiting a response
+
+        Example:
+            >>> async def main():
+            ...     client = AsyncModbusClient('localhost', port = 502, unit_id = 1)
+            ...     print(await client.read_input_registers(0, 10))
+            ...     await client.close()
+            >>> asyncio.run(main())
+        """
+        assert 0 <= unit_id < 256
+        assert 1 <= max_in_flight <= 0xFFFF, 'max_in_flight out of range'
+
+        self.host = host
+        self.port = port
+        self.unit_id = unit_id
+        self.timeout = timeout
+        self.last_error = ''
+        self.last_exception_code = 0
+        self.max_in_flight = max_in_flight
+        self._transaction_id = random.randint(0, 0xFFFF)
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task[None] | None = None
+        self._pending: dict[int, asyncio.Future[bytes]] = dict()
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._connect_lock = asyncio.Lock()
+
+    async def connect(self) -> bool:
+        """
+        Connect manual to the configured modbus server. Usually there is
+        no need to call this function since it is handled automatically.
+        """
+        async with self._connect_lock:
+            if self._writer:
+                return True
+
+            try:
+                reader, self._writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), self.timeout)
+            except (OSError, asyncio.TimeoutError):
+                self.last_error = 'connection failed'
+                return False
+
+            self._reader_task = asyncio.get_running_loop().create_task(self._read_loop(reader))
+            return True
+
+    async def close(self) -> None:
+        """
+        Close connection
+        """
+        writer = self._writer
+        self._writer = None
+        if self._reader_task and self._reader_task is not asyncio.current_task():
+            self._reader_task.cancel()
+        self._reader_task = None
+        for future in self._pending.values():
+            if not future.done():
+                future.set_result(bytes())
+        self._pending.clear()
+        if writer:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def _read_loop(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                transaction_id, protocol_identifier, length, unit_id =\
+                    struct.unpack('>HHHB', await reader.readexactly(7))
+
+                if not ((protocol_identifier == 0) and
+                        (unit_id == self.unit_id) and
+                        (2 <= length <= 0xFF)):
+                    self.last_error = 'received frame is invalid'
+                    break
+
+                data = await reader.readexactly(length - 1)
+                future = self._pending.pop(transaction_id, None)
+                if future and not future.done():
+                    future.set_result(data)
+        except (OSError, asyncio.IncompleteReadError):
+            self.last_error = 'receiving return frame failed'
+
+        await self.close()
+
+    async def transact(self, function_code: int, body: bytes) -> bytes:
+        """
+        Send a raw ModBus request and wait for its response
+
+        Args:
+            function_code: ModBus function code
+            body: data
+
+        Returns:
+            response payload or empty bytes object if an error occurred
+        """
+        self.last_exception_code = 0
+        async with self._slots:
+            if not self._writer and not await self.connect():
+                return bytes()
+            assert self._writer
+
+            self._transaction_id = (self._transaction_id + 1) % 0x10000
+            transaction_id = self._transaction_id
+            frame = struct.pack('>HHHBB', transaction_id, 0, len(body) + 2,
+                                self.unit_id, function_code) + body
+
+            future: asyncio.Future[bytes] = asyncio.get_running_loop().create_future()
+            self._pending[transaction_id] = future
+            try:
+                self._writer.write(frame)
+                await self._writer.drain()
+            except OSError:
+                self.last_error = 'sending data failed'
+                await self.close()
+                return bytes()
+
+            try:
+                data = await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                self._pending.pop(transaction_id, None)
+                self.last_error = 'receiving return frame failed'
+                return bytes()
+
+        if not data:
+            return data
+
+        if data[0] > 0x80:
+            self.last_exception_code = data[1]
+            self.last_error = f"return error: {_modbus_exceptions.get(data[1], '')} ({data[1]})"
+            return bytes()
+
+        return data[1:]
+
+    async def _read(self, function_code: int, body: bytes, byte_count: int) -> bytes | None:
+        """
+        Send a request and validate the byte count of its response
+
+        Args:
+            function_code: ModBus function code
+            body: data
+            byte_count: expected number of data bytes of the response
+
+        Returns:
+            Data bytes of the response or None if error
+        """
+        rx_data = await self.transact(function_code, body)
+        if not rx_data:
+            return None
+
+        error = _read_response_error(rx_data, byte_count)
+        if error:
+            self.last_error = error
+            return None
+
+        return rx_data[1:]
+
+    async def _write(self, function_code: int, tx_data: bytes, echo_length: int) -> bool:
+        """
+        Send a write request and validate its response
+
+        Args:
+            function_code: ModBus function code
+            tx_data: request body
+            echo_length: number of leading request bytes the response repeats
+
+        Returns:
+            True if write succeeded or False if failed
+        """
+        rx_data = await self.transact(function_code, tx_data)
+        if not rx_data:
+            return False
+
+        error = _write_response_error(rx_data, tx_data, echo_length)
+        if error:
+            self.last_error = error
+            return False
+
+        return True
+
+    async def read_coils(self, bit_address: int, bit_lengths: int = 1) -> list[bool] | None:
+        """
+        ModBus function for reading coils (0x01), see `SimpleModbusClient.read_coils`
+        """
+        bit_data = await self._read(_READ_COILS, *_read_bits_request(bit_address, bit_lengths))
+        return None if bit_data is None else _get_bits(bit_data, bit_lengths)
+
+    async def read_discrete_inputs(self, bit_address: int, bit_lengths: int = 1) -> list[bool] | None:
+        """
+        ModBus function for reading discrete inputs (0x02),
+        see `SimpleModbusClient.read_discrete_inputs`
+        """
+        bit_data = await self._read(_READ_DISCRETE_INPUTS, *_read_bits_request(bit_address, bit_lengths))
+        return None if bit_data is None else _get_bits(bit_data, bit_lengths)
+
+    async def read_holding_registers(self, register_address: int, word_lengths: int = 1) -> list[int] | None:
+        """
+        ModBus function for reading holding registers (0x03),
+        see `SimpleModbusClient.read_holding_registers`
+        """
+        reg_data = await self._read(_READ_HOLDING_REGISTERS, *_read_registers_request(register_address, word_lengths))
+        return None if reg_data is None else _get_words(reg_data)
+
+    async def read_input_registers(self, register_address: int, word_lengths: int = 1) -> list[int] | None:
+        """
+        ModBus function for reading input registers (0x04),
+        see `SimpleModbusClient.read_input_registers`
+        """
+        reg_data = await self._read(_READ_INPUT_REGISTERS, *_read_registers_request(register_address, word_lengths))
+        return None if reg_data is None else _get_words(reg_data)
+
+    async def write_single_coil(self, bit_address: int, value: bool) -> bool:
+        """
+        ModBus function for writing a single coil (0x05),
+        see `SimpleModbusClient.write_single_coil`
+        """
+        return await self._write(_WRITE_SINGLE_COIL, _write_single_coil_request(bit_address, value), 4)
+
+    async def read_discrete_input(self, address: int) -> bool | None:
+        """
+        Read a discrete input from the given register address.
+        """
+        value = await self.read_discrete_inputs(address)
+        return value[0] if value else None
+
+    async def read_coil(self, address: int) -> bool | None:
+        """
+        Read a coil from the given register address.
+        """
+        value = await self.read_coils(address)
+        return value[0] if value else None
+
+    async def write_single_register(self, register_address: int, value: int) -> bool:
+        """
+        ModBus function for writing a single register (0x06),
+        see `SimpleModbusClient.write_single_register`
+        """
+        return await self._write(_WRITE_SINGLE_REGISTER, _write_single_register_request(register_address, value), 4)
+
+    async def write_multiple_coils(self, bit_address: int, values: list[bool]) -> bool:
+        """
+        ModBus function for writing multiple coils (0x0F),
+        see `SimpleModbusClient.write_multiple_coils`
+        """
+        return await self._write(_WRITE_MULTIPLE_COILS, _write_multiple_coils_request(bit_address, values), 2)
+
+    async def write_multiple_registers(self, register_address: int, values: list[int]) -> bool:
+        """
+        ModBus function for writing multiple registers (0x10),
+        see `SimpleModbusClient.write_multiple_registers`
+        """
+        return await self._write(_WRITE_MULTIPLE_REGISTERS,
+                                 _write_multiple_registers_request(register_address, values), 2)
+
+    async def read_write_multiple_registers(self, read_address: int, read_lengths: int,
+                                            write_address: int, values: list[int]) -> list[int] | None:
+        """
+        ModBus function for writing and reading multiple registers (0x17),
+        see `SimpleModbusClient.read_write_multiple_registers`
+        """
+        reg_data = await self._read(_READ_WRITE_MULTIPLE_REGISTERS,
+                                    *_read_write_registers_request(read_address, read_lengths, write_address, values))
+        return None if reg_data is None else _get_words(reg_data)
+
+
+class AsyncBusTerminal():
+    """
+    Awaitable view of a bus terminal of an `AsyncBusCoupler`. All methods
+    of the wrapped terminal are available as coroutines.
+
+    Attributes:
+        bus_coupler: The async bus coupler to which this terminal is connected.
+        terminal: The wrapped bus terminal.
+    """
+
+    def __init__(self, bus_coupler: 'AsyncBusCoupler', terminal: BusTerminal):
+        self.bus_coupler = bus_coupler
+        self.terminal = terminal
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.terminal, name)
+        if not callable(attr):
+            return attr
+
+        async def method(*args: Any, **kwargs: Any) -> Any:
+            return await self.bus_coupler.execute(attr, *args, **kwargs)
+
+        return method
+
+
+class _OutputsRequired(Exception):
+    """
+    Raised by `_TerminalImage` if a terminal method reads outputs
+    that are not yet read
+    """
+
+
+class _TerminalImage(ProcessImage):
+    """
+    Process image of the inputs of one bus terminal for a call of
+    `AsyncBusCoupler.execute`. Unbuffered output writes are collected
+    and sent by `execute` when the call returned.
+
+    Attributes:
+        output_bits (dict[int, bool] | None): Output bits by address or
+            None if the outputs of the terminal are not read yet.
+        output_words (dict[int, int] | None): Output words by address or
+            None if the outputs of the terminal are not read yet.
+        output_writes (list[tuple[int, int, int]]): Function code, address
+            and value of the collected writes in call order.
+    """
+
+    def __init__(self, source: BusCoupler, input_bits: tuple[bool, ...], input_bit_offset: int,
+                 input_words: tuple[int, ...], input_word_offset: int):
+        super().__init__(source, input_bits, input_bit_offset, input_words, input_word_offset)
+        self.output_bits: dict[int, bool] | None = None
+        self.output_words: dict[int, int] | None = None
+        self.output_writes: list[tuple[int, int, int]] = []
+
+    def _read_output_bit(self, address: int) -> bool | None:
+        if self.output_bits is None:
+            raise _OutputsRequired()
+        return self.output_bits.get(address)
+
+    def _read_output_word(self, address: int) -> int | None:
+        if self.output_words is None:
+            raise _OutputsRequired()
+        return self.output_words.get(address)
+
+    def _write_output_bit(self, address: int, value: bool) -> bool:
+        value = bool(value)
+        if self.source._set_output_bit(address, value):
+            self.output_writes.append((_WRITE_SINGLE_COIL, address, value))
+        return True
+
+    def _write_output_word(self, address: int, value: int) -> bool:
+        if self.source._set_output_word(address, value):
+            self.output_writes.append((_WRITE_SINGLE_REGISTER, address, value))
+        return True
+
+
+async def _read_range(read: Callable[[int, int], Awaitable[list[_T] | None]],
+                      addresses: list[int]) -> dict[int, _T]:
+    """
+    Read the values of an ascending address list with one request
+
+    Returns:
+        Values by address, empty if no address is given or the request failed
+    """
+    if not addresses:
+        return dict()
+    values = await read(addresses[0], addresses[-1] - addresses[0] + 1)
+    return dict(zip(range(addresses[0], addresses[-1] + 1), values or []))
+
+
+class AsyncBusCoupler():
+    """
+    Bus coupler for asyncio. One event loop can drive many couplers
+    concurrently without a thread per coupler.
+
+    Attributes:
+        bus_coupler (BusCoupler): The wrapped bus coupler holding the
+            terminal configuration and the output shadow image; it
+            has no connection itself.
+        modbus (AsyncModbusClient): The underlying modbus client used for the connection.
+    """
+
+    def __init__(self, bus_coupler_type: type[BusCoupler], host: str, port: int = 502,
+                 bus_terminals: Iterable[type[BusTerminal]] = [],
+                 timeout: float = 5, watchdog: float = 0):
+        """
+        Instantiate a new async bus coupler.
+
+        Args:
+            bus_coupler_type: bus coupler class, e.g. BK9050 or WAGO_750_352
+            host: ip or hostname of the bus coupler
+            port: port of the modbus host
+            bus_terminals: list of bus terminal classes for the
+                connected terminals
+            timeout: timeout for waiting for the device response
+            watchdog: time in seconds after the device sets all outputs to
+                default state. A value of 0 deactivates the watchdog.
+
+        Examples:
+            >>> from pyhoff.devices import *
+            >>> async def main():
+            ...     bk = AsyncBusCoupler(BK9050, '192.168.0.23', bus_terminals=[KL3202, KL4002])
+            ...     t = await bk.select(KL3202, 0).read_temperature(1)
+            ...     await bk.select(KL4002, 0).set_voltage(1, t / 10)
+            ...     await bk.close()
+            >>> asyncio.run(main())
+        """
+        self.modbus = AsyncModbusClient(host, port, timeout=timeout)
+        self.bus_coupler = bus_coupler_type(host, port, bus_terminals, timeout, watchdog,
+                                            modbus=OfflineModbusClient())
+        self._pending_registers = self.bus_coupler._init_registers(watchdog)
+
+    def add_bus_terminals(self, *new_bus_terminals: type[BusTerminal] | Iterable[type[BusTerminal]]) -> list[AsyncBusTerminal]:
+        """
+        Add bus terminals to the bus coupler.
+
+        Args:
+            new_bus_terminals: bus terminal classes to add.
+
+        Returns:
+            The corresponding list of async bus terminal objects.
+        """
+        self.bus_coupler.add_bus_terminals(*new_bus_terminals)
+        return self.bus_terminals
+
+    @property
+    def bus_terminals(self) -> list[AsyncBusTerminal]:
+        """
+        List of async bus terminal objects according to the connected terminals.
+        """
+        return [AsyncBusTerminal(self, bt) for bt in self.bus_coupler.bus_terminals]
+
+    def select(self, bus_terminal_type: type[BusTerminal], terminal_number: int = 0) -> AsyncBusTerminal:
+        """
+        Returns the n-th bus terminal instance of the given bus terminal type and
+        terminal index, see `BusCoupler.select`.
+
+        Args:
+            bus_terminal_type: The bus terminal class to select from.
+            terminal_number: The index of the bus terminal to return.
+
+        Returns:
+            The selected async bus terminal instance.
+        """
+        return AsyncBusTerminal(self, self.bus_coupler.select(bus_terminal_type, terminal_number))
+
+    async def connect(self) -> bool:
+        """
+        Connect to the bus coupler and write the pending hardware
+        initialization registers. Usually there is no need to call this
+        function since it is handled automatically.
+
+        Returns:
+            True if all initialization requests succeeded
+        """
+        registers = self._pending_registers
+        self._pending_registers = []
+        if not await self.modbus.connect():
+            self._pending_registers = registers + self._pending_registers
+            return False
+
+        results = [await self.modbus.write_single_register(address, value) for address, value in registers]
+        return all(results)
+
+    async def execute(self, function: Callable[..., _T], *args: Any, **kwargs: Any) -> _T:
+        """
+        Run a method of a bus terminal with requests sent by the async
+        modbus client. The inputs of the terminal are read before the
+        call, its unbuffered output writes are sent after it. If the method
+        reads outputs, they are read and the method is called again; its
+        collected writes are discarded before, so no request is repeated.
+
+        Args:
+            function: bound method of a bus terminal of this bus coupler
+            args: arguments for the function
+
+        Returns:
+            Return value of the function, False if the function returned
+            True but a write failed
+        """
+        terminal = getattr(function, '__self__', None)
+        assert isinstance(terminal, BusTerminal) and terminal.bus_coupler is self.bus_coupler, \
+            'function is not a method of a bus terminal of this bus coupler'
+
+        if self._pending_registers:
+            await self.connect()
+
+        bits, words = await asyncio.gather(
+            _read_range(self.modbus.read_discrete_inputs, terminal._input_bit_addresses),
+            _read_range(self.modbus.read_input_registers, terminal._input_word_addresses))
+        bit_offset = min(bits, default=0)
+        word_offset = min(words, default=0)
+        image = _TerminalImage(self.bus_coupler, tuple(bits.values()), bit_offset,
+                               tuple(words.values()), word_offset)
+        method = getattr(image._view(terminal), getattr(function, '__name__'))
+
+        while True:
+            image.output_writes.clear()
+            try:
+                ret: _T = method(*args, **kwargs)
+                break
+            except _OutputsRequired:
+                image.output_bits, image.output_words = await asyncio.gather(
+                    _read_range(self.modbus.read_coils, terminal._output_bit_addresses),
+                    _read_range(self.modbus.read_holding_registers, terminal._output_word_addresses))
+
+        success = True
+        for function_code, address, value in image.output_writes:
+            if function_code == _WRITE_SINGLE_COIL:
+                written = await self.modbus.write_single_coil(address, bool(value))
+                self.bus_coupler._record_bit_writes(address, [bool(value)], written)
+            else:
+                written = await self.modbus.write_single_register(address, value)
+                self.bus_coupler._record_word_writes(address, [value], written)
+            success = success and written
+
+        if ret is True and not success:
+            return cast(_T, False)
+        return ret
+
+    async def flush_outputs(self) -> bool:
+        """
+        Write the outputs changed in the output shadow image since the
+        last flush, see `BusCoupler.flush_outputs`
+
+        Returns:
+            True if all requests succeeded, otherwise False.
+        """
+        success = True
+        bit_runs, word_runs = self.bus_coupler._output_runs()
+
+        for address, bits in bit_runs:
+            if len(bits) == 1:
+                written = await self.modbus.write_single_coil(address, bits[0])
+            else:
+                written = await self.modbus.write_multiple_coils(address, bits)
+            self.bus_coupler._record_bit_writes(address, bits, written)
+            success = success and written
+
+        for address, words in word_runs:
+            if len(words) == 1:
+                written = await self.modbus.write_single_register(address, words[0])
+            else:
+                written = await self.modbus.write_multiple_registers(address, words)
+            self.bus_coupler._record_word_writes(address, words, written)
+            success = success and written
+
+        return success
+
+    async def exchange_registers(self, write_address: int, values: list[int],
+                                 read_address: int, read_lengths: int) -> list[int] | None:
+        """
+        Write output registers and read input registers in a single
+        transaction (ModBus function 0x17) with a fallback to separate
+        requests, see `BusCoupler.exchange_registers`
+
+        Returns:
+            The input words or None if a request failed.
+        """
+        if self.bus_coupler._read_write_supported:
+            words = await self.modbus.read_write_multiple_registers(read_address, read_lengths, write_address, values)
+            if not self.bus_coupler._read_write_unsupported(words, self.modbus.last_exception_code):
+                self.bus_coupler._record_exchanged_words(write_address, values, words is not None)
+                return words
+
+        written = await self.modbus.write_multiple_registers(write_address, values)
+        self.bus_coupler._record_exchanged_words(write_address, values, written)
+        if not written:
+            return None
+        return await self.modbus.read_input_registers(read_address, read_lengths)
+
+    def get_error(self) -> str:
+        """
+        Get the last error message.
+
+        Returns:
+            The last error message.
+        """
+        return self.modbus.last_error
+
+    async def close(self) -> None:
+        """
+        Close connection
+        """
+        await self.modbus.close()
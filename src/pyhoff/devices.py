@@ -1,22 +1,28 @@
 from . import DigitalInputTerminal, DigitalOutputTerminal
 from . import AnalogInputTerminal, AnalogOutputTerminal
 from . import BusTerminal, BusCoupler
+from .modbus import SimpleModbusClient
+from typing import Iterable
 
 
 class BK9000(BusCoupler):
     """
     BK9000 ModBus TCP bus coupler
     """
-    def _init_hardware(self, watchdog: float) -> None:
+    def _init_registers(self, watchdog: float) -> list[tuple[int, int]]:
         # https://download.beckhoff.com/download/document/io/bus-terminals/bk9000_bk9050_bk9100de.pdf
         # config watchdog on page 58
+        return [
+            # set time-out/deactivate watchdog timer (deactivate: timeout = 0):
+            (0x1120, int(watchdog * 1000)),  # ms
 
-        # set time-out/deactivate watchdog timer (deactivate: timeout = 0):
-        self.modbus.write_single_register(0x1120, int(watchdog * 1000))  # ms
+            # reset watchdog timer:
+            (0x1121, 0xBECF),
+            (0x1121, 0xAFFE)
+        ]
 
-        # reset watchdog timer:
-        self.modbus.write_single_register(0x1121, 0xBECF)
-        self.modbus.write_single_register(0x1121, 0xAFFE)
+    def _init_hardware(self, watchdog: float) -> None:
+        super()._init_hardware(watchdog)
 
         # set process image offset
         self._next_output_word_offset = 0x0800
@@ -44,17 +50,52 @@ class WAGO_750_352(BusCoupler):
     """
     Wago 750-352 ModBus TCP bus coupler
     """
-    def _init_hardware(self, watchdog: float) -> None:
-        # deactivate/reset watchdog timer:
-        self.modbus.write_single_register(0x1005, 0xAAAA)
-        self.modbus.write_single_register(0x1005, 0x5555)
+    def __init__(self, host: str, port: int = 502, bus_terminals: Iterable[type[BusTerminal]] = [],
+                 timeout: float = 5, watchdog: float = 0, debug: bool = False,
+                 modbus: SimpleModbusClient | None = None, udp: bool = False):
+        """
+        Instantiate a new WAGO 750-352 bus coupler.
 
-        # set time-out/deactivate watchdog timer (deactivate: timeout = 0):
-        self.modbus.write_single_register(0x1000, int(watchdog * 10))
+        Args:
+            host: ip or hostname of the bus coupler
+            port: port of the modbus host
+            bus_terminals: list of bus terminal classes for the
+                connected terminals
+            timeout: timeout for waiting for the device response
+            watchdog: time in seconds after the device sets all outputs to
+                default state. A value of 0 deactivates the watchdog.
+            debug: If True, debug information is printed.
+            modbus: existing modbus client to use instead of creating a
+                new one; host, port, timeout, debug and udp are ignored in this case
+            udp: If True, ModBus UDP is used instead of ModBus TCP.
+
+        Examples:
+            >>> from pyhoff.devices import *
+            >>> wago = WAGO_750_352('192.168.0.24', bus_terminals=[WAGO_750_1405], udp=True)
+            >>> print(wago.select(WAGO_750_1405).read_input(1))
+        """
+        if udp and not modbus:
+            modbus = SimpleModbusClient(host, port, timeout=timeout, debug=debug, udp=True)
+        super().__init__(host, port, bus_terminals, timeout, watchdog, debug, modbus)
+
+    def _init_registers(self, watchdog: float) -> list[tuple[int, int]]:
+        registers = [
+            # deactivate/reset watchdog timer:
+            (0x1005, 0xAAAA),
+            (0x1005, 0x5555),
+
+            # set time-out/deactivate watchdog timer (deactivate: timeout = 0):
+            (0x1000, int(watchdog * 10))
+        ]
 
         if watchdog:
             # configure watchdog to reset on all functions codes
-            self.modbus.write_single_register(0x1001, 0xFFFF)
+            registers.append((0x1001, 0xFFFF))
+
+        return registers
+
+    def _init_hardware(self, watchdog: float) -> None:
+        super()._init_hardware(watchdog)
 
         # set process image offset
         self._next_output_word_offset = 0x0000
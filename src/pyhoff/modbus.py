@@ -1,6 +1,18 @@
 import socket
 import struct
 import random
+import sys
+import threading
+import time
+from array import array
+from functools import wraps
+from collections import deque
+from itertools import chain
+from concurrent.futures import Future
+from contextlib import AbstractContextManager, contextmanager
+from typing import Any, Callable, Concatenate, Generic, Iterator, Literal, ParamSpec, Protocol, TypeVar, overload
+from .stats import ClientStats
+from .trace import TraceSink, PrintTrace, TRACE_SEND, TRACE_RECEIVE
 
 _READ_COILS = 0x01
 _READ_DISCRETE_INPUTS = 0x02
@@ -10,6 +22,52 @@ _WRITE_SINGLE_COIL = 0x05
 _WRITE_SINGLE_REGISTER = 0x06
 _WRITE_MULTIPLE_COILS = 0x0F
 _WRITE_MULTIPLE_REGISTERS = 0x10
+_READ_WRITE_MULTIPLE_REGISTERS = 0x17
+
+# Functions that can be repeated after a lost response without side effects
+_IDEMPOTENT_FUNCTIONS = frozenset({_READ_COILS, _READ_DISCRETE_INPUTS, _READ_HOLDING_REGISTERS,
+                                   _READ_INPUT_REGISTERS, _WRITE_SINGLE_COIL, _WRITE_SINGLE_REGISTER})
+
+_SLAVE_DEVICE_BUSY = 0x06
+
+_T = TypeVar('_T')
+_P = ParamSpec('_P')
+
+_LITTLE_ENDIAN = sys.byteorder == 'little'
+# bit values of each byte value, LSB first
+_BYTE_BITS = [tuple(bool(b >> i & 1) for i in range(8)) for b in range(256)]
+# maps zero to '0' and all other byte values to '1'
+_BIT_CHARS = bytes.maketrans(bytes(range(256)), b'0' + b'1' * 255)
+
+# Maximum size of a ModBus TCP frame: MBAP header without length field
+# plus maximal value of the length field
+_MAX_FRAME_SIZE = 6 + 0xFF
+
+# Receive buffer size, holds several maximum sized frames
+_RX_BUFFER_SIZE = 4096
+
+
+class _Socket(Protocol):
+    """
+    Socket methods used by the client, implemented by `socket.socket`
+    and by replacements like the socket of `pyhoff.replay.ReplayModbusClient`
+    """
+
+    def sendall(self, data: bytes | bytearray, /) -> None:
+        ...
+
+    def send(self, data: bytes | bytearray, /) -> int:
+        ...
+
+    def recv_into(self, buffer: memoryview, /) -> int:
+        ...
+
+    def settimeout(self, value: float | None, /) -> None:
+        ...
+
+    def close(self) -> None:
+        ...
+
 
 _modbus_exceptions = {
     0x01: 'illegal function',
@@ -25,23 +83,211 @@ _modbus_exceptions = {
 }
 
 
-def _get_bits(data: bytes, bit_number: int) -> list[bool]:
-    return [bool(data[i // 8] >> (i % 8) & 0x01)
-            for i in range(bit_number)]
+def _get_bits_packed(data: bytes | memoryview, bit_number: int) -> int:
+    return int.from_bytes(data, byteorder='little') & ((1 << bit_number) - 1)
+
+
+def _get_bits(data: bytes | memoryview, bit_number: int) -> list[bool]:
+    bits = list(chain.from_iterable(map(_BYTE_BITS.__getitem__, data[:(bit_number + 7) // 8])))
+    del bits[bit_number:]
+    return bits
+
+
+def _get_words_array(data: bytes | memoryview) -> 'array[int]':
+    words = array('H')
+    words.frombytes(data[:len(data) & ~1])
+    if _LITTLE_ENDIAN:
+        words.byteswap()
+    return words
+
 
+def _get_words(data: bytes | memoryview) -> list[int]:
+    return _get_words_array(data).tolist()
 
-def _get_words(data: bytes) -> list[int]:
-    return [(data[i * 2] << 8) + data[i * 2 + 1]
-            for i in range(len(data) // 2)]
+
+def _from_bits_packed(value: int, bit_number: int) -> bytes:
+    return value.to_bytes((bit_number + 7) // 8, byteorder='little')
 
 
 def _from_bits(values: list[bool]) -> bytes:
-    return bytes(sum(((1 << j) * bool(values[8 * i + j]))
-                     for j in range(8)) for i in range(len(values) // 8))
+    if not values:
+        return bytes()
+    try:
+        bits = bytes(values)
+    except (TypeError, ValueError):
+        bits = bytes(map(bool, values))
+    return _from_bits_packed(int(bits[::-1].translate(_BIT_CHARS), 2), len(values))
+
+
+def _from_words(values: 'list[int] | array[int]') -> bytes:
+    words = array('H', values)
+    if _LITTLE_ENDIAN:
+        words.byteswap()
+    return words.tobytes()
+
+
+def _read_bits_request(bit_address: int, bit_lengths: int) -> tuple[bytes, int]:
+    """
+    Encode a read coils or read discrete inputs request
+
+    Args:
+        bit_address: Bit address (0 to 0xffff)
+        bit_lengths: Number of bits to read (1 to 2000)
+
+    Returns:
+        request body and expected number of data bytes of the response
+    """
+    assert 1 <= bit_lengths <= 2000, 'bit_lengths out of range'
+    assert bit_address + bit_lengths <= 0xffff, 'read after address 0xffff'
+
+    return _from_words([bit_address, bit_lengths]), (bit_lengths + 7) // 8
+
+
+def _read_registers_request(register_address: int, word_lengths: int) -> tuple[bytes, int]:
+    """
+    Encode a read holding registers or read input registers request
+
+    Args:
+        register_address: Register address (0 to 0xffff)
+        word_lengths: Number of registers to read (1 to 125)
+
+    Returns:
+        request body and expected number of data bytes of the response
+    """
+    assert 1 <= word_lengths <= 125, 'word_lengths out of range'
+    assert register_address + word_lengths <= 0xffff, 'read after address 0xffff'
+
+    return _from_words([register_address, word_lengths]), word_lengths * 2
+
+
+def _read_write_registers_request(read_address: int, read_lengths: int,
+                                  write_address: int, values: list[int]) -> tuple[bytes, int]:
+    """
+    Encode a read/write multiple registers request
+
+    Returns:
+        request body and expected number of data bytes of the response
+    """
+    assert 1 <= read_lengths <= 125, 'read_lengths out of range'
+    assert read_address + read_lengths <= 0xffff, 'read after address 0xffff'
+    assert 1 <= len(values) <= 121, 'number values must be from 1 to 121'
+    assert write_address + len(values) <= 0xffff, 'write_address out of range'
+    assert max(values) <= 0xffff, 'value out of range 0 to 0xffff'
+    assert min(values) >= 0, 'value out of range 0 to 0xffff'
+
+    body = struct.pack('>HHHHB', read_address, read_lengths, write_address,
+                       len(values), len(values) * 2) + _from_words(values)
+    return body, read_lengths * 2
+
+
+def _write_single_coil_request(bit_address: int, value: bool) -> bytes:
+    assert 0 <= bit_address <= 0xffff, 'bit_address out of range'
+
+    return _from_words([bit_address, 0xFF00 * bool(value)])
+
+
+def _write_single_register_request(register_address: int, value: int) -> bytes:
+    assert 0 <= register_address <= 0xffff, 'register_address out of range'
+    assert 0 <= value <= 0xffff, 'value out of range 0 to 0xffff'
+
+    return _from_words([register_address, value])
+
+
+def _write_multiple_coils_request(bit_address: int, values: list[bool]) -> bytes:
+    assert bit_address + len(values) <= 0xffff, 'bit_address out of range'
+    assert 1 <= len(values) <= 2000, 'number values must be from 1 to 2000'
+
+    return struct.pack('>HHB', bit_address, len(values), (len(values) + 7) // 8) + _from_bits(values)
+
+
+def _write_multiple_registers_request(register_address: int, values: list[int]) -> bytes:
+    assert register_address + len(values) <= 0xffff, 'register_address out of range'
+    assert max(values) <= 0xffff, 'value out of range 0 to 0xffff'
+    assert min(values) >= 0, 'value out of range 0 to 0xffff'
 
+    return struct.pack('>HHB', register_address, len(values), len(values) * 2) + _from_words(values)
 
-def _from_words(values: list[int]) -> bytes:
-    return b''.join(word.to_bytes(2, byteorder='big') for word in values)
+
+def _read_response_error(rx_data: bytes | memoryview, byte_count: int) -> str:
+    """
+    Check the payload of a read response
+
+    Args:
+        rx_data: response payload starting with the byte count
+        byte_count: expected number of data bytes
+
+    Returns:
+        error message or empty string if the payload is valid
+    """
+    if len(rx_data) < 2:
+        return 'received frame under minimum size'
+    if not rx_data[0] == byte_count == len(rx_data) - 1:
+        return 'received frame size mismatch'
+    return ''
+
+
+def _write_response_error(rx_data: bytes | memoryview, tx_data: bytes, echo_length: int) -> str:
+    """
+    Check the payload of a write response
+
+    Args:
+        rx_data: response payload
+        tx_data: request body
+        echo_length: number of leading request bytes the response repeats,
+            4 for single writes and 2 (the address) for multiple writes
+
+    Returns:
+        error message or empty string if the payload is valid
+    """
+    if len(rx_data) != 4:
+        return 'received frame size mismatch'
+    if rx_data[:echo_length] != tx_data[:echo_length]:
+        return 'received frame is invalid'
+    return ''
+
+
+def _split_frames(data: bytes) -> list[bytes]:
+    """
+    Split concatenated ModBus TCP frames
+    """
+    frames: list[bytes] = []
+    offset = 0
+    while offset + 6 <= len(data):
+        length = struct.unpack_from('>H', data, offset + 4)[0]
+        frames.append(data[offset:offset + length + 6])
+        offset += length + 6
+    return frames
+
+
+def _synchronized(method: Callable[Concatenate['SimpleModbusClient', _P], _T]) -> Callable[Concatenate['SimpleModbusClient', _P], _T]:
+    """
+    Decorator that serializes calls of a client method across threads
+    """
+    @wraps(method)
+    def wrapper(client: 'SimpleModbusClient', /, *args: _P.args, **kwargs: _P.kwargs) -> _T:
+        with client._lock:
+            return method(client, *args, **kwargs)
+    return wrapper
+
+
+def _transaction(function_code: int) -> Callable[[Callable[Concatenate['SimpleModbusClient', _P], _T]],
+                                                 Callable[Concatenate['SimpleModbusClient', _P], _T]]:
+    """
+    Decorator for methods that send a request and wait for its response.
+    Calls are serialized across threads unless the client multiplexes
+    concurrent transactions itself (see `pyhoff.threaded.ThreadedModbusClient`).
+    Failed calls, which return None or False, are repeated according to
+    the retry policy of the client.
+
+    Args:
+        function_code: ModBus function code of the request
+    """
+    def decorator(method: Callable[Concatenate['SimpleModbusClient', _P], _T]) -> Callable[Concatenate['SimpleModbusClient', _P], _T]:
+        @wraps(method)
+        def wrapper(client: 'SimpleModbusClient', /, *args: _P.args, **kwargs: _P.kwargs) -> _T:
+            return client._with_retries(function_code, lambda: method(client, *args, **kwargs))
+        return wrapper
+    return decorator
 
 
 class SimpleModbusClient:
@@ -54,11 +300,50 @@ class SimpleModbusClient:
         unit_id (int): ModBus id
         timeout (float): socket timeout in seconds
         last_error (str): contains last error message or empty string if no error occurred
-        debug (bool): if True prints out transmitted and received bytes in hex
+        last_exception_code (int): exception code of the last response or 0 if the
+            server returned no exception
+        debug (bool): if True prints out errors
+        trace (TraceSink | None): receives all transmitted and received frames
+        max_in_flight (int): maximum number of pipelined requests awaiting a response
+        circuit_breaker (bool): if True, calls fail immediately after a connect failure
+            until a background thread reconnected
+        backoff_min (float): first reconnect delay in seconds of the circuit breaker
+        backoff_max (float): maximum reconnect delay in seconds of the circuit breaker
+        nodelay (bool): if True, Nagle's algorithm is disabled (TCP_NODELAY)
+        keepalive_idle (float): idle time in seconds before TCP keepalive packets are
+            sent or 0 to disable TCP keepalive
+        user_timeout (float): time in seconds that transmitted data may remain
+            unacknowledged before the connection is dropped (TCP_USER_TIMEOUT,
+            Linux only) or 0 for the system default
+        probe_interval (float): idle time in seconds after which a ModBus request is
+            sent to keep the connection warm or 0 to disable probing
+        probe_address (int): holding register address read by the probe
+        udp (bool): if True, ModBus UDP is used instead of ModBus TCP
+        udp_retries (int): number of retransmissions of unanswered UDP requests
+        adaptive_timeout (bool): if True, the response timeout follows the measured
+            round trip time
+        timeout_min (float): lower limit in seconds of the adaptive response timeout
+        retries (int): maximum number of retries of a failed call
+        retry_deadline (float): time in seconds from the start of a call after which
+            it is not retried or 0 for no limit
+        busy_backoff (float): delay in seconds before the first retry of a request
+            answered with 'slave device busy'
+        response_timeout (float): current response timeout in seconds
+        srtt (float): smoothed round trip time in seconds, 0 before the first sample
+        rttvar (float): round trip time variation in seconds
+        stats (ClientStats | None): transaction metrics or None if metrics are disabled
+        transactions (int): number of requests sent, including retries
 
     """
 
-    def __init__(self, host: str, port: int = 502, unit_id: int = 1, timeout: float = 5, debug: bool = False):
+    def __init__(self, host: str, port: int = 502, unit_id: int = 1, timeout: float = 5, debug: bool = False,
+                 max_in_flight: int = 8, circuit_breaker: bool = False,
+                 backoff_min: float = 0.1, backoff_max: float = 30,
+                 nodelay: bool = True, keepalive_idle: float = 0, user_timeout: float = 0,
+                 probe_interval: float = 0, probe_address: int = 0, metrics: bool = False,
+                 trace: TraceSink | None = None, udp: bool = False, udp_retries: int = 2,
+                 adaptive_timeout: bool = False, timeout_min: float = 0.01,
+                 retries: int = 0, retry_deadline: float = 0, busy_backoff: float = 0.01):
         """
         Instantiate a Modbus TCP client
 
@@ -68,6 +353,53 @@ class SimpleModbusClient:
             unit_id: ModBus id
             timeout: socket timeout in seconds
             debug: if True prints out transmitted and received bytes in hex
+            max_in_flight: maximum number of pipelined requests that are sent
+                before the first response must be received (see `submit`)
+            circuit_breaker: if True, calls fail immediately after a connect
+                failure while a background thread retries to connect with
+                exponential backoff (see `breaker_state`)
+            backoff_min: first reconnect delay in seconds of the circuit breaker
+            backoff_max: maximum reconnect delay in seconds of the circuit breaker
+            nodelay: if True, Nagle's algorithm is disabled so that small
+                frames are sent without delay
+            keepalive_idle: idle time in seconds before TCP keepalive packets
+                are sent or 0 to disable TCP keepalive
+            user_timeout: time in seconds that transmitted data may remain
+                unacknowledged before the connection is dropped
+                (Linux only) or 0 for the system default
+            probe_interval: idle time in seconds after which a background thread
+                reads a holding register to keep the connection warm and to
+                reconnect early if the server dropped it; 0 disables probing.
+                Note that probes also reset a watchdog that is triggered by
+                all function codes (e.g. WAGO 750-352 with watchdog enabled).
+            probe_address: holding register address read by the probe
+            metrics: if True, transactions are counted and timed in `stats`
+            trace: sink for all transmitted and received frames, e.g.
+                `pyhoff.trace.RingTrace`; if not given and debug is
+                True, frames are printed
+            udp: if True, ModBus UDP is used instead of ModBus TCP. Each
+                request is sent as one datagram; requests are retransmitted
+                if no response is received within timeout.
+            udp_retries: number of retransmissions of unanswered UDP requests
+            adaptive_timeout: if True, the response timeout is derived from
+                the smoothed round trip time and its variation like the
+                retransmission timeout of TCP (RFC 6298) and doubled after
+                each timeout. It is limited to timeout_min and timeout;
+                connecting always uses timeout.
+            timeout_min: lower limit in seconds of the adaptive response timeout
+            retries: maximum number of retries of a failed call. Requests
+                answered with 'slave device busy' were not executed and are
+                retried for all functions; requests that failed otherwise,
+                e.g. by a timeout, are only retried for idempotent functions
+                (reads and single coil or register writes). Pipelined
+                requests and the poller are not retried.
+            retry_deadline: time in seconds from the start of a call after
+                which it is not retried or 0 for no limit. A retry is only
+                started if it can finish within the deadline even if its
+                response times out, so a small deadline should be combined
+                with adaptive_timeout. See also `deadline`.
+            busy_backoff: delay in seconds before the first retry of a request
+                answered with 'slave device busy', doubled for each further retry
 
         Example:
             >>> client = SimpleModbusClient('localhost', port = 502, unit_id = 1)
@@ -79,49 +411,245 @@ class SimpleModbusClient:
             >>> print(client.write_single_register(0, 1234))
             >>> print(client.write_multiple_coils(0, [True, False, True]))
             >>> print(client.write_multiple_registers(0, [1234, 5678]))
+            >>> print(client.read_write_multiple_registers(0, 10, 0, [1234, 5678]))
             >>> client.close()
         """
         assert 0 <= unit_id < 256
+        assert 1 <= max_in_flight <= 0xFFFF, 'max_in_flight out of range'
 
         self.host = host
         self.port = port
         self.unit_id = unit_id
         self.timeout = timeout
         self.last_error = ''
+        self.last_exception_code = 0
         self._transaction_id = random.randint(0, 0xFFFF)
-        self._socket: None | socket.socket = None
+        self.transactions = 0
+        self._socket: None | _Socket = None
         self.debug = debug
+        self.max_in_flight = max_in_flight
+        self._pipeline_queue: deque[tuple[int, bytes, Future[bytes]]] = deque()
+        self._rx_buffer = bytearray(_RX_BUFFER_SIZE)
+        self._rx_view = memoryview(self._rx_buffer)
+        self._rx_start = 0
+        self._rx_end = 0
+        self._lock = threading.RLock()
+        self._transaction_lock: AbstractContextManager[Any] = self._lock
+        self.circuit_breaker = circuit_breaker
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self._breaker_open = False
+        self._breaker_stop = threading.Event()
+        self.nodelay = nodelay
+        self.keepalive_idle = keepalive_idle
+        self.user_timeout = user_timeout
+        self.probe_interval = probe_interval
+        self.probe_address = probe_address
+        self._probe_stop = threading.Event()
+        self._addresses: list[tuple[Any, ...]] = []
+        self._last_activity = time.monotonic()
+        self.stats = ClientStats() if metrics else None
+        self.trace = trace or (PrintTrace() if debug else None)
+        self.udp = udp
+        self.udp_retries = udp_retries
+        self._unanswered: dict[int, bytes] = dict()
+        self._retransmissions = 0
+        self._timed_out = False
+        self._resyncing = False
+        self.adaptive_timeout = adaptive_timeout
+        self.timeout_min = timeout_min
+        self.response_timeout = timeout
+        self.srtt = 0.0
+        self.rttvar = 0.0
+        self._sent_at = 0.0
+        self.retries = retries
+        self.retry_deadline = retry_deadline
+        self.busy_backoff = busy_backoff
+        self._deadline = 0.0
+
+    def _open_socket(self) -> _Socket | None:
+        """
+        Open a tcp connection to the configured modbus server. The resolved
+        addresses are cached and only resolved again if none of them
+        can be connected.
 
-    def connect(self) -> bool:
+        Returns:
+            connected socket or None if the connection failed
         """
-        Connect manual to the configured modbus server. Usually there is
-        no need to call this function since it is handled automatically.
+        sock = self._connect_addresses()
+        if sock:
+            return sock
+
+        try:
+            addresses = socket.getaddrinfo(self.host, self.port, socket.AF_UNSPEC,
+                                           socket.SOCK_DGRAM if self.udp else socket.SOCK_STREAM)
+        except socket.error:
+            return None
+
+        if addresses == self._addresses:
+            return None
+
+        self._addresses = addresses
+        return self._connect_addresses()
+
+    def _connect_addresses(self) -> socket.socket | None:
+        """
+        Connect to the first reachable cached address
+
+        Returns:
+            connected socket or None if the connection failed
         """
-        for af, st, pr, _, sa in socket.getaddrinfo(self.host, self.port,
-                                                    socket.AF_UNSPEC,
-                                                    socket.SOCK_STREAM):
+        for af, st, pr, _, sa in self._addresses:
             try:
-                self._socket = socket.socket(af, st, pr)
+                sock = socket.socket(af, st, pr)
             except socket.error:
-                self.close()
                 continue
             try:
-                self._socket.settimeout(self.timeout)
-                self._socket.connect(sa)
+                sock.settimeout(self.timeout)
+                self._configure_socket(sock)
+                sock.connect(sa)
+                sock.settimeout(self.response_timeout)
             except socket.error:
-                self.close()
+                sock.close()
                 continue
-            break
+            return sock
 
-        if self._socket:
+        return None
+
+    def _configure_socket(self, sock: socket.socket) -> None:
+        """
+        Apply the configured TCP options to a socket
+
+        Args:
+            sock: the socket to configure
+        """
+        if sock.family not in (socket.AF_INET, socket.AF_INET6) or sock.type != socket.SOCK_STREAM:
+            return
+
+        if self.nodelay:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        if self.keepalive_idle > 0:
+            idle = max(1, int(self.keepalive_idle))
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle)
+            elif hasattr(socket, 'TCP_KEEPALIVE'):
+                # macOS
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, idle)
+            if hasattr(socket, 'TCP_KEEPINTVL'):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, max(1, idle // 3))
+            if hasattr(socket, 'TCP_KEEPCNT'):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+
+        if self.user_timeout > 0 and hasattr(socket, 'TCP_USER_TIMEOUT'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT, int(self.user_timeout * 1000))
+
+    @_synchronized
+    def connect(self) -> bool:
+        """
+        Connect manual to the configured modbus server. Usually there is
+        no need to call this function since it is handled automatically.
+        """
+        if self._breaker_open:
+            self.last_error = 'connection failed (circuit breaker open)'
+            return False
+
+        sock = self._open_socket()
+        if sock:
+            self._connected(sock)
             return True
         else:
-            self.last_error = 'connection failed'
+            self._connect_failed()
             return False
 
+    def _connected(self, sock: _Socket) -> None:
+        """
+        Use a newly connected socket and start probing the connection
+
+        Args:
+            sock: the connected socket
+        """
+        self._socket = sock
+        self._last_activity = time.monotonic()
+        if self.stats:
+            self.stats.connects += 1
+        if self.probe_interval > 0:
+            self._probe_stop = threading.Event()
+            threading.Thread(target=self._probe_loop, args=(self._probe_stop,), daemon=True).start()
+
+    def _connect_failed(self) -> None:
+        """
+        Set the error of a failed connection attempt and open
+        the circuit breaker if enabled
+        """
+        self.last_error = 'connection failed'
+        if self.stats:
+            self.stats.connect_failures += 1
+        if self.circuit_breaker:
+            self._breaker_open = True
+            self._breaker_stop = threading.Event()
+            threading.Thread(target=self._reconnect_loop, args=(self._breaker_stop,), daemon=True).start()
+
+    def _reconnect_loop(self, stop: threading.Event) -> None:
+        """
+        Retry to connect with exponential backoff while the circuit breaker is open
+
+        Args:
+            stop: event that ends the retries
+        """
+        delay = self.backoff_min
+        while not stop.wait(delay):
+            sock = self._open_socket()
+            if sock:
+                with self._lock:
+                    if not stop.is_set() and not self._socket:
+                        self._breaker_open = False
+                        self._connected(sock)
+                        return
+                sock.close()
+                return
+            delay = min(delay * 2, self.backoff_max)
+
+    def _probe_loop(self, stop: threading.Event) -> None:
+        """
+        Send a probe request whenever the connection was idle
+        for `probe_interval` seconds
+
+        Args:
+            stop: event that ends probing, set when the connection is closed
+        """
+        while True:
+            remaining = self._last_activity + self.probe_interval - time.monotonic()
+            if stop.wait(max(remaining, 0.001)):
+                return
+            if remaining > 0:
+                continue
+
+            with self._transaction_lock:
+                if stop.is_set():
+                    return
+                last_error = self.last_error
+                self.read_holding_registers(self.probe_address, 1)
+                if stop.is_set():
+                    # connection was dropped, reconnect now instead of on next request
+                    self.connect()
+                self.last_error = last_error
+                if stop.is_set():
+                    return
+
+    @property
+    def breaker_state(self) -> str:
+        """
+        State of the circuit breaker: 'open' while calls fail immediately
+        because the server is unreachable, otherwise 'closed'
+        """
+        return 'open' if self._breaker_open else 'closed'
+
+    @_synchronized
     def close(self) -> bytes:
         """
-        Close connection
+        Close connection, stops reconnecting if the circuit breaker is open
 
         Returns:
             empty bytes object
@@ -129,9 +657,55 @@ class SimpleModbusClient:
         if self._socket:
             self._socket.close()
             self._socket = None
+            self._probe_stop.set()
+
+        if self._breaker_open:
+            self._breaker_open = False
+            self._breaker_stop.set()
+
+        if self.stats:
+            # responses to outstanding requests are lost
+            self.stats.reset_pending()
+        self._unanswered.clear()
 
+        self._rx_start = self._rx_end = 0
+        self._resyncing = False
         return bytes()
 
+    @overload
+    def prepare(self, function_code: Literal[0x01, 0x02], address: int, count: int = 1) -> 'PreparedRequest[bool]':
+        ...
+
+    @overload
+    def prepare(self, function_code: Literal[0x03, 0x04], address: int, count: int = 1) -> 'PreparedRequest[int]':
+        ...
+
+    @overload
+    def prepare(self, function_code: int, address: int, count: int = 1) -> 'PreparedRequest[Any]':
+        ...
+
+    def prepare(self, function_code: int, address: int, count: int = 1) -> 'PreparedRequest[Any]':
+        """
+        Prepare a read request for repeated execution. The frame is
+        encoded and the arguments are validated only once.
+
+        Args:
+            function_code: ModBus read function code (0x01 to 0x04)
+            address: Bit or register address (0 to 0xffff)
+            count: Number of bits (1 to 2000) or registers (1 to 125) to read
+
+        Returns:
+            Reusable request object
+
+        Example:
+            >>> client = SimpleModbusClient('localhost', port = 502, unit_id = 1)
+            >>> request = client.prepare(0x04, 0, 10)
+            >>> for _ in range(1000):
+            ...     print(request.execute())
+        """
+        return PreparedRequest(self, function_code, address, count)
+
+    @_transaction(_READ_COILS)
     def read_coils(self, bit_address: int, bit_lengths: int = 1) -> list[bool] | None:
         """
         ModBus function for reading coils (0x01)
@@ -143,30 +717,10 @@ class SimpleModbusClient:
         Returns:
             list of bool or None: Bits list or None if error
         """
-        assert 1 <= bit_lengths <= 2000, 'bit_lengths out of range'
-        assert bit_address + bit_lengths <= 0xffff, 'read after address 0xffff'
-
-        if not self.send_modbus_data(_READ_COILS, _from_words([bit_address, bit_lengths])):
-            return None
-
-        rx_data = self.receive_modbus_data()
-        if not rx_data:
-            return None
-
-        if len(rx_data) < 2:
-            self.last_error = 'received frame under min size'
-            return None
-
-        byte_count = rx_data[0]
-        bit_data = rx_data[1:]
-
-        if not (byte_count * 8 >= bit_lengths and
-                byte_count == len(bit_data)):
-            self.last_error = 'received frame size mismatch'
-            return None
-
-        return _get_bits(bit_data, bit_lengths)
+        bit_data = self._read_bits(_READ_COILS, bit_address, bit_lengths)
+        return None if bit_data is None else _get_bits(bit_data, bit_lengths)
 
+    @_transaction(_READ_DISCRETE_INPUTS)
     def read_discrete_inputs(self, bit_address: int, bit_lengths: int = 1) -> list[bool] | None:
         """
         ModBus function for reading discrete inputs (0x02)
@@ -178,30 +732,27 @@ class SimpleModbusClient:
         Returns:
             list of bool or None: Bits list or None if error
         """
-        assert 1 <= bit_lengths <= 2000, 'bit_lengths out of range'
-        assert bit_address + bit_lengths <= 0xffff, 'read after address 0xffff'
+        bit_data = self._read_bits(_READ_DISCRETE_INPUTS, bit_address, bit_lengths)
+        return None if bit_data is None else _get_bits(bit_data, bit_lengths)
 
-        if not self.send_modbus_data(_READ_DISCRETE_INPUTS, _from_words([bit_address, bit_lengths])):
-            return None
-
-        rx_data = self.receive_modbus_data()
-        if not rx_data:
-            return None
-
-        if len(rx_data) < 2:
-            self.last_error = 'received frame under minimum size'
-            return None
-
-        byte_count = rx_data[0]
-        bit_data = rx_data[1:]
+    @_transaction(_READ_DISCRETE_INPUTS)
+    def read_discrete_inputs_packed(self, bit_address: int, bit_lengths: int = 1) -> int | None:
+        """
+        ModBus function for reading discrete inputs (0x02) returning the
+        bits packed in an int, bit 0 is the input at bit_address. This
+        avoids creating a list for large input images.
 
-        if not (byte_count * 8 >= bit_lengths and
-                byte_count == len(bit_data)):
-            self.last_error = 'received frame size mismatch'
-            return None
+        Args:
+            bit_address: Bit address (0 to 0xffff)
+            bit_lengths: Number of bits to read (1 to 2000)
 
-        return _get_bits(bit_data, bit_lengths)
+        Returns:
+            int or None: Packed bits or None if error
+        """
+        bit_data = self._read_bits(_READ_DISCRETE_INPUTS, bit_address, bit_lengths)
+        return None if bit_data is None else _get_bits_packed(bit_data, bit_lengths)
 
+    @_transaction(_READ_HOLDING_REGISTERS)
     def read_holding_registers(self, register_address: int, word_lengths: int = 1) -> list[int] | None:
         """
         ModBus function for reading holding registers (0x03)
@@ -213,91 +764,117 @@ class SimpleModbusClient:
         Returns:
             list of int or None: Registers list or None if error
         """
-        assert 1 <= word_lengths <= 125, 'word_lengths out of range'
-        assert register_address + word_lengths <= 0xffff, 'read after address 0xffff'
+        reg_data = self._read_registers(_READ_HOLDING_REGISTERS, register_address, word_lengths)
+        return None if reg_data is None else _get_words(reg_data)
 
-        if not self.send_modbus_data(_READ_HOLDING_REGISTERS, _from_words([register_address, word_lengths])):
-            return None
+    @_transaction(_READ_INPUT_REGISTERS)
+    def read_input_registers(self, register_address: int, word_lengths: int = 1) -> list[int] | None:
+        """
+        ModBus function for reading input registers (0x04)
 
-        rx_data = self.receive_modbus_data()
-        if not rx_data:
-            return None
+        Args:
+            register_address: Register address (0 to 0xffff)
+            word_lengths: Number of registers to read (1 to 125)
 
-        if len(rx_data) < 2:
-            self.last_error = 'received frame under minimum size'
-            return None
+        Returns:
+            list of int or None: Registers list or None if error
+        """
+        reg_data = self._read_registers(_READ_INPUT_REGISTERS, register_address, word_lengths)
+        return None if reg_data is None else _get_words(reg_data)
 
-        byte_count = rx_data[0]
-        reg_data = rx_data[1:]
+    def _read_bits(self, function_code: int, bit_address: int, bit_lengths: int) -> memoryview | None:
+        """
+        Request bits and validate the response
 
-        if not (byte_count == 2 * word_lengths and
-                byte_count == len(reg_data)):
-            self.last_error = 'received frame size mismatch'
-            return None
+        Args:
+            function_code: _READ_COILS or _READ_DISCRETE_INPUTS
+            bit_address: Bit address (0 to 0xffff)
+            bit_lengths: Number of bits to read (1 to 2000)
 
-        return _get_words(reg_data)
+        Returns:
+            Packed bits of the response or None if error
+        """
+        return self._read(function_code, *_read_bits_request(bit_address, bit_lengths))
 
-    def read_input_registers(self, register_address: int, word_lengths: int = 1) -> list[int] | None:
+    def _read_registers(self, function_code: int, register_address: int, word_lengths: int) -> memoryview | None:
         """
-        ModBus function for reading input registers (0x04)
+        Request registers and validate the response
 
         Args:
+            function_code: _READ_HOLDING_REGISTERS or _READ_INPUT_REGISTERS
             register_address: Register address (0 to 0xffff)
             word_lengths: Number of registers to read (1 to 125)
 
         Returns:
-            list of int or None: Registers list or None if error
+            Register bytes of the response or None if error
         """
-        assert 1 <= word_lengths <= 125, 'word_lengths out of range'
-        assert register_address + word_lengths <= 0xffff, 'read after address 0xffff'
+        return self._read(function_code, *_read_registers_request(register_address, word_lengths))
 
-        if not self.send_modbus_data(_READ_INPUT_REGISTERS, _from_words([register_address, word_lengths])):
-            return None
+    def _read(self, function_code: int, body: bytes, byte_count: int) -> memoryview | None:
+        """
+        Send a request and validate the byte count of its response
 
-        rx_data = self.receive_modbus_data()
-        if not rx_data:
-            return None
+        Args:
+            function_code: ModBus function code
+            body: data
+            byte_count: expected number of data bytes of the response
 
-        if len(rx_data) < 2:
-            self.last_error = 'received frame under minimum size'
+        Returns:
+            Data bytes of the response or None if error
+        """
+        if not self.send_modbus_data(function_code, body):
             return None
 
-        byte_count = rx_data[0]
-        reg_data = rx_data[1:]
+        rx_data = self._receive_data()
+        if not rx_data:
+            return None
 
-        if not (byte_count == 2 * word_lengths and
-                byte_count == len(reg_data)):
-            self.last_error = 'received frame size mismatch'
+        error = _read_response_error(rx_data, byte_count)
+        if error:
+            self.last_error = error
             return None
 
-        return _get_words(reg_data)
+        return rx_data[1:]
 
-    def write_single_coil(self, bit_address: int, value: bool) -> bool:
+    def _write(self, function_code: int, tx_data: bytes, echo_length: int) -> bool:
         """
-        ModBus function for writing a single coil (0x05)
+        Send a write request and validate its response
 
         Args:
-            bit_address: Bit address (0 to 0xffff)
-            value: Value to write (single bit)
+            function_code: ModBus function code
+            tx_data: request body
+            echo_length: number of leading request bytes the response repeats
 
         Returns:
             True if write succeeded or False if failed
         """
-        assert 0 <= bit_address <= 0xffff, 'bit_address out of range'
-
-        tx_data = _from_words([bit_address, 0xFF00 * bool(value)])
-        if not self.send_modbus_data(_WRITE_SINGLE_COIL, tx_data):
+        if not self.send_modbus_data(function_code, tx_data):
             return False
 
-        data = self.receive_modbus_data()
-        if not data:
+        rx_data = self._receive_data()
+        if not rx_data:
             return False
 
-        if len(data) != 4:
-            self.last_error = 'received frame size mismatch'
+        error = _write_response_error(rx_data, tx_data, echo_length)
+        if error:
+            self.last_error = error
             return False
 
-        return data == tx_data
+        return True
+
+    @_transaction(_WRITE_SINGLE_COIL)
+    def write_single_coil(self, bit_address: int, value: bool) -> bool:
+        """
+        ModBus function for writing a single coil (0x05)
+
+        Args:
+            bit_address: Bit address (0 to 0xffff)
+            value: Value to write (single bit)
+
+        Returns:
+            True if write succeeded or False if failed
+        """
+        return self._write(_WRITE_SINGLE_COIL, _write_single_coil_request(bit_address, value), 4)
 
     def read_discrete_input(self, address: int) -> bool | None:
         """
@@ -331,6 +908,7 @@ class SimpleModbusClient:
         else:
             return None
 
+    @_transaction(_WRITE_SINGLE_REGISTER)
     def write_single_register(self, register_address: int, value: int) -> bool:
         """
         ModBus function for writing a single register (0x06)
@@ -342,23 +920,9 @@ class SimpleModbusClient:
         Returns:
             True if write succeeded or False if failed
         """
-        assert 0 <= register_address <= 0xffff, 'register_address out of range'
-        assert 0 <= value <= 0xffff, 'value out of range 0 to 0xffff'
-
-        tx_data = _from_words([register_address, value])
-        if not self.send_modbus_data(_WRITE_SINGLE_REGISTER, tx_data):
-            return False
-
-        data = self.receive_modbus_data()
-        if not data:
-            return False
-
-        if len(data) != 4:
-            self.last_error = 'received frame size mismatch'
-            return False
-
-        return data == tx_data
+        return self._write(_WRITE_SINGLE_REGISTER, _write_single_register_request(register_address, value), 4)
 
+    @_transaction(_WRITE_MULTIPLE_COILS)
     def write_multiple_coils(self, bit_address: int, values: list[bool]) -> bool:
         """
         ModBus function for writing multiple coils (0x0F)
@@ -370,24 +934,9 @@ class SimpleModbusClient:
         Returns:
             True if write succeeded or False if failed
         """
-        assert bit_address + len(values) <= 0xffff, 'bit_address out of range'
-        assert 1 <= len(values) <= 2000, 'number values must be from 1 to 2000'
-
-        byte_count = (len(values) + 7) // 8
-        tx_data = struct.pack('>HHB', bit_address, len(values), byte_count) + _from_bits(values)
-        if not self.send_modbus_data(_WRITE_MULTIPLE_COILS, tx_data):
-            return False
-
-        data = self.receive_modbus_data()
-        if not data:
-            return False
-
-        if len(data) != 4:
-            self.last_error = 'received frame size mismatch'
-            return False
-
-        return _get_words(data[0:1])[0] == bit_address
+        return self._write(_WRITE_MULTIPLE_COILS, _write_multiple_coils_request(bit_address, values), 2)
 
+    @_transaction(_WRITE_MULTIPLE_REGISTERS)
     def write_multiple_registers(self, register_address: int, values: list[int]) -> bool:
         """
         ModBus function for writing multiple registers (0x10)
@@ -399,56 +948,123 @@ class SimpleModbusClient:
         Returns:
             True if write succeeded or False if failed
         """
-        assert register_address + len(values) <= 0xffff, 'register_address out of range'
-        assert max(values) <= 0xffff, 'value out of range 0 to 0xffff'
-        assert min(values) >= 0, 'value out of range 0 to 0xffff'
+        return self._write(_WRITE_MULTIPLE_REGISTERS, _write_multiple_registers_request(register_address, values), 2)
 
-        byte_count = len(values) * 2
-        tx_data = struct.pack('>HHB', register_address, len(values), byte_count) + _from_words(values)
-        if not self.send_modbus_data(_WRITE_MULTIPLE_REGISTERS, tx_data):
-            return False
+    @_transaction(_READ_WRITE_MULTIPLE_REGISTERS)
+    def read_write_multiple_registers(self, read_address: int, read_lengths: int,
+                                      write_address: int, values: list[int]) -> list[int] | None:
+        """
+        ModBus function for writing and reading multiple registers in
+        one transaction (0x17). The write is performed before the read.
+
+        Args:
+            read_address: Register address to read from (0 to 0xffff)
+            read_lengths: Number of registers to read (1 to 125)
+            write_address: Register address to write to (0 to 0xffff)
+            values: List of 16 bit register values to write (1 to 121 values)
+
+        Returns:
+            list of int or None: Read registers list or None if error
+        """
+        reg_data = self._read(_READ_WRITE_MULTIPLE_REGISTERS,
+                              *_read_write_registers_request(read_address, read_lengths, write_address, values))
+        return None if reg_data is None else _get_words(reg_data)
+
+    def _recv(self) -> bool:
+        """
+        Receive data into the receive buffer. As many bytes as available
+        are read with one recv call, blocks until at least one byte is
+        received. With UDP one datagram is received; invalid datagrams
+        are dropped and unanswered requests are retransmitted on timeout.
 
-        data = self.receive_modbus_data()
-        if not data:
+        Returns:
+            True if receiving can be continued or False if an error occurred
+            or the connection was closed by the server
+        """
+        if not self._socket:
             return False
 
-        if len(data) != 4:
-            self.last_error = 'received frame size mismatch'
+        if self._rx_end + _MAX_FRAME_SIZE > _RX_BUFFER_SIZE:
+            # move remaining bytes to the beginning of the buffer
+            remaining = self._rx_view[self._rx_start:self._rx_end].tobytes()
+            self._rx_buffer[:len(remaining)] = remaining
+            self._rx_start, self._rx_end = 0, len(remaining)
+
+        self._timed_out = False
+        try:
+            received = self._socket.recv_into(self._rx_view[self._rx_end:])
+        except socket.timeout:
+            return self._handle_timeout()
+        except socket.error:
             return False
 
-        return _get_words(data[0:1])[0] == register_address
+        if self.udp:
+            return self._accept_datagram(received)
 
-    def _recv(self, number_of_bytes: int) -> bytes:
-        """
-        Receive data over tcp, wait until all specified bytes are received
+        self._rx_end += received
+        return received > 0
 
-        Args:
-            number_of_bytes: Number of bytes to receive
+    def _handle_timeout(self) -> bool:
+        """
+        Account a receive timeout, double the adaptive response timeout
+        and retransmit unanswered UDP requests
 
         Returns:
-            returns received bytes or empty an bytes object if an error occurred
+            True if the requests were retransmitted and receiving can
+            be continued, False if the outstanding requests failed
         """
-        if not self._socket:
-            return bytes()
-
-        buffer = bytes()
-        while len(buffer) < number_of_bytes:
-            try:
-                tx_data = self._socket.recv(number_of_bytes - len(buffer))
-            except socket.error:
-                return bytes()
+        self._timed_out = True
+        if self.stats:
+            self.stats.timeouts += 1
+        if self.adaptive_timeout:
+            self._set_response_timeout(self.response_timeout * 2)
+        if self.udp and self._unanswered and self._retransmissions < self.udp_retries:
+            self._retransmissions += 1
+            return self._send_datagrams(list(self._unanswered.values()))
+        if self.stats:
+            # the outstanding requests failed, late responses are stale
+            self.stats.reset_pending()
+        return False
+
+    def _send_datagrams(self, frames: list[bytes]) -> bool:
+        """
+        Send each frame as a UDP datagram and keep it for retransmission
+        until the response is received
 
-            if tx_data:
-                buffer += tx_data
-            else:
-                return bytes()
+        Returns:
+            True if all frames were sent
+        """
+        assert self._socket
+        try:
+            for frame in frames:
+                self._unanswered[struct.unpack_from('>H', frame)[0]] = frame
+                self._socket.send(frame)
+        except socket.error:
+            return False
+        return True
 
-        if self.debug:
-            print(f"<- Received: {' '.join(hex(b) for b in buffer)}")
+    def _accept_datagram(self, size: int) -> bool:
+        """
+        Check a datagram received at the end of the receive buffer. Datagrams
+        that are no complete response to an unanswered request, for example
+        duplicates caused by retransmissions, are dropped.
 
-        return buffer
+        Args:
+            size: size of the datagram
 
-    def _send(self, data: bytes) -> int:
+        Returns:
+            Always True
+        """
+        if size >= 8:
+            transaction_id, protocol_identifier, length, unit_id = \
+                struct.unpack_from('>HHHB', self._rx_buffer, self._rx_end)
+            if (protocol_identifier == 0 and unit_id == self.unit_id and
+                    length + 6 == size and transaction_id in self._unanswered):
+                del self._unanswered[transaction_id]
+                self._rx_end += size
+        return True
+
+    def _send(self, data: bytes | bytearray) -> int:
         """
         Send data over tcp
 
@@ -462,9 +1078,13 @@ class SimpleModbusClient:
         for _ in range(2):
             if self._socket:
                 try:
-                    self._socket.sendall(data)
-                    if self.debug:
-                        print(f"-> Send:     {' '.join(hex(b) for b in data)}")
+                    if self.udp:
+                        self._retransmissions = 0
+                        if not self._send_datagrams(_split_frames(bytes(data))):
+                            raise socket.error('sending datagram failed')
+                    else:
+                        self._socket.sendall(data)
+                    self._record_sent(data)
                     return len(data)
                 except socket.error:
                     self.last_error = 'sending data failed'
@@ -475,59 +1095,513 @@ class SimpleModbusClient:
 
         return 0
 
-    def send_modbus_data(self, function_code: int, body: bytes) -> int:
+    def _record_sent(self, data: bytes | bytearray) -> None:
         """
-        Send raw ModBus TCP frame
+        Account sent frames in the statistics and the trace
 
         Args:
-            unction_code: ModBus function code
-            body: data
+            data: the sent frames
+        """
+        self._last_activity = self._sent_at = time.monotonic()
+        if self.stats:
+            self.stats._record_send(data)
+        if self.trace:
+            self.trace.record(TRACE_SEND, data)
+
+    def _next_transaction_id(self) -> int:
+        """
+        Advance the transaction id for a new request
 
         Returns:
-            number of transmitted bytes or 0 if transmission failed
+            The new transaction id
         """
         self._transaction_id = (self._transaction_id + 1) % 0x10000
+        self.transactions += 1
+        self.last_exception_code = 0
+        return self._transaction_id
+
+    def _build_frame(self, function_code: int, body: bytes) -> bytes:
+        """
+        Build a ModBus TCP frame with a new transaction id
+
+        Args:
+            function_code: ModBus function code
+            body: data
+
+        Returns:
+            Complete frame including the MBAP header
+        """
         protocol_identifier = 0
         length = len(body) + 2
-        header = struct.pack('>HHHBB', self._transaction_id,
+        header = struct.pack('>HHHBB', self._next_transaction_id(),
                              protocol_identifier, length, self.unit_id,
                              function_code)
-        frame = header + body
+        return header + body
 
-        return self._send(frame)
+    @contextmanager
+    def deadline(self, seconds: float) -> Iterator[None]:
+        """
+        Context manager that sets a common deadline for the retries of all
+        calls within the block, e.g. the time budget of a control cycle.
+        It overrides `retry_deadline` if it ends earlier.
 
-    def receive_modbus_data(self) -> bytes:
+        Args:
+            seconds: time in seconds from now
+
+        Example:
+            >>> client = SimpleModbusClient('localhost', retries=3, adaptive_timeout=True)
+            >>> with client.deadline(0.01):
+            ...     inputs = client.read_input_registers(0, 10)
+            ...     client.write_single_register(0x0800, 1234)
         """
-        Receive a ModBus frame
+        previous = self._deadline
+        self._deadline = time.monotonic() + seconds
+        try:
+            yield
+        finally:
+            self._deadline = previous
+
+    def _with_retries(self, function_code: int, call: Callable[[], _T]) -> _T:
+        """
+        Run a transaction serialized across threads and repeat it
+        according to the retry policy while it fails
+
+        Args:
+            function_code: ModBus function code of the transaction
+            call: function doing the transaction, returns None or
+                False if it failed
 
         Returns:
-            bytes received or empty bytes object if an error occurred
+            Result of the last call
         """
-        header = self._recv(7)
-        if not header:
-            self.last_error = 'receiving return frame failed'
-            return self.close()
+        with self._transaction_lock:
+            start = time.monotonic()
+            result = call()
+            attempt = 0
+            while (result is None or result is False) and self._retry(function_code, attempt, start):
+                attempt += 1
+                result = call()
+            return result
+
+    def _retry(self, function_code: int, attempt: int, start: float) -> bool:
+        """
+        Decide if a failed call is repeated and wait for the busy backoff
+
+        Args:
+            function_code: ModBus function code of the call
+            attempt: number of retries done so far
+            start: monotonic time of the start of the call
+
+        Returns:
+            True if the call has to be repeated
+        """
+        if attempt >= self.retries:
+            return False
+
+        if self.last_exception_code == _SLAVE_DEVICE_BUSY:
+            delay = self.busy_backoff * 2 ** attempt
+        elif self.last_exception_code or function_code not in _IDEMPOTENT_FUNCTIONS:
+            return False
+        else:
+            delay = 0.0
+
+        deadline = self._deadline
+        if self.retry_deadline and (not deadline or start + self.retry_deadline < deadline):
+            deadline = start + self.retry_deadline
+        if deadline and time.monotonic() + delay + self.response_timeout > deadline:
+            return False
+
+        if self.stats:
+            self.stats.retries += 1
+        if delay:
+            time.sleep(delay)
+        return True
+
+    def send_modbus_data(self, function_code: int, body: bytes) -> int:
+        """
+        Send raw ModBus TCP frame
+
+        Args:
+            function_code: ModBus function code
+            body: data
+
+        Returns:
+            number of transmitted bytes or 0 if transmission failed
+        """
+        return self._send(self._build_frame(function_code, body))
+
+    def _next_frame(self) -> tuple[int, memoryview] | None:
+        """
+        Take the next complete frame from the receive buffer without
+        receiving data
+
+        Returns:
+            None if no complete frame is buffered, otherwise tuple of
+            transaction id and the frame data starting with the function
+            code; data is empty if the frame is invalid
+        """
+        if self._rx_end - self._rx_start < 7:
+            return None
 
         transaction_id, protocol_identifier, length, unit_id =\
-            struct.unpack('>HHHB', header)
+            struct.unpack_from('>HHHB', self._rx_buffer, self._rx_start)
 
-        if not ((transaction_id == self._transaction_id) and
-                (protocol_identifier == 0) and
+        if not ((protocol_identifier == 0) and
                 (unit_id == self.unit_id) and
-                (length <= 0xFF) and
-                (transaction_id == self._transaction_id)):
+                (2 <= length <= 0xFF)):
             self.last_error = 'received frame is invalid'
-            return self.close()
+            self.close()
+            return 0, self._rx_view[0:0]
+
+        if self._rx_end - self._rx_start < length + 6:
+            return None
+
+        start = self._rx_start
+        self._rx_start += length + 6
+        if self._rx_start == self._rx_end:
+            self._rx_start = self._rx_end = 0
+
+        if self.trace:
+            self.trace.record(TRACE_RECEIVE, self._rx_view[start:start + length + 6])
+
+        data = self._rx_view[start + 7:start + length + 6]
+        if self.stats:
+            self.stats._record_receive(transaction_id, data)
 
-        data = self._recv(length - 1)
-        if not data:
+        self._resyncing = False
+        if self.adaptive_timeout and transaction_id == self._transaction_id and not self._retransmissions:
+            self._update_response_timeout(time.monotonic() - self._sent_at)
+        return transaction_id, data
+
+    def _update_response_timeout(self, rtt: float) -> None:
+        """
+        Add a round trip time sample to the smoothed round trip time
+        and its variation and derive the response timeout (RFC 6298)
+
+        Args:
+            rtt: round trip time in seconds
+        """
+        if self.srtt:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        else:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        self._set_response_timeout(self.srtt + 4 * self.rttvar)
+
+    def _set_response_timeout(self, response_timeout: float) -> None:
+        """
+        Limit the response timeout to timeout_min and timeout and
+        apply it to the socket
+        """
+        self.response_timeout = min(max(response_timeout, self.timeout_min), self.timeout)
+        if self._socket:
+            self._socket.settimeout(self.response_timeout)
+
+    def _receive_frame(self) -> tuple[int, memoryview]:
+        """
+        Receive a ModBus frame with any transaction id. The header and
+        usually the payload are fetched with a single recv call. After
+        a TCP timeout between frames the connection is kept, so that a
+        late response can be discarded by `_discard_stale` instead of
+        reconnecting; a second timeout in a row closes the connection.
+
+        Returns:
+            Tuple of transaction id and the frame data starting with the
+            function code; data is empty if an error occurred
+        """
+        while True:
+            frame = self._next_frame()
+            if frame:
+                return frame
+
+            if not self._recv():
+                return self._receive_failed()
+
+    def _receive_failed(self) -> tuple[int, memoryview]:
+        """
+        Set the error of a failed receive and close the connection,
+        unless it is the first timeout in a row between frames
+
+        Returns:
+            Transaction id 0 and an empty view
+        """
+        if self._rx_end > self._rx_start:
             self.last_error = 'receiving data payload failed'
-            return self.close()
+        else:
+            self.last_error = 'receiving return frame failed'
+            if self._timed_out and not self.udp and not self._resyncing:
+                self._resyncing = True
+                return 0, self._rx_view[0:0]
+        self.close()
+        return 0, self._rx_view[0:0]
+
+    def _discard_stale(self, transaction_id: int, oldest: int) -> bool:
+        """
+        Check if a received frame answers a request older than the oldest
+        outstanding one, typically a late response after a timeout. Its
+        payload was already skipped by the length field, the frame is
+        dropped and the connection kept.
+
+        Args:
+            transaction_id: transaction id of the received frame
+            oldest: transaction id of the oldest outstanding request
+
+        Returns:
+            True if the frame is stale and has to be ignored
+        """
+        if not 0 < (oldest - transaction_id) % 0x10000 < 0x8000:
+            return False
+        if self.stats:
+            self.stats.stale_frames += 1
+        return True
+
+    def _check_exception(self, data: memoryview) -> memoryview:
+        """
+        Strip the function code from received frame data
+
+        Args:
+            data: frame data starting with the function code
 
+        Returns:
+            frame payload or empty bytes object if the server
+            returned an exception
+        """
         if data[0] > 0x80:
+            self.last_exception_code = data[1]
             self.last_error = f"return error: {_modbus_exceptions.get(data[1], '')} ({data[1]})"
             if self.debug:
                 print(self.last_error)
-            return bytes()
+            return data[0:0]
 
         return data[1:]
+
+    def receive_modbus_data(self) -> bytes:
+        """
+        Receive a ModBus frame
+
+        Returns:
+            bytes received or empty bytes object if an error occurred
+        """
+        return self._receive_data().tobytes()
+
+    def _receive_data(self) -> memoryview:
+        """
+        Receive a ModBus frame without copying it from the receive buffer
+
+        Returns:
+            view of the received bytes that is valid until the next receive
+            call or an empty view if an error occurred
+        """
+        while True:
+            transaction_id, data = self._receive_frame()
+            if not data:
+                return data
+
+            if transaction_id == self._transaction_id:
+                return self._check_exception(data)
+
+            if not self._discard_stale(transaction_id, self._transaction_id):
+                self.last_error = 'received frame is invalid'
+                self.close()
+                return data[0:0]
+
+    def submit(self, function_code: int, body: bytes,
+               callback: Callable[[bytes], None] | None = None) -> 'Future[bytes]':
+        """
+        Queue a raw ModBus request for pipelined transmission. Queued
+        requests are sent by `flush`, which keeps up to `max_in_flight`
+        requests on the wire and matches the responses by transaction id.
+
+        Args:
+            function_code: ModBus function code
+            body: data
+            callback: optional function called with the response payload
+                when the response is received
+
+        Returns:
+            Future that resolves to the response payload as returned by
+            `receive_modbus_data` (empty bytes object if an error occurred)
+
+        Example:
+            >>> client = SimpleModbusClient('localhost', max_in_flight=16)
+            >>> futures = [client.submit(0x04, struct.pack('>HH', addr, 1))
+            ...            for addr in range(40)]
+            >>> client.flush()
+            >>> print([f.result() for f in futures])
+        """
+        future: Future[bytes] = Future()
+        if callback:
+            future.add_done_callback(lambda f: callback(f.result()))
+        self._pipeline_queue.append((function_code, body, future))
+        return future
+
+    @_synchronized
+    def flush(self) -> bool:
+        """
+        Send all requests queued by `submit` and receive their responses
+
+        Returns:
+            True if all responses were received, False if a transmission
+            error occurred. In this case all outstanding futures resolve
+            to an empty bytes object.
+        """
+        in_flight: dict[int, Future[bytes]] = dict()
+
+        while self._pipeline_queue or in_flight:
+            frames: list[bytes] = []
+            while self._pipeline_queue and len(in_flight) < self.max_in_flight:
+                function_code, body, future = self._pipeline_queue.popleft()
+                frames.append(self._build_frame(function_code, body))
+                in_flight[self._transaction_id] = future
+
+            if frames and not self._send(b''.join(frames)):
+                return self._abort_pipeline(in_flight)
+
+            transaction_id, data = self._receive_frame()
+            if not data:
+                return self._abort_pipeline(in_flight)
+
+            if transaction_id not in in_flight:
+                if self._discard_stale(transaction_id, next(iter(in_flight))):
+                    continue
+                self.last_error = 'received frame is invalid'
+                self.close()
+                return self._abort_pipeline(in_flight)
+
+            in_flight.pop(transaction_id).set_result(self._check_exception(data).tobytes())
+
+        return True
+
+    def _abort_pipeline(self, in_flight: dict[int, 'Future[bytes]']) -> bool:
+        """
+        Resolve all in flight and queued requests with an empty bytes object
+
+        Returns:
+            Always False
+        """
+        futures = list(in_flight.values()) + [f for _, _, f in self._pipeline_queue]
+        in_flight.clear()
+        self._pipeline_queue.clear()
+        for future in futures:
+            future.set_result(bytes())
+        return False
+
+
+class PreparedRequest(Generic[_T]):
+    """
+    Reusable ModBus read request with a pre-encoded frame. Only the
+    transaction id is updated for each execution.
+
+    Attributes:
+        client (SimpleModbusClient): client used for the transmission
+        function_code (int): ModBus function code
+        address (int): Bit or register address
+        count (int): Number of bits or registers
+    """
+
+    def __init__(self, client: SimpleModbusClient, function_code: int, address: int, count: int = 1):
+        """
+        Instantiate a prepared request, see `SimpleModbusClient.prepare`
+        """
+        assert function_code in (_READ_COILS, _READ_DISCRETE_INPUTS, _READ_HOLDING_REGISTERS, _READ_INPUT_REGISTERS), \
+            'function_code is not a read function'
+
+        self._word_decoder: struct.Struct | None = None
+        if function_code in (_READ_COILS, _READ_DISCRETE_INPUTS):
+            assert 1 <= count <= 2000, 'count out of range'
+            byte_count = (count + 7) // 8
+        else:
+            assert 1 <= count <= 125, 'count out of range'
+            byte_count = count * 2
+            self._word_decoder = struct.Struct(f">{count}H")
+        assert address + count <= 0xffff, 'read after address 0xffff'
+
+        self.client = client
+        self.function_code = function_code
+        self.address = address
+        self.count = count
+        self._byte_count = byte_count
+        # frame without transaction id
+        self._frame_tail = struct.pack('>HHBBHH', 0, 6, client.unit_id, function_code, address, count)
+
+    def encode(self, transaction_id: int) -> bytes:
+        """
+        Get the request frame for a transaction id. Each call returns
+        a new frame, so requests can be encoded by several threads.
+
+        Args:
+            transaction_id: ModBus transaction id
+
+        Returns:
+            The frame including MBAP header
+        """
+        return transaction_id.to_bytes(2, 'big') + self._frame_tail
+
+    def decode(self, rx_data: memoryview) -> list[_T] | None:
+        """
+        Decode the response payload as returned by `SimpleModbusClient.receive_modbus_data`
+
+        Args:
+            rx_data: response payload
+
+        Returns:
+            list of bool for bit or list of int for register read functions
+            or None if error
+        """
+        if not rx_data:
+            return None
+
+        error = _read_response_error(rx_data, self._byte_count)
+        if error:
+            self.client.last_error = error
+            return None
+
+        if self._word_decoder:
+            return list(self._word_decoder.unpack_from(rx_data, 1))
+        else:
+            return _get_bits(rx_data[1:], self.count)  # type: ignore[return-value]
+
+    def execute(self) -> list[_T] | None:
+        """
+        Send the request and wait for the response
+
+        Returns:
+            list of bool for bit or list of int for register read functions
+            or None if error
+        """
+        return self.client._with_retries(self.function_code, self._execute_once)
+
+    def _execute_once(self) -> list[_T] | None:
+        client = self.client
+        if not client._send(self.encode(client._next_transaction_id())):
+            return None
+        return self.decode(client._receive_data())
+
+
+class OfflineModbusClient(SimpleModbusClient):
+    """
+    Modbus client without connection. All requests fail with the error
+    'offline' without network access. Useful for computing the address
+    layout of a bus coupler or for bus couplers whose requests are sent
+    by other means.
+    """
+
+    def __init__(self, unit_id: int = 1):
+        """
+        Instantiate an offline client
+
+        Args:
+            unit_id: ModBus id used to build frames
+
+        Example:
+            >>> from pyhoff.devices import *
+            >>> bk = BK9050('offline', modbus=OfflineModbusClient())
+            >>> bk.add_bus_terminals(KL1104, KL3202)
+            >>> print(bk.select(KL3202)._input_word_addresses)
+        """
+        super().__init__('offline', unit_id=unit_id)
+
+    def _send(self, data: bytes | bytearray) -> int:
+        self.last_error = 'offline'
+        return 0
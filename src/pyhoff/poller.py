@@ -0,0 +1,303 @@
+import errno
+import selectors
+import socket
+import time
+from collections import deque
+from contextlib import ExitStack
+from itertools import chain
+from typing import Any, Callable, Iterable
+from .modbus import SimpleModbusClient, PreparedRequest, _split_frames
+
+_Callback = Callable[[Any], None]
+
+
+class Poller:
+    """
+    Polls the prepared read requests of many Modbus TCP clients from a
+    single thread. The requests of all clients are sent pipelined and the
+    responses are multiplexed by a selector, so a scan of many bus couplers
+    takes about the time of the slowest coupler instead of the sum of all.
+
+    Attributes:
+        timeout (float): time in seconds a scan waits for outstanding responses
+    """
+
+    def __init__(self, timeout: float = 5):
+        """
+        Instantiate a poller
+
+        Args:
+            timeout: time in seconds a scan waits for outstanding responses
+
+        Example:
+            >>> from pyhoff.modbus import SimpleModbusClient
+            >>> poller = Poller(timeout=1)
+            >>> for host in ('192.168.0.23', '192.168.0.24'):
+            ...     client = SimpleModbusClient(host)
+            ...     poller.add(client.prepare(0x04, 0, 8), lambda words, h=host: print(h, words))
+            >>> poller.poll()
+        """
+        self.timeout = timeout
+        self._requests: dict[SimpleModbusClient, list[tuple[PreparedRequest[Any], _Callback]]] = dict()
+
+    def add(self, request: PreparedRequest[Any], callback: _Callback) -> None:
+        """
+        Add a request to the scan. Requests are executed in the order
+        they are added.
+
+        Args:
+            request: prepared read request, see `SimpleModbusClient.prepare`
+            callback: function called on each scan with the decoded
+                result or None if an error occurred
+        """
+        self._requests.setdefault(request.client, []).append((request, callback))
+
+    def remove(self, client: SimpleModbusClient) -> None:
+        """
+        Remove all requests of a client from the scan
+
+        Args:
+            client: The client to remove
+        """
+        self._requests.pop(client, None)
+
+    @property
+    def clients(self) -> list[SimpleModbusClient]:
+        """
+        Clients with requests in the scan
+        """
+        return list(self._requests)
+
+    def poll(self) -> bool:
+        """
+        Execute all requests once and call their callbacks. Connections
+        are opened or reopened as needed. Connecting, sending and
+        receiving do not block, so an unreachable bus coupler does not
+        delay the others; clients that are not done within `timeout`
+        fail. A failed client is closed and the callbacks of its
+        outstanding requests get None.
+
+        Returns:
+            True if all requests succeeded, False if an error occurred.
+            The error message is found in `last_error` of the failed clients.
+        """
+        success = True
+        deadline = time.monotonic() + self.timeout
+        scans: dict[SimpleModbusClient, _Scan] = dict()
+
+        def fail(client: SimpleModbusClient, requests: Iterable[tuple[PreparedRequest[Any], _Callback]],
+                 error: str = '') -> None:
+            nonlocal success
+            success = False
+            if error:
+                client.last_error = error
+            if client._socket:
+                client.close()
+            for _, callback in requests:
+                callback(None)
+
+        def fail_scan(scan: _Scan, error: str = '') -> None:
+            selector.unregister(scan.sock)
+            del scans[scan.client]
+            if scan.connecting:
+                scan.sock.close()
+                scan.client._connect_failed()
+            fail(scan.client, chain(scan.pending.values(), scan.queue), error)
+
+        def update(scan: _Scan) -> None:
+            events = selectors.EVENT_WRITE if scan.connecting or scan.output else 0
+            if scan.pending:
+                events |= selectors.EVENT_READ
+            if events:
+                selector.modify(scan.sock, events, scan)
+            else:
+                # all requests done
+                selector.unregister(scan.sock)
+                del scans[scan.client]
+                scan.sock.settimeout(scan.client.response_timeout)
+
+        with ExitStack() as stack, selectors.DefaultSelector() as selector:
+            for client, requests in self._requests.items():
+                stack.enter_context(client._lock)
+                sock = client._socket
+                address_index = 0
+                if not sock:
+                    connection = _start_connect(client)
+                    if not connection:
+                        fail(client, requests)
+                        continue
+                    sock, address_index = connection
+                elif not isinstance(sock, socket.socket):
+                    fail(client, requests, 'socket can not be polled')
+                    continue
+
+                sock.settimeout(0)
+                scan = scans[client] = _Scan(client, sock, requests, connecting=not client._socket)
+                scan.address_index = address_index
+                selector.register(sock, selectors.EVENT_WRITE, scan)
+                if not scan.connecting and not scan.send():
+                    fail_scan(scan, 'connection lost')
+                    continue
+                update(scan)
+
+            while scans:
+                events = selector.select(max(deadline - time.monotonic(), 0))
+                if not events:
+                    for scan in list(scans.values()):
+                        fail_scan(scan, '' if scan.connecting else 'poll timeout')
+                    break
+
+                for key, mask in events:
+                    scan = key.data
+                    client = scan.client
+                    if client not in scans:
+                        continue
+
+                    if scan.connecting:
+                        if scan.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR):
+                            # try the next address of the client
+                            selector.unregister(scan.sock)
+                            scan.sock.close()
+                            connection = _start_connect(client, scan.address_index + 1)
+                            if not connection:
+                                del scans[client]
+                                fail(client, scan.queue)
+                                continue
+                            scan.sock, scan.address_index = connection
+                            selector.register(scan.sock, selectors.EVENT_WRITE, scan)
+                            continue
+                        scan.connecting = False
+                        client._connected(scan.sock)
+
+                    if mask & selectors.EVENT_READ:
+                        if not client._recv():
+                            fail_scan(scan, 'receiving return frame failed')
+                            continue
+
+                        while client in scans and (frame := client._next_frame()):
+                            transaction_id, data = frame
+                            if not data:
+                                fail_scan(scan)
+                            elif transaction_id not in scan.pending:
+                                oldest = next(iter(scan.pending), client._transaction_id + 1)
+                                if not client._discard_stale(transaction_id, oldest):
+                                    fail_scan(scan, 'received frame is invalid')
+                            else:
+                                request, callback = scan.pending.pop(transaction_id)
+                                result = request.decode(client._check_exception(data))
+                                success &= result is not None
+                                callback(result)
+
+                        if client not in scans:
+                            continue
+
+                    if not scan.send():
+                        fail_scan(scan, 'connection lost')
+                    else:
+                        update(scan)
+
+        return success
+
+
+class _Scan:
+    """
+    Requests of one client during a poll
+
+    Attributes:
+        client (SimpleModbusClient): The polled client.
+        sock (socket.socket): Socket of the client, non-blocking during the poll.
+        queue (deque): Requests not yet sent.
+        pending (dict): Sent requests by transaction id.
+        output (bytearray): Frames not yet accepted by the socket.
+        connecting (bool): True while the connection is being established.
+        address_index (int): Index of the connected address in the
+            resolved addresses of the client.
+    """
+
+    def __init__(self, client: SimpleModbusClient, sock: socket.socket,
+                 requests: Iterable[tuple[PreparedRequest[Any], _Callback]], connecting: bool):
+        self.client = client
+        self.sock = sock
+        self.queue = deque(requests)
+        self.pending: dict[int, tuple[PreparedRequest[Any], _Callback]] = dict()
+        self.output = bytearray()
+        self.connecting = connecting
+        self.address_index = 0
+
+    def send(self) -> bool:
+        """
+        Encode queued requests while less than `max_in_flight` are
+        outstanding and send as much as the socket accepts
+
+        Returns:
+            False if the connection was lost
+        """
+        client = self.client
+        frames = bytearray()
+        while self.queue and len(self.pending) < client.max_in_flight:
+            request, callback = self.queue.popleft()
+            transaction_id = client._next_transaction_id()
+            frames += request.encode(transaction_id)
+            self.pending[transaction_id] = (request, callback)
+
+        if frames:
+            client._record_sent(frames)
+            if client.udp:
+                client._retransmissions = 0
+                return client._send_datagrams(_split_frames(bytes(frames)))
+            self.output += frames
+
+        if self.output:
+            try:
+                del self.output[:self.sock.send(self.output)]
+            except BlockingIOError:
+                pass
+            except socket.error:
+                return False
+        return True
+
+
+def _start_connect(client: SimpleModbusClient, first: int = 0) -> tuple[socket.socket, int] | None:
+    """
+    Start a non-blocking connection to the first address of a client
+    starting at index first that can be connected to. The socket
+    becomes writable when the connection is established or failed.
+    If no address is left, the addresses are resolved again like by
+    `SimpleModbusClient.connect`.
+
+    Args:
+        client: the client to connect
+        first: index of the first resolved address to try
+
+    Returns:
+        socket and index of its address or None if the connection failed
+    """
+    if client._breaker_open:
+        client.last_error = 'connection failed (circuit breaker open)'
+        return None
+
+    for index in range(first, len(client._addresses)):
+        af, st, pr, _, sa = client._addresses[index]
+        try:
+            sock = socket.socket(af, st, pr)
+        except socket.error:
+            continue
+
+        client._configure_socket(sock)
+        sock.settimeout(0)
+        if sock.connect_ex(sa) in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            return sock, index
+        sock.close()
+
+    try:
+        addresses = socket.getaddrinfo(client.host, client.port, socket.AF_UNSPEC,
+                                       socket.SOCK_DGRAM if client.udp else socket.SOCK_STREAM)
+    except socket.error:
+        addresses = client._addresses
+
+    if addresses != client._addresses:
+        client._addresses = addresses
+        return _start_connect(client)
+
+    client._connect_failed()
+    return None
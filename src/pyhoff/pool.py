@@ -0,0 +1,175 @@
+import threading
+import time
+from .modbus import SimpleModbusClient
+
+
+class ConnectionPool:
+    """
+    Pool of shared Modbus TCP clients, one per (host, port, unit_id). Bus
+    couplers often accept only a few concurrent Modbus TCP connections, so
+    all users of the same coupler should share one connection. Calls on a
+    shared client are serialized across threads; requests can be pipelined
+    by `SimpleModbusClient.submit` and `SimpleModbusClient.flush`.
+
+    All bus couplers using a pooled client share its state, including
+    `last_error`: `BusCoupler.get_error` of one bus coupler can return
+    the error of a request of another one.
+
+    Connections without requests for `idle_timeout` seconds are closed
+    to free connection slots of the bus coupler, also if the client is
+    still referenced; the client reconnects on its next request.
+
+    Attributes:
+        idle_timeout (float): time in seconds after which an idle connection
+            is closed and an idle client that is no longer referenced is
+            removed from the pool
+    """
+
+    def __init__(self, idle_timeout: float = 60):
+        """
+        Instantiate a connection pool
+
+        Args:
+            idle_timeout: time in seconds after which an idle connection is
+                closed and an idle client that is no longer referenced is
+                removed from the pool
+
+        Example:
+            >>> from pyhoff.devices import *
+            >>> pool = ConnectionPool(idle_timeout=10)
+            >>> bk1 = BK9050('192.168.0.23', modbus=pool.acquire('192.168.0.23'))
+            >>> bk2 = BK9050('192.168.0.23', modbus=pool.acquire('192.168.0.23'))
+            >>> assert bk1.modbus is bk2.modbus
+            >>> pool.release(bk1.modbus)
+            >>> pool.release(bk2.modbus)
+        """
+        self.idle_timeout = idle_timeout
+        self._clients: dict[tuple[str, int, int], SimpleModbusClient] = dict()
+        self._ref_counts: dict[tuple[str, int, int], int] = dict()
+        self._released_at: dict[tuple[str, int, int], float] = dict()
+        self._sweep_timer: threading.Timer | None = None
+        self._lock = threading.Lock()
+
+    def acquire(self, host: str, port: int = 502, unit_id: int = 1,
+                timeout: float = 5, debug: bool = False) -> SimpleModbusClient:
+        """
+        Get the shared client for the given server and increase its
+        reference count. A new client is created if none exists; timeout
+        and debug only apply in this case.
+
+        Args:
+            host: hostname or IP address
+            port: server port
+            unit_id: ModBus id
+            timeout: socket timeout in seconds
+            debug: if True prints out transmitted and received bytes in hex
+
+        Returns:
+            The shared client
+        """
+        key = (host, port, unit_id)
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = SimpleModbusClient(host, port, unit_id, timeout, debug)
+                self._ref_counts[key] = 0
+
+            self._ref_counts[key] += 1
+            self._released_at.pop(key, None)
+            self._schedule_sweep()
+            return self._clients[key]
+
+    def release(self, client: SimpleModbusClient) -> None:
+        """
+        Decrease the reference count of a client obtained by `acquire`.
+        The client is closed and removed from the pool after `idle_timeout`
+        seconds without requests if it is not acquired again.
+
+        Args:
+            client: The client to release
+        """
+        key = (client.host, client.port, client.unit_id)
+        with self._lock:
+            assert self._clients.get(key) is client, 'client is not from this pool'
+            assert self._ref_counts[key] > 0, 'client released more often than acquired'
+
+            self._ref_counts[key] -= 1
+            if self._ref_counts[key] == 0:
+                self._released_at[key] = time.monotonic()
+
+    def _schedule_sweep(self) -> None:
+        """
+        Start the timer of the next `_sweep` if none is running,
+        called with the pool lock held
+        """
+        if self._sweep_timer or not self._clients:
+            return
+        self._sweep_timer = threading.Timer(self.idle_timeout / 2, self._sweep)
+        self._sweep_timer.daemon = True
+        self._sweep_timer.start()
+
+    def _sweep(self) -> None:
+        """
+        Close the connections without requests for `idle_timeout` seconds
+        and remove idle clients that are no longer referenced. Clients
+        busy with a request are skipped.
+        """
+        now = time.monotonic()
+        removed: list[SimpleModbusClient] = []
+        idle: list[SimpleModbusClient] = []
+        with self._lock:
+            self._sweep_timer = None
+            for key, client in list(self._clients.items()):
+                if now - max(client._last_activity, self._released_at.get(key, 0)) < self.idle_timeout:
+                    continue
+                if self._ref_counts[key] == 0:
+                    del self._clients[key]
+                    del self._ref_counts[key]
+                    del self._released_at[key]
+                    removed.append(client)
+                elif client._socket:
+                    idle.append(client)
+            self._schedule_sweep()
+
+        for client in removed:
+            client.close()
+        for client in idle:
+            if client._lock.acquire(blocking=False):
+                try:
+                    if time.monotonic() - client._last_activity >= self.idle_timeout:
+                        client.close()
+                finally:
+                    client._lock.release()
+
+    def get_ref_count(self, host: str, port: int = 502, unit_id: int = 1) -> int:
+        """
+        Get the number of references to a client
+
+        Args:
+            host: hostname or IP address
+            port: server port
+            unit_id: ModBus id
+
+        Returns:
+            The reference count or 0 if the client is not in the pool
+        """
+        with self._lock:
+            return self._ref_counts.get((host, port, unit_id), 0)
+
+    def close_all(self) -> None:
+        """
+        Close all connections and empty the pool
+        """
+        with self._lock:
+            if self._sweep_timer:
+                self._sweep_timer.cancel()
+                self._sweep_timer = None
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._ref_counts.clear()
+            self._released_at.clear()
+        for client in clients:
+            client.close()
+
+
+# Process wide connection pool
+default_pool = ConnectionPool()
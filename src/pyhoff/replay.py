@@ -0,0 +1,164 @@
+import socket
+import struct
+import time
+from collections import deque
+from typing import Any, Iterable
+from .modbus import SimpleModbusClient, _Socket, _split_frames
+from .trace import TraceRecord, TRACE_SEND
+
+
+def get_exchanges(records: Iterable[TraceRecord]) -> list[tuple[bytes, bytes, int]]:
+    """
+    Pair the requests and responses of a trace by transaction id
+
+    Args:
+        records: trace records as returned by `pyhoff.trace.RingTrace.records`
+            or `pyhoff.trace.read_trace`
+
+    Returns:
+        List of (request frame, response frame, round trip time in ns) tuples
+        in request order; the response frame is empty for requests
+        without response
+    """
+    exchanges: list[tuple[bytes, bytes, int]] = []
+    pending: dict[int, tuple[int, bytes, int]] = dict()
+    for timestamp, direction, data in records:
+        for frame in _split_frames(data):
+            transaction_id = struct.unpack_from('>H', frame)[0]
+            if direction == TRACE_SEND:
+                pending[transaction_id] = (len(exchanges), frame, timestamp)
+                exchanges.append((frame, b'', 0))
+            elif transaction_id in pending:
+                index, request, sent = pending.pop(transaction_id)
+                exchanges[index] = (request, frame, timestamp - sent)
+    return exchanges
+
+
+class _ReplaySocket:
+    """
+    Socket replacement that answers requests with recorded responses
+    """
+
+    def __init__(self, client: 'ReplayModbusClient'):
+        self._client = client
+        self._responses: deque[tuple[float, bytes]] = deque()
+
+    def sendall(self, data: bytes | bytearray, /) -> None:
+        client = self._client
+        now = time.monotonic()
+        for frame in _split_frames(bytes(data)):
+            recorded = client._recorded.get(frame[2:])
+            if not recorded:
+                # not part of the recording, the request times out
+                client.mismatches.append(frame)
+                continue
+
+            response, rtt_ns = recorded.popleft()
+            client.position += 1
+            if response:
+                ready = now + rtt_ns / 1e9 if client.realtime else now
+                self._responses.append((ready, frame[:2] + response[2:]))
+
+    def send(self, data: bytes | bytearray, /) -> int:
+        self.sendall(data)
+        return len(data)
+
+    def recv_into(self, buffer: memoryview, /) -> int:
+        if not self._responses:
+            raise socket.timeout('no recorded response')
+
+        ready, response = self._responses[0]
+        delay = ready - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        size = min(len(response), len(buffer))
+        buffer[:size] = response[:size]
+        if size < len(response):
+            self._responses[0] = (ready, response[size:])
+        else:
+            self._responses.popleft()
+        return size
+
+    def settimeout(self, value: float | None, /) -> None:
+        pass
+
+    def close(self) -> None:
+        self._responses.clear()
+
+
+class ReplayModbusClient(SimpleModbusClient):
+    """
+    Modbus client that answers requests from a recorded trace instead of
+    a server. Requests are matched to the recorded requests by their
+    content except for the transaction id; repeated requests get the
+    recorded responses in recorded order. Requests that are not part
+    of the recording or were not answered in the recording time out.
+    This allows running and profiling unmodified bus coupler code
+    against production traffic offline.
+
+    Attributes:
+        exchanges (list[tuple[bytes, bytes, int]]): recorded request and response
+            frames with their round trip time in ns, see `get_exchanges`
+        realtime (bool): if True, responses are delayed by the recorded round trip time
+        position (int): number of replayed exchanges
+        mismatches (list[bytes]): sent request frames without recorded exchange
+    """
+
+    def __init__(self, records: Iterable[TraceRecord], realtime: bool = False,
+                 unit_id: int = 1, **kwargs: Any):
+        """
+        Instantiate a replay client
+
+        Args:
+            records: trace records as returned by `pyhoff.trace.RingTrace.records`
+                or `pyhoff.trace.read_trace`
+            realtime: if True, responses are delayed by the recorded
+                round trip time, otherwise they are returned immediately
+            unit_id: ModBus id
+            kwargs: further arguments for `SimpleModbusClient`
+
+        Example:
+            >>> from pyhoff.devices import *
+            >>> from pyhoff.trace import FileTrace, read_trace
+            >>> # recording
+            >>> trace = FileTrace('bk9050.trace')
+            >>> bk = BK9050('192.168.0.23', modbus=SimpleModbusClient('192.168.0.23', trace=trace))
+            >>> bk.add_bus_terminals(KL3202)
+            >>> print(bk.select(KL3202).read_temperature(1))
+            >>> trace.close()
+            >>> # replay
+            >>> client = ReplayModbusClient(read_trace('bk9050.trace'), realtime=True)
+            >>> bk = BK9050('192.168.0.23', modbus=client)
+            >>> bk.add_bus_terminals(KL3202)
+            >>> print(bk.select(KL3202).read_temperature(1))
+        """
+        super().__init__('replay', unit_id=unit_id, **kwargs)
+        self.exchanges = get_exchanges(records)
+        self.realtime = realtime
+        self.position = 0
+        self.mismatches: list[bytes] = []
+        self._recorded: dict[bytes, deque[tuple[bytes, int]]] = dict()
+        self._replay_socket = _ReplaySocket(self)
+        self._load_exchanges()
+
+    def _open_socket(self) -> _Socket | None:
+        return self._replay_socket
+
+    def _load_exchanges(self) -> None:
+        """
+        Index the recorded exchanges by request content without transaction id
+        """
+        self._recorded.clear()
+        for request, response, rtt_ns in self.exchanges:
+            self._recorded.setdefault(request[2:], deque()).append((response, rtt_ns))
+
+    def rewind(self) -> None:
+        """
+        Restart the replay from the first recorded exchange
+        """
+        with self._lock:
+            self.close()
+            self.position = 0
+            self.mismatches.clear()
+            self._load_exchanges()
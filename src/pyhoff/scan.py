@@ -0,0 +1,204 @@
+import threading
+import time
+from typing import Any, Callable
+from . import BusCoupler, ProcessImage
+
+ScanCallback = Callable[[ProcessImage], None]
+
+
+class ScanEngine:
+    """
+    Cyclic I/O scan of a bus coupler like a PLC task. Each cycle reads
+    the inputs in bulk by `BusCoupler.read_process_image`, calls the
+    callbacks with the snapshot and writes the outputs set on the
+    terminals of the snapshot in bulk by `ProcessImage.write_outputs`.
+    Cycles start at multiples of the period after `start`; cycles that
+    can not start in time are skipped and counted as overruns.
+
+    Attributes:
+        bus_coupler (BusCoupler): The scanned bus coupler.
+        period (float): Cycle period in seconds.
+        last_error (str): Error of the last failed cycle.
+        exception (Exception | None): Exception raised by a callback, which
+            stopped the background thread.
+    """
+
+    def __init__(self, bus_coupler: BusCoupler, period: float, *callbacks: ScanCallback):
+        """
+        Instantiate a scan engine
+
+        Args:
+            bus_coupler: The bus coupler to scan. It should not be used by
+                other threads while the engine is running.
+            period: Cycle period in seconds.
+            callbacks: Functions called with the process image of each cycle.
+
+        Example:
+            >>> from pyhoff.devices import *
+            >>> bk = BK9050("172.16.17.1", bus_terminals=[KL1104, KL2404])
+            >>> def logic(image):
+            ...     image.select(KL2404).write_coil(1, image.select(KL1104).read_input(1))
+            >>> with ScanEngine(bk, 0.01, logic) as engine:
+            ...     time.sleep(10)
+            >>> print(engine.snapshot())
+        """
+        assert period > 0, 'period must be positive'
+        self.bus_coupler = bus_coupler
+        self.period = period
+        self.last_error = ''
+        self.exception: Exception | None = None
+        self._callbacks: list[ScanCallback] = list(callbacks)
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.reset()
+
+    def __enter__(self) -> 'ScanEngine':
+        self.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def add_callback(self, callback: ScanCallback) -> None:
+        """
+        Add a function called with the process image of each cycle
+
+        Args:
+            callback: The function to add.
+        """
+        self._callbacks = self._callbacks + [callback]
+
+    def remove_callback(self, callback: ScanCallback) -> None:
+        """
+        Remove a function added by `add_callback`
+
+        Args:
+            callback: The function to remove.
+        """
+        self._callbacks = [c for c in self._callbacks if c != callback]
+
+    def reset(self) -> None:
+        """
+        Set all statistics to zero
+        """
+        self._cycles = 0
+        self._failed_cycles = 0
+        self._overruns = 0
+        self._cycle_time_last = 0.0
+        self._cycle_time_sum = 0.0
+        self._cycle_time_max = 0.0
+        self._jitter_samples = 0
+        self._jitter_sum = 0.0
+        self._jitter_max = 0.0
+        self._transactions_last = 0
+        self._transactions_sum = 0
+
+    def run_cycle(self) -> bool:
+        """
+        Run a single cycle in the calling thread: read the inputs, call
+        the callbacks and write the outputs. Exceptions of the callbacks
+        are passed to the caller.
+
+        Returns:
+            True if reading the inputs and writing the outputs succeeded.
+        """
+        modbus = self.bus_coupler.modbus
+        start = time.perf_counter()
+        transactions = modbus.transactions
+
+        image = self.bus_coupler.read_process_image()
+        success = image is not None
+        if image:
+            for callback in self._callbacks:
+                callback(image)
+            success = image.write_outputs()
+
+        cycle_time = time.perf_counter() - start
+        transactions = modbus.transactions - transactions
+
+        self._cycles += 1
+        if not success:
+            self._failed_cycles += 1
+            self.last_error = modbus.last_error
+        self._cycle_time_last = cycle_time
+        self._cycle_time_sum += cycle_time
+        self._cycle_time_max = max(self._cycle_time_max, cycle_time)
+        self._transactions_last = transactions
+        self._transactions_sum += transactions
+        return success
+
+    def start(self) -> None:
+        """
+        Start cyclic scanning in a background thread
+        """
+        if self._thread:
+            return
+        self.exception = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the background thread after the current cycle
+        """
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        """
+        True while the background thread is running
+        """
+        return bool(self._thread and self._thread.is_alive())
+
+    def _run(self) -> None:
+        scheduled = time.perf_counter()
+        while not self._stop.is_set():
+            jitter = time.perf_counter() - scheduled
+            self._jitter_samples += 1
+            self._jitter_sum += jitter
+            self._jitter_max = max(self._jitter_max, jitter)
+
+            try:
+                self.run_cycle()
+            except Exception as e:
+                self.exception = e
+                self.last_error = f"callback failed: {e!r}"
+                return
+
+            scheduled += self.period
+            now = time.perf_counter()
+            if now > scheduled:
+                # skip the cycles that can not start in time
+                missed = int((now - scheduled) / self.period) + 1
+                self._overruns += missed
+                scheduled += missed * self.period
+            self._stop.wait(scheduled - now)
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Get the cycle statistics. The cycle time is the time spent for
+        reading, the callbacks and writing; the jitter is the delay of
+        the cycle start relative to its schedule.
+
+        Returns:
+            Dictionary with the number of cycles, failed cycles and
+            overruns, cycle time and jitter in microseconds and the
+            number of ModBus transactions per cycle.
+        """
+        cycles = self._cycles
+        return {
+            'cycles': cycles,
+            'failed_cycles': self._failed_cycles,
+            'overruns': self._overruns,
+            'cycle_time_last_us': self._cycle_time_last * 1e6,
+            'cycle_time_mean_us': self._cycle_time_sum / cycles * 1e6 if cycles else 0.0,
+            'cycle_time_max_us': self._cycle_time_max * 1e6,
+            'jitter_mean_us': self._jitter_sum / self._jitter_samples * 1e6 if self._jitter_samples else 0.0,
+            'jitter_max_us': self._jitter_max * 1e6,
+            'transactions_last': self._transactions_last,
+            'transactions_mean': self._transactions_sum / cycles if cycles else 0.0,
+        }
@@ -0,0 +1,537 @@
+import asyncio
+import struct
+import threading
+import time
+from array import array
+from collections import deque
+from functools import partial
+from typing import Any, Iterable, cast
+from . import BusCoupler, BusTerminal
+from .devices import BK9000, WAGO_750_352
+from .modbus import OfflineModbusClient, _get_bits, _get_words, _from_bits, _from_words
+
+_READ_FUNCTIONS = (0x01, 0x02, 0x03, 0x04)
+_WRITE_FUNCTIONS = (0x05, 0x06, 0x0F, 0x10, 0x17)
+
+# WAGO 750-352 watchdog function code masks: bit n - 1 of register 0x1001
+# enables function code n for codes 1 to 16, register 0x1002 covers
+# codes 17 to 32 the same way. Maps the simulated function codes
+# to (mask register, bit).
+_WAGO_WATCHDOG_BITS = {
+    0x01: (0x1001, 0),
+    0x02: (0x1001, 1),
+    0x03: (0x1001, 2),
+    0x04: (0x1001, 3),
+    0x05: (0x1001, 4),
+    0x06: (0x1001, 5),
+    0x0F: (0x1001, 14),
+    0x10: (0x1001, 15),
+    0x17: (0x1002, 6),
+}
+
+# Masks used while a mask register is zero: the write functions
+_WAGO_WATCHDOG_DEFAULT_MASKS = {0x1001: 0xC030, 0x1002: 0x0040}
+
+# ModBus exception codes
+_ILLEGAL_FUNCTION = 0x01
+_ILLEGAL_DATA_ADDRESS = 0x02
+_ILLEGAL_DATA_VALUE = 0x03
+
+
+class SimulatedCoupler:
+    """
+    Process image and register map of one simulated bus coupler. The
+    addresses are computed by `BusCoupler.add_bus_terminals` of the
+    simulated bus coupler class, so they match the addresses the client
+    side uses. BK9000 type couplers have the watchdog registers
+    0x1120/0x1121, WAGO 750-352 couplers 0x1000/0x1001/0x1002/0x1005. An expired
+    watchdog sets all outputs to zero.
+
+    Attributes:
+        bus_coupler (BusCoupler): offline instance of the simulated bus coupler
+            class with the configured bus terminals, used to select terminals
+        port (int): TCP port of the server, assigned when the simulator starts
+        response_delay (float): delay in seconds of each response
+        max_outstanding (int): maximum number of delayed ModBus TCP
+            responses not yet sent at the same time, i.e. requests a
+            client had on the wire at once
+        watchdog_expirations (int): number of watchdog expirations
+    """
+
+    def __init__(self, bus_coupler_type: type[BusCoupler], bus_terminals: Iterable[type[BusTerminal]] = [],
+                 port: int = 0):
+        """
+        Instantiate a simulated bus coupler, see `Simulator.add_coupler`
+        """
+        self.bus_coupler = bus_coupler_type('simulator', modbus=OfflineModbusClient())
+        bc = self.bus_coupler
+        self._output_word_base = bc._next_output_word_offset
+        self._output_bit_base = bc._next_output_bit_offset
+        bc.add_bus_terminals(bus_terminals)
+
+        self._input_bits = bytearray(bc._next_input_bit_offset)
+        self._output_bits = bytearray(bc._next_output_bit_offset - self._output_bit_base)
+        self._input_words = array('H', bytes(bc._next_input_word_offset * 2))
+        self._output_words = array('H', bytes((bc._next_output_word_offset - self._output_word_base) * 2))
+
+        # watchdog registers with power on defaults
+        if isinstance(bc, BK9000):
+            self._registers = {0x1120: 1000, 0x1121: 0}
+        elif isinstance(bc, WAGO_750_352):
+            self._registers = {0x1000: 100, 0x1001: 0, 0x1002: 0, 0x1005: 0}
+        else:
+            self._registers = dict()
+
+        self.port = port
+        self.response_delay = 0.0
+        self.max_outstanding = 0
+        self.watchdog_expirations = 0
+        self._watchdog_triggered = time.monotonic()
+        self._forced_exceptions: deque[int] = deque()
+        self._dropped_datagrams = 0
+        self._dropped_responses = 0
+        self._outstanding = 0
+
+    def set_input_bit(self, terminal: BusTerminal, channel: int, value: bool) -> None:
+        """
+        Set an input bit of a digital input terminal
+
+        Args:
+            terminal: terminal of `bus_coupler`
+            channel: channel number (1 based index)
+            value: input value
+        """
+        self._input_bits[terminal._input_bit_addresses[channel - 1]] = value
+
+    def get_output_bit(self, terminal: BusTerminal, channel: int) -> bool:
+        """
+        Get an output bit of a digital output terminal
+
+        Args:
+            terminal: terminal of `bus_coupler`
+            channel: channel number (1 based index)
+
+        Returns:
+            The output value
+        """
+        return bool(self._output_bits[terminal._output_bit_addresses[channel - 1] - self._output_bit_base])
+
+    def set_input_word(self, terminal: BusTerminal, channel: int, value: int) -> None:
+        """
+        Set an input word of an analog input terminal
+
+        Args:
+            terminal: terminal of `bus_coupler`
+            channel: channel number (1 based index)
+            value: input word, negative values are stored as two's complement
+        """
+        self._input_words[terminal._input_word_addresses[channel - 1]] = value & 0xFFFF
+
+    def get_output_word(self, terminal: BusTerminal, channel: int) -> int:
+        """
+        Get an output word of an analog output terminal
+
+        Args:
+            terminal: terminal of `bus_coupler`
+            channel: channel number (1 based index)
+
+        Returns:
+            The output word
+        """
+        return self._output_words[terminal._output_word_addresses[channel - 1] - self._output_word_base]
+
+    def inject_exception(self, exception_code: int, count: int = 1) -> None:
+        """
+        Answer the next requests with a ModBus exception
+
+        Args:
+            exception_code: ModBus exception code, e.g. 0x06 for slave device busy
+            count: number of requests to answer with the exception
+        """
+        self._forced_exceptions.extend([exception_code] * count)
+
+    def drop_datagrams(self, count: int = 1) -> None:
+        """
+        Ignore the next ModBus UDP requests to simulate packet loss
+
+        Args:
+            count: number of requests to ignore
+        """
+        self._dropped_datagrams += count
+
+    def drop_responses(self, count: int = 1) -> None:
+        """
+        Execute the next ModBus TCP requests without sending their
+        responses to simulate lost responses
+
+        Args:
+            count: number of responses to drop
+        """
+        self._dropped_responses += count
+
+    @property
+    def watchdog_timeout(self) -> float:
+        """
+        Configured watchdog time in seconds or 0 if the watchdog is disabled
+        """
+        if 0x1120 in self._registers:
+            return self._registers[0x1120] / 1000
+        if 0x1000 in self._registers:
+            return self._registers[0x1000] / 10
+        return 0
+
+    def _check_watchdog(self, function_code: int) -> None:
+        now = time.monotonic()
+        timeout = self.watchdog_timeout
+        if timeout and now - self._watchdog_triggered > timeout:
+            self._output_bits[:] = bytes(len(self._output_bits))
+            self._output_words[:] = array('H', bytes(len(self._output_words) * 2))
+            self.watchdog_expirations += 1
+            self._watchdog_triggered = now
+
+        if 0x1001 in self._registers:
+            # WAGO: bit masks of the function codes that trigger the watchdog
+            register, bit = _WAGO_WATCHDOG_BITS[function_code]
+            mask = self._registers[register] or _WAGO_WATCHDOG_DEFAULT_MASKS[register]
+            triggered = bool(mask >> bit & 1)
+        else:
+            triggered = function_code in _WRITE_FUNCTIONS
+        if triggered:
+            self._watchdog_triggered = now
+
+    def _write_register(self, address: int, value: int) -> None:
+        if address == 0x1121 and value == 0xAFFE and self._registers[0x1121] == 0xBECF:
+            self._watchdog_triggered = time.monotonic()
+        elif address == 0x1005 and value == 0x5555 and self._registers[0x1005] == 0xAAAA:
+            self._registers[0x1000] = 0
+        self._registers[address] = value
+
+    def _read_words(self, function_code: int, address: int, count: int) -> 'array[int] | None':
+        if function_code == 0x04:
+            if address + count <= len(self._input_words):
+                return self._input_words[address:address + count]
+        elif self._output_word_base <= address and \
+                address + count - self._output_word_base <= len(self._output_words):
+            offset = address - self._output_word_base
+            return self._output_words[offset:offset + count]
+        elif count == 1 and address in self._registers:
+            return array('H', [self._registers[address]])
+        return None
+
+    def _write_words(self, address: int, values: list[int]) -> bool:
+        if self._output_word_base <= address and \
+                address + len(values) - self._output_word_base <= len(self._output_words):
+            offset = address - self._output_word_base
+            self._output_words[offset:offset + len(values)] = array('H', values)
+            return True
+        elif len(values) == 1 and address in self._registers:
+            self._write_register(address, values[0])
+            return True
+        return False
+
+    def process(self, pdu: bytes) -> bytes:
+        """
+        Process a request
+
+        Args:
+            pdu: request starting with the function code
+
+        Returns:
+            Response starting with the function code
+        """
+        function_code = pdu[0]
+        if self._forced_exceptions:
+            return bytes([function_code | 0x80, self._forced_exceptions.popleft()])
+        if function_code not in _READ_FUNCTIONS + _WRITE_FUNCTIONS:
+            return bytes([function_code | 0x80, _ILLEGAL_FUNCTION])
+        if len(pdu) < 5:
+            return bytes([function_code | 0x80, _ILLEGAL_DATA_VALUE])
+
+        self._check_watchdog(function_code)
+        address, count = struct.unpack_from('>HH', pdu, 1)
+
+        if function_code in (0x01, 0x02):
+            bits = self._input_bits if function_code == 0x02 else self._output_bits
+            offset = address - (self._output_bit_base if function_code == 0x01 else 0)
+            if not 1 <= count <= 2000:
+                return bytes([function_code | 0x80, _ILLEGAL_DATA_VALUE])
+            if offset < 0 or offset + count > len(bits):
+                return bytes([function_code | 0x80, _ILLEGAL_DATA_ADDRESS])
+            data = _from_bits([b != 0 for b in bits[offset:offset + count]])
+            return bytes([function_code, len(data)]) + data
+
+        if function_code in (0x03, 0x04):
+            if not 1 <= count <= 125:
+                return bytes([function_code | 0x80, _ILLEGAL_DATA_VALUE])
+            words = self._read_words(function_code, address, count)
+            if words is None:
+                return bytes([function_code | 0x80, _ILLEGAL_DATA_ADDRESS])
+            return bytes([function_code, count * 2]) + _from_words(words)
+
+        if function_code == 0x05:
+            if count not in (0x0000, 0xFF00):
+                return bytes([function_code | 0x80, _ILLEGAL_DATA_VALUE])
+            offset = address - self._output_bit_base
+            if not 0 <= offset < len(self._output_bits):
+                return bytes([function_code | 0x80, _ILLEGAL_DATA_ADDRESS])
+            self._output_bits[offset] = count != 0
+            return pdu[:5]
+
+        if function_code == 0x06:
+            if not self._write_words(address, [count]):
+                return bytes([function_code | 0x80, _ILLEGAL_DATA_ADDRESS])
+            return pdu[:5]
+
+        if function_code == 0x0F:
+            if not (1 <= count <= 0x07B0 and len(pdu) == 6 + (count + 7) // 8 and pdu[5] == (count + 7) // 8):
+                return bytes([function_code | 0x80, _ILLEGAL_DATA_VALUE])
+            offset = address - self._output_bit_base
+            if offset < 0 or offset + count > len(self._output_bits):
+                return bytes([function_code | 0x80, _ILLEGAL_DATA_ADDRESS])
+            self._output_bits[offset:offset + count] = bytes(_get_bits(pdu[6:], count))
+            return pdu[:5]
+
+        if function_code == 0x10:
+            if not (1 <= count <= 123 and len(pdu) == 6 + count * 2 and pdu[5] == count * 2):
+                return bytes([function_code | 0x80, _ILLEGAL_DATA_VALUE])
+            if not self._write_words(address, _get_words(pdu[6:])):
+                return bytes([function_code | 0x80, _ILLEGAL_DATA_ADDRESS])
+            return pdu[:5]
+
+        # 0x17: write before read
+        if len(pdu) < 10:
+            return bytes([function_code | 0x80, _ILLEGAL_DATA_VALUE])
+        write_address, write_count = struct.unpack_from('>HH', pdu, 5)
+        if not (1 <= count <= 125 and 1 <= write_count <= 121 and
+                len(pdu) == 10 + write_count * 2 and pdu[9] == write_count * 2):
+            return bytes([function_code | 0x80, _ILLEGAL_DATA_VALUE])
+        if self._read_words(0x04, address, count) is None or \
+                not self._write_words(write_address, _get_words(pdu[10:])):
+            return bytes([function_code | 0x80, _ILLEGAL_DATA_ADDRESS])
+        words = self._read_words(0x04, address, count)
+        assert words is not None
+        return bytes([function_code, count * 2]) + _from_words(words)
+
+    def connect_bus_coupler(self, host: str = '127.0.0.1', **kwargs: Any) -> BusCoupler:
+        """
+        Create a bus coupler client for this simulated bus coupler with
+        the same type and bus terminals
+
+        Args:
+            host: host of the simulator
+            kwargs: further arguments for the bus coupler class
+
+        Returns:
+            The bus coupler
+        """
+        bus_coupler = type(self.bus_coupler)(host, self.port, **kwargs)
+        bus_coupler.add_bus_terminals(type(bt) for bt in self.bus_coupler.bus_terminals)
+        return bus_coupler
+
+
+class _CouplerProtocol(asyncio.Protocol):
+    """
+    ModBus TCP server connection of a simulated bus coupler
+    """
+
+    def __init__(self, coupler: SimulatedCoupler, connections: set['_CouplerProtocol']):
+        self._coupler = coupler
+        self._connections = connections
+        self._buffer = bytearray()
+        self._transport: asyncio.Transport | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        assert isinstance(transport, asyncio.Transport)
+        self._transport = transport
+        self._connections.add(self)
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        self._transport = None
+        self._connections.discard(self)
+
+    def close(self) -> None:
+        if self._transport:
+            self._transport.close()
+
+    def data_received(self, data: bytes) -> None:
+        buffer = self._buffer
+        buffer += data
+        while len(buffer) >= 7 and self._transport:
+            transaction_id, protocol_identifier, length, unit_id = struct.unpack_from('>HHHB', buffer)
+            if protocol_identifier != 0 or not 2 <= length <= 0xFF:
+                self._transport.close()
+                return
+            if len(buffer) < length + 6:
+                return
+
+            coupler = self._coupler
+            response = coupler.process(bytes(buffer[7:length + 6]))
+            del buffer[:length + 6]
+            if coupler._dropped_responses:
+                coupler._dropped_responses -= 1
+                continue
+
+            frame = struct.pack('>HHHB', transaction_id, 0, len(response) + 1, unit_id) + response
+            if coupler.response_delay:
+                coupler._outstanding += 1
+                coupler.max_outstanding = max(coupler.max_outstanding, coupler._outstanding)
+                asyncio.get_running_loop().call_later(coupler.response_delay, self._write, frame)
+            else:
+                self._transport.write(frame)
+
+    def _write(self, frame: bytes) -> None:
+        self._coupler._outstanding -= 1
+        if self._transport:
+            self._transport.write(frame)
+
+
+class _CouplerDatagramProtocol(asyncio.DatagramProtocol):
+    """
+    ModBus UDP server of a simulated bus coupler
+    """
+
+    def __init__(self, coupler: SimulatedCoupler):
+        self._coupler = coupler
+        self._transport: asyncio.DatagramTransport | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._transport = cast(asyncio.DatagramTransport, transport)
+
+    def datagram_received(self, data: bytes, addr: tuple[str | Any, int]) -> None:
+        coupler = self._coupler
+        if coupler._dropped_datagrams:
+            coupler._dropped_datagrams -= 1
+            return
+        if len(data) < 8 or not self._transport:
+            return
+        transaction_id, protocol_identifier, length, unit_id = struct.unpack_from('>HHHB', data)
+        if protocol_identifier != 0 or length + 6 != len(data):
+            return
+
+        response = coupler.process(data[7:])
+        frame = struct.pack('>HHHB', transaction_id, 0, len(response) + 1, unit_id) + response
+        if coupler.response_delay:
+            asyncio.get_running_loop().call_later(coupler.response_delay, self._transport.sendto, frame, addr)
+        else:
+            self._transport.sendto(frame, addr)
+
+
+class Simulator:
+    """
+    ModBus TCP server simulating bus couplers for tests and load tests
+    without hardware. Each simulated bus coupler listens on its own port;
+    all couplers are served by one asyncio event loop, so hundreds of
+    couplers can be simulated by one process. Each coupler serves ModBus
+    UDP on the same port number as well. The simulator runs either
+    in a running event loop (`start` and `stop`) or in a background
+    thread (`start_background` and `stop_background` or with statement).
+
+    Attributes:
+        host (str): address the servers listen on
+        couplers (list[SimulatedCoupler]): simulated bus couplers
+    """
+
+    def __init__(self, host: str = '127.0.0.1'):
+        """
+        Instantiate a simulator
+
+        Args:
+            host: address the servers listen on
+
+        Example:
+            >>> from pyhoff.devices import *
+            >>> with Simulator() as sim:
+            ...     coupler = sim.add_coupler(BK9050, [KL3202, KL4002])
+            ...     coupler.set_input_word(coupler.bus_coupler.select(KL3202), 1, 215)
+            ...     bk = coupler.connect_bus_coupler()
+            ...     print(bk.select(KL3202).read_temperature(1))
+            21.5
+        """
+        self.host = host
+        self.couplers: list[SimulatedCoupler] = []
+        self._servers: dict[SimulatedCoupler, asyncio.Server] = dict()
+        self._connections: set[_CouplerProtocol] = set()
+        self._datagram_transports: list[asyncio.BaseTransport] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+
+    def add_coupler(self, bus_coupler_type: type[BusCoupler], bus_terminals: Iterable[type[BusTerminal]] = [],
+                    port: int = 0) -> SimulatedCoupler:
+        """
+        Add a simulated bus coupler. If the simulator runs in a background
+        thread the server is started immediately, otherwise by `start`.
+
+        Args:
+            bus_coupler_type: bus coupler class, e.g. `pyhoff.devices.BK9050`
+            bus_terminals: bus terminal classes of the simulated bus coupler
+            port: TCP port or 0 to select a free port
+
+        Returns:
+            The simulated bus coupler
+        """
+        coupler = SimulatedCoupler(bus_coupler_type, bus_terminals, port)
+        self.couplers.append(coupler)
+        if self._thread and self._loop:
+            asyncio.run_coroutine_threadsafe(self.start(), self._loop).result()
+        return coupler
+
+    async def start(self) -> None:
+        """
+        Start the servers of all bus couplers that are not yet served
+        """
+        loop = asyncio.get_running_loop()
+        for coupler in self.couplers:
+            if coupler not in self._servers:
+                server = await loop.create_server(partial(_CouplerProtocol, coupler, self._connections),
+                                                  self.host, coupler.port)
+                coupler.port = server.sockets[0].getsockname()[1]
+                self._servers[coupler] = server
+                transport, _ = await loop.create_datagram_endpoint(partial(_CouplerDatagramProtocol, coupler),
+                                                                   local_addr=(self.host, coupler.port))
+                self._datagram_transports.append(transport)
+
+    async def stop(self) -> None:
+        """
+        Stop all servers
+        """
+        servers = list(self._servers.values())
+        self._servers.clear()
+        for server in servers:
+            server.close()
+        for connection in list(self._connections):
+            connection.close()
+        for transport in self._datagram_transports:
+            transport.close()
+        self._datagram_transports.clear()
+        for server in servers:
+            await server.wait_closed()
+
+    def start_background(self) -> None:
+        """
+        Run the simulator in a background thread
+        """
+        assert not self._thread, 'simulator is already running'
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        self._thread = threading.Thread(target=loop.run_forever, daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.start(), loop).result()
+
+    def stop_background(self) -> None:
+        """
+        Stop the background thread started by `start_background`
+        """
+        if self._thread and self._loop:
+            asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+        self._thread = None
+        self._loop = None
+
+    def __enter__(self) -> 'Simulator':
+        self.start_background()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop_background()
@@ -0,0 +1,203 @@
+import struct
+import time
+from typing import Any
+
+# Number of round trip time histogram buckets: 4 buckets per octave
+# of microseconds, the last bucket covers all times above ~67 s
+_HISTOGRAM_SIZE = 108
+
+
+def _bucket(rtt_us: int) -> int:
+    """
+    Get the histogram bucket of a round trip time
+    """
+    if rtt_us < 4:
+        return rtt_us
+    exponent = rtt_us.bit_length() - 3
+    return min(exponent * 4 + (rtt_us >> exponent), _HISTOGRAM_SIZE - 1)
+
+
+def _bucket_limit(index: int) -> int:
+    """
+    Get the upper limit in microseconds of a histogram bucket
+    """
+    if index < 4:
+        return index + 1
+    exponent = index // 4 - 1
+    return (index % 4 + 5) << exponent
+
+
+def _percentile(histogram: list[int], fraction: float) -> int:
+    """
+    Get the upper bucket limit of a percentile from a histogram
+
+    Returns:
+        Round trip time in microseconds or 0 if the histogram is empty
+    """
+    total = sum(histogram)
+    if not total:
+        return 0
+    rank = fraction * total
+    count = 0
+    for index, value in enumerate(histogram):
+        count += value
+        if count >= rank:
+            return _bucket_limit(index)
+    return _bucket_limit(len(histogram) - 1)
+
+
+class _FunctionStats:
+    """
+    Counters of one ModBus function code
+    """
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.responses = 0
+        self.exceptions = 0
+        self.rtt_sum_ns = 0
+        self.histogram = [0] * _HISTOGRAM_SIZE
+
+
+class ClientStats:
+    """
+    Transaction metrics of a `SimpleModbusClient`, enabled by its
+    `metrics` argument. Counters are plain attributes updated by the
+    thread doing the transaction, so recording takes no locks; use
+    `snapshot` to read them consistently.
+
+    Attributes:
+        bytes_sent (int): number of transmitted bytes
+        bytes_received (int): number of received bytes of valid frames
+        connects (int): number of established connections
+        connect_failures (int): number of failed connection attempts
+        timeouts (int): number of receive timeouts
+        stale_frames (int): number of discarded late responses to
+            requests that already failed
+        retries (int): number of repeated calls, see `SimpleModbusClient.retries`
+        exceptions (dict[int, int]): number of exception responses by exception code
+    """
+
+    def __init__(self) -> None:
+        """
+        Instantiate zeroed metrics
+        """
+        self._pending: dict[int, tuple[int, int]] = dict()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Set all counters to zero
+        """
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.connects = 0
+        self.connect_failures = 0
+        self.timeouts = 0
+        self.stale_frames = 0
+        self.retries = 0
+        self.exceptions: dict[int, int] = dict()
+        self._functions: dict[int, _FunctionStats] = dict()
+        self._start = time.monotonic()
+
+    def reset_pending(self) -> None:
+        """
+        Forget the outstanding requests, e.g. after their responses timed
+        out or the connection was closed. Late responses to them are
+        not counted as responses and add no round trip time sample.
+        """
+        self._pending.clear()
+
+    def _function(self, function_code: int) -> _FunctionStats:
+        stats = self._functions.get(function_code)
+        if not stats:
+            stats = self._functions[function_code] = _FunctionStats()
+        return stats
+
+    def _record_send(self, data: bytes | bytearray) -> None:
+        """
+        Record transmitted frames, data may contain several frames
+        """
+        now = time.perf_counter_ns()
+        self.bytes_sent += len(data)
+        offset = 0
+        while offset + 8 <= len(data):
+            transaction_id, _, length, _, function_code = struct.unpack_from('>HHHBB', data, offset)
+            self._pending[transaction_id] = (function_code, now)
+            self._function(function_code).requests += 1
+            offset += length + 6
+
+    def _record_receive(self, transaction_id: int, data: memoryview) -> None:
+        """
+        Record a received frame
+
+        Args:
+            transaction_id: transaction id of the frame
+            data: frame data starting with the function code
+        """
+        now = time.perf_counter_ns()
+        self.bytes_received += len(data) + 7
+        pending = self._pending.pop(transaction_id, None)
+        if not pending:
+            # late response to a failed request, counted in stale_frames
+            return
+
+        stats = self._function(data[0] & 0x7F)
+        stats.responses += 1
+        if data[0] & 0x80 and len(data) > 1:
+            stats.exceptions += 1
+            self.exceptions[data[1]] = self.exceptions.get(data[1], 0) + 1
+
+        rtt_ns = now - pending[1]
+        stats.rtt_sum_ns += rtt_ns
+        stats.histogram[_bucket(rtt_ns // 1000)] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Get a copy of all metrics
+
+        Returns:
+            Dictionary with totals, throughput and round trip time
+            percentiles in microseconds, and the same per function code
+            under the key 'function_codes'
+
+        Example:
+            >>> client = SimpleModbusClient('localhost', metrics=True)
+            >>> client.read_input_registers(0, 10)
+            >>> stats = client.stats.snapshot()
+            >>> print(stats['requests'], stats['rtt_p50_us'], stats['rtt_p99_us'])
+        """
+        duration = time.monotonic() - self._start
+        functions: dict[int, dict[str, Any]] = dict()
+        histogram = [0] * _HISTOGRAM_SIZE
+        for function_code, stats in list(self._functions.items()):
+            samples = sum(stats.histogram)
+            histogram = [a + b for a, b in zip(histogram, stats.histogram)]
+            functions[function_code] = {
+                'requests': stats.requests,
+                'responses': stats.responses,
+                'exceptions': stats.exceptions,
+                'rtt_mean_us': stats.rtt_sum_ns / samples / 1000 if samples else 0.0,
+                'rtt_p50_us': _percentile(stats.histogram, 0.5),
+                'rtt_p99_us': _percentile(stats.histogram, 0.99),
+            }
+
+        responses = sum(f['responses'] for f in functions.values())
+        return {
+            'duration_s': duration,
+            'requests': sum(f['requests'] for f in functions.values()),
+            'responses': responses,
+            'responses_per_s': responses / duration if duration > 0 else 0.0,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'connects': self.connects,
+            'reconnects': max(self.connects - 1, 0),
+            'connect_failures': self.connect_failures,
+            'timeouts': self.timeouts,
+            'stale_frames': self.stale_frames,
+            'retries': self.retries,
+            'exceptions': dict(self.exceptions),
+            'rtt_p50_us': _percentile(histogram, 0.5),
+            'rtt_p99_us': _percentile(histogram, 0.99),
+            'function_codes': functions,
+        }
@@ -0,0 +1,335 @@
+import concurrent.futures
+import queue
+import selectors
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import nullcontext
+from typing import Any
+from .modbus import SimpleModbusClient
+
+_Request = tuple[bytes, 'Future[bytes]']
+# futures and response deadlines of the outstanding requests by transaction id
+_InFlight = dict[int, tuple['Future[bytes]', float]]
+
+
+class ThreadedModbusClient(SimpleModbusClient):
+    """
+    Thread-safe Modbus TCP client. A dedicated I/O thread owns the
+    connection; requests of concurrent callers are queued, sent pipelined
+    with up to `max_in_flight` requests on the wire and matched to their
+    callers by transaction id. Callers wait on a future instead of a
+    client wide lock. `last_error`, `last_exception_code`, the deadline
+    set by `deadline` and the requests queued by `submit` are kept per
+    calling thread.
+
+    All methods of `SimpleModbusClient` and prepared requests can be
+    used; `pyhoff.poller.Poller` is not supported.
+    """
+
+    def __init__(self, host: str, port: int = 502, unit_id: int = 1, timeout: float = 5,
+                 debug: bool = False, **kwargs: Any):
+        """
+        Instantiate a thread-safe Modbus TCP client and start its I/O thread
+
+        Args:
+            host: hostname or IP address
+            port: server port
+            unit_id: ModBus id
+            timeout: socket timeout in seconds
+            debug: if True prints out transmitted and received bytes in hex
+            kwargs: further arguments for `SimpleModbusClient`
+
+        Example:
+            >>> from pyhoff.devices import *
+            >>> from concurrent.futures import ThreadPoolExecutor
+            >>> bk = BK9050('192.168.0.23', modbus=ThreadedModbusClient('192.168.0.23'))
+            >>> bk.add_bus_terminals(KL3202, KL3202)
+            >>> with ThreadPoolExecutor(4) as executor:
+            ...     print(list(executor.map(lambda i: bk.select(KL3202, i // 2).read_temperature(i % 2 + 1), range(4))))
+        """
+        self._local = threading.local()
+        super().__init__(host, port, unit_id, timeout, debug, **kwargs)
+        self._transaction_lock = nullcontext()
+        self._transaction_id_lock = threading.Lock()
+        self._requests: queue.SimpleQueue[_Request | None] = queue.SimpleQueue()
+        self._requests_lock = threading.Lock()
+        self._stopped = False
+        # wakes the I/O thread while it waits for responses
+        self._wake_receiver, self._wake_sender = socket.socketpair()
+        self._wake_receiver.setblocking(False)
+        self._wake_sender.setblocking(False)
+        self._io_thread = threading.Thread(target=self._io_loop, daemon=True)
+        self._io_thread.start()
+
+    @property
+    def last_error(self) -> str:
+        return getattr(self._local, 'last_error', '')
+
+    @last_error.setter
+    def last_error(self, value: str) -> None:
+        self._local.last_error = value
+
+    @property
+    def last_exception_code(self) -> int:
+        return getattr(self._local, 'last_exception_code', 0)
+
+    @last_exception_code.setter
+    def last_exception_code(self, value: int) -> None:
+        self._local.last_exception_code = value
+
+    @property
+    def _deadline(self) -> float:
+        return getattr(self._local, 'deadline', 0.0)
+
+    @_deadline.setter
+    def _deadline(self, value: float) -> None:
+        self._local.deadline = value
+
+    @property
+    def _pipeline_queue(self) -> 'deque[tuple[int, bytes, Future[bytes]]]':
+        pipeline_queue: deque[tuple[int, bytes, Future[bytes]]] | None = \
+            getattr(self._local, 'pipeline_queue', None)
+        if pipeline_queue is None:
+            pipeline_queue = self._local.pipeline_queue = deque()
+        return pipeline_queue
+
+    @_pipeline_queue.setter
+    def _pipeline_queue(self, value: 'deque[tuple[int, bytes, Future[bytes]]]') -> None:
+        self._local.pipeline_queue = value
+
+    def _next_transaction_id(self) -> int:
+        with self._transaction_id_lock:
+            return super()._next_transaction_id()
+
+    def _send(self, data: bytes | bytearray) -> int:
+        """
+        Queue a frame for the I/O thread, the response is
+        returned by the next `receive_modbus_data` call of
+        the calling thread
+
+        Returns:
+            number of queued bytes
+        """
+        future: Future[bytes] = Future()
+        self._local.future = future
+        with self._requests_lock:
+            if self._stopped:
+                future.set_exception(ConnectionError('client stopped'))
+            else:
+                self._requests.put((bytes(data), future))
+                self._wake()
+        return len(data)
+
+    def _wake(self) -> None:
+        try:
+            self._wake_sender.send(b'\0')
+        except BlockingIOError:
+            # the I/O thread has not yet read the previous wake-ups
+            pass
+
+    def _receive_data(self) -> memoryview:
+        """
+        Wait for the response to the last request of the calling thread
+
+        Returns:
+            received bytes or an empty view if an error occurred
+        """
+        future: Future[bytes] | None = getattr(self._local, 'future', None)
+        if not future:
+            self.last_error = 'no request sent'
+            return memoryview(bytes())
+
+        self._local.future = None
+        try:
+            data = future.result(timeout=self.response_timeout)
+        except concurrent.futures.TimeoutError:
+            self.last_error = 'receiving return frame failed'
+            return memoryview(bytes())
+        except ConnectionError as e:
+            self.last_error = str(e)
+            return memoryview(bytes())
+
+        return self._check_exception(memoryview(data))
+
+    def flush(self) -> bool:
+        """
+        Send all requests queued by `submit` and receive their responses,
+        see `SimpleModbusClient.flush`
+        """
+        requests: list[tuple[Future[bytes], Future[bytes]]] = []
+        while self._pipeline_queue:
+            function_code, body, future = self._pipeline_queue.popleft()
+            self._send(self._build_frame(function_code, body))
+            requests.append((self._local.future, future))
+
+        success = True
+        for response, future in requests:
+            self._local.future = response
+            self.last_exception_code = 0
+            data = self._receive_data()
+            if not data and not self.last_exception_code:
+                success = False
+            future.set_result(data.tobytes())
+        return success
+
+    def stop(self) -> None:
+        """
+        Close the connection and stop the I/O thread, outstanding
+        requests fail. The client can not be used afterwards.
+        """
+        with self._requests_lock:
+            if not self._stopped:
+                self._stopped = True
+                self._requests.put(None)
+                self._wake()
+        self._io_thread.join()
+        self.close()
+
+    def _io_loop(self) -> None:
+        """
+        Send queued requests and receive responses until `stop` is called.
+        The thread waits for the socket and for the wake-up of new requests
+        at the same time, so requests are sent while responses are
+        outstanding. Each request fails on its own when its response
+        timeout expires, so a lost response does not hold its slot while
+        other responses arrive. All outstanding requests fail when the
+        thread exits.
+        """
+        in_flight: _InFlight = dict()
+        selected: socket.socket | None = None
+        try:
+            with selectors.DefaultSelector() as selector:
+                selector.register(self._wake_receiver, selectors.EVENT_READ)
+                while self._send_requests(in_flight):
+                    sock = self._socket
+                    if sock is not selected:
+                        if selected:
+                            selector.unregister(selected)
+                            selected = None
+                        if isinstance(sock, socket.socket):
+                            selector.register(sock, selectors.EVENT_READ)
+                            selected = sock
+
+                    if in_flight and sock and not selected:
+                        # socket replacement without file descriptor
+                        self._receive_responses(in_flight)
+                        continue
+
+                    # requests are sent in order, the oldest expires first
+                    deadline = next(iter(in_flight.values()))[1] if in_flight else None
+                    events = selector.select(None if deadline is None else max(deadline - time.monotonic(), 0))
+                    for key, _ in events:
+                        if key.fileobj is self._wake_receiver:
+                            self._wake_receiver.recv(4096)
+                        else:
+                            self._receive_responses(in_flight)
+                    self._expire_requests(in_flight)
+        finally:
+            with self._requests_lock:
+                self._stopped = True
+                self._wake_receiver.close()
+                self._wake_sender.close()
+            self._fail(in_flight, 'client stopped')
+            while not self._requests.empty():
+                request = self._requests.get()
+                if request:
+                    request[1].set_exception(ConnectionError('client stopped'))
+
+    def _expire_requests(self, in_flight: _InFlight) -> None:
+        """
+        Fail the requests whose response timeout expired. UDP requests
+        are retransmitted instead while retries are left; the connection
+        is closed on the second timeout in a row, failing all requests.
+
+        Args:
+            in_flight: futures and deadlines of the outstanding requests
+        """
+        now = time.monotonic()
+        if not in_flight or next(iter(in_flight.values()))[1] > now:
+            return
+
+        with self._lock:
+            if self._handle_timeout():
+                deadline = now + self.response_timeout
+                for transaction_id, (future, _) in in_flight.items():
+                    in_flight[transaction_id] = (future, deadline)
+                return
+
+            self._receive_failed()
+            if not self._socket:
+                self._fail(in_flight, self.last_error)
+                return
+
+            while in_flight:
+                transaction_id, (future, deadline) = next(iter(in_flight.items()))
+                if deadline > now:
+                    break
+                del in_flight[transaction_id]
+                future.set_exception(ConnectionError(self.last_error))
+
+    def _send_requests(self, in_flight: _InFlight) -> bool:
+        """
+        Send queued requests while less than `max_in_flight` are outstanding
+
+        Args:
+            in_flight: futures and deadlines of the outstanding requests
+
+        Returns:
+            False if `stop` was called
+        """
+        frames = bytearray()
+        while len(in_flight) < self.max_in_flight:
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                return False
+            frame, future = request
+            in_flight[struct.unpack_from('>H', frame)[0]] = (future, time.monotonic() + self.response_timeout)
+            frames += frame
+
+        if frames:
+            with self._lock:
+                if not SimpleModbusClient._send(self, frames):
+                    self._fail(in_flight, self.last_error)
+        return True
+
+    def _receive_responses(self, in_flight: _InFlight) -> None:
+        """
+        Receive available data and resolve the futures of all
+        complete responses
+
+        Args:
+            in_flight: futures and deadlines of the outstanding requests
+        """
+        with self._lock:
+            if not self._recv():
+                self._receive_failed()
+                self._fail(in_flight, self.last_error)
+                return
+
+            while frame := self._next_frame():
+                transaction_id, data = frame
+                if not data:
+                    self._fail(in_flight, self.last_error)
+                    return
+
+                request = in_flight.pop(transaction_id, None)
+                if request:
+                    request[0].set_result(data.tobytes())
+                elif not self._discard_stale(transaction_id, next(iter(in_flight), self._transaction_id + 1)):
+                    self.last_error = 'received frame is invalid'
+                    self.close()
+                    self._fail(in_flight, self.last_error)
+                    return
+
+    @staticmethod
+    def _fail(in_flight: _InFlight, error: str) -> None:
+        for future, _ in in_flight.values():
+            future.set_exception(ConnectionError(error))
+        in_flight.clear()
@@ -0,0 +1,186 @@
+import struct
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import BinaryIO, Iterable
+
+# Direction flags of trace records
+TRACE_SEND = 0
+TRACE_RECEIVE = 1
+
+# Record header of trace files: monotonic timestamp in ns, direction, frame length
+_RECORD_HEADER = struct.Struct('<qBH')
+
+TraceRecord = tuple[int, int, bytes]
+
+
+def format_trace(records: Iterable[TraceRecord]) -> str:
+    """
+    Format trace records as text, one line per record with the time in
+    milliseconds relative to the first record and the frame bytes in hex
+
+    Args:
+        records: records as returned by `RingTrace.records` or `read_trace`
+
+    Returns:
+        The formatted trace
+    """
+    lines: list[str] = []
+    start = None
+    for timestamp, direction, data in records:
+        if start is None:
+            start = timestamp
+        arrow = '->' if direction == TRACE_SEND else '<-'
+        lines.append(f"{(timestamp - start) / 1e6:12.3f} ms {arrow} {data.hex(' ')}")
+    return '\n'.join(lines)
+
+
+def read_trace(path: str) -> list[TraceRecord]:
+    """
+    Read the records of a trace file written by `FileTrace`
+
+    Args:
+        path: file path
+
+    Returns:
+        List of (monotonic timestamp in ns, direction, frame) tuples
+    """
+    records: list[TraceRecord] = []
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = 0
+    while offset + _RECORD_HEADER.size <= len(data):
+        timestamp, direction, length = _RECORD_HEADER.unpack_from(data, offset)
+        offset += _RECORD_HEADER.size
+        records.append((timestamp, direction, data[offset:offset + length]))
+        offset += length
+    return records
+
+
+class TraceSink(ABC):
+    """
+    Base class for receivers of the raw frames transmitted
+    and received by a `SimpleModbusClient`
+    """
+
+    @abstractmethod
+    def record(self, direction: int, data: bytes | bytearray | memoryview) -> None:
+        """
+        Record a frame
+
+        Args:
+            direction: TRACE_SEND or TRACE_RECEIVE
+            data: raw frame including the MBAP header, only valid during the call
+        """
+
+
+class PrintTrace(TraceSink):
+    """
+    Prints each frame in hex, used by `SimpleModbusClient` with `debug=True`
+    """
+
+    def record(self, direction: int, data: bytes | bytearray | memoryview) -> None:
+        if direction == TRACE_SEND:
+            print(f"-> Send:     {' '.join(hex(b) for b in data)}")
+        else:
+            print(f"<- Received: {' '.join(hex(b) for b in data)}")
+
+
+class RingTrace(TraceSink):
+    """
+    Keeps the most recent frames in memory. Recording only copies the
+    frame, formatting is done when the trace is dumped.
+
+    Attributes:
+        capacity (int): maximum number of records kept
+    """
+
+    def __init__(self, capacity: int = 4096):
+        """
+        Instantiate a ring buffer trace
+
+        Args:
+            capacity: maximum number of records kept, older
+                records are dropped
+
+        Example:
+            >>> trace = RingTrace(1000)
+            >>> client = SimpleModbusClient('localhost', trace=trace)
+            >>> client.read_input_registers(0, 10)
+            >>> print(trace.dump())
+        """
+        self.capacity = capacity
+        self._records: deque[TraceRecord] = deque(maxlen=capacity)
+
+    def record(self, direction: int, data: bytes | bytearray | memoryview) -> None:
+        self._records.append((time.monotonic_ns(), direction, bytes(data)))
+
+    def records(self) -> list[TraceRecord]:
+        """
+        Get the recorded frames
+
+        Returns:
+            List of (monotonic timestamp in ns, direction, frame) tuples, oldest first
+        """
+        return list(self._records)
+
+    def clear(self) -> None:
+        """
+        Remove all records
+        """
+        self._records.clear()
+
+    def dump(self) -> str:
+        """
+        Format the recorded frames, see `format_trace`
+
+        Returns:
+            The formatted trace
+        """
+        return format_trace(self.records())
+
+
+class FileTrace(TraceSink):
+    """
+    Appends frames to a binary file. Each record consists of a little
+    endian header (int64 monotonic timestamp in ns, uint8 direction,
+    uint16 frame length) followed by the raw frame. Use `read_trace`
+    to load the file.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a trace file for appending
+
+        Args:
+            path: file path
+
+        Example:
+            >>> trace = FileTrace('modbus.trace')
+            >>> client = SimpleModbusClient('localhost', trace=trace)
+            >>> client.read_input_registers(0, 10)
+            >>> trace.close()
+            >>> print(format_trace(read_trace('modbus.trace')))
+        """
+        self.path = path
+        self._file: BinaryIO | None = open(path, 'ab')
+
+    def record(self, direction: int, data: bytes | bytearray | memoryview) -> None:
+        if self._file:
+            self._file.write(_RECORD_HEADER.pack(time.monotonic_ns(), direction, len(data)))
+            self._file.write(data)
+
+    def flush(self) -> None:
+        """
+        Write buffered records to the file
+        """
+        if self._file:
+            self._file.flush()
+
+    def close(self) -> None:
+        """
+        Close the file, further records are discarded
+        """
+        if self._file:
+            self._file.close()
+            self._file = None
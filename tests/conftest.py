@@ -0,0 +1,128 @@
+import select
+import socket
+import socketserver
+import struct
+import threading
+from typing import Callable, Iterator
+import pytest
+
+
+class RegisterServer(socketserver.ThreadingTCPServer):
+    """
+    Modbus server with one register table for reads and writes
+
+    Attributes:
+        registers (list[int]): register table of all functions
+        read_write_supported (bool): if False, function 0x17 is answered
+            with an illegal function exception
+        function_codes (list[int]): function codes of the received requests
+        port (int): server port
+    """
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(('127.0.0.1', 0), _RegisterHandler)
+        self.registers = [0] * 0x10000
+        self.read_write_supported = True
+        self.function_codes: list[int] = []
+        self.port: int = self.server_address[1]
+
+
+class _RegisterHandler(socketserver.BaseRequestHandler):
+    server: RegisterServer
+
+    def handle(self) -> None:
+        registers = self.server.registers
+        while header := self.request.recv(7):
+            transaction_id, _, length, unit_id = struct.unpack('>HHHB', header)
+            pdu = self.request.recv(length - 1)
+            function_code = pdu[0]
+            self.server.function_codes.append(function_code)
+
+            if function_code in (0x03, 0x04):
+                address, count = struct.unpack('>HH', pdu[1:5])
+                response = struct.pack(f'>BB{count}H', function_code, count * 2, *registers[address:address + count])
+            elif function_code == 0x06:
+                address, value = struct.unpack('>HH', pdu[1:5])
+                registers[address] = value
+                response = pdu
+            elif function_code == 0x10:
+                address, count = struct.unpack('>HH', pdu[1:5])
+                registers[address:address + count] = struct.unpack(f'>{count}H', pdu[6:])
+                response = pdu[:5]
+            elif function_code == 0x17 and self.server.read_write_supported:
+                read_address, read_count, write_address, write_count = struct.unpack('>HHHH', pdu[1:9])
+                registers[write_address:write_address + write_count] = struct.unpack(f'>{write_count}H', pdu[10:])
+                response = struct.pack(f'>BB{read_count}H', function_code, read_count * 2,
+                                       *registers[read_address:read_address + read_count])
+            else:
+                response = bytes([function_code | 0x80, 0x01])
+
+            self.request.sendall(struct.pack('>HHHB', transaction_id, 0, len(response) + 1, unit_id) + response)
+
+
+@pytest.fixture
+def register_server() -> Iterator[RegisterServer]:
+    """
+    Running `RegisterServer` with all registers zero
+    """
+    with RegisterServer() as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        yield server
+        server.shutdown()
+
+
+def _serve_reverse_order(listener: socket.socket, max_batch: int) -> None:
+    """
+    Answer read input register requests with value = 2 * address in
+    reverse order of arrival to check transaction id matching.
+    """
+    try:
+        conn, _ = listener.accept()
+    except OSError:
+        return
+    with conn:
+        buffer = b''
+        while True:
+            batch: list[tuple[int, int]] = []
+            while len(batch) < max_batch:
+                if len(buffer) < 12 and not select.select([conn], [], [], 0.1)[0]:
+                    break
+                if len(buffer) < 12:
+                    data = conn.recv(4096)
+                    if not data:
+                        return
+                    buffer += data
+                    continue
+                transaction_id, _, _, _, _, address, _ = struct.unpack('>HHHBBHH', buffer[:12])
+                buffer = buffer[12:]
+                batch.append((transaction_id, address))
+
+            assert len(batch) <= max_batch
+            for transaction_id, address in reversed(batch):
+                conn.sendall(struct.pack('>HHHBBBH', transaction_id, 0, 5, 1, 4, 2, address * 2))
+
+
+@pytest.fixture
+def reverse_order_server() -> Iterator[Callable[[int], int]]:
+    """
+    Start servers answering up to `max_batch` pipelined read input
+    register requests in reverse order, see `_serve_reverse_order`
+
+    Returns:
+        Function starting a server for one connection and returning its port
+    """
+    listeners: list[socket.socket] = []
+
+    def start(max_batch: int) -> int:
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(1)
+        listeners.append(listener)
+        threading.Thread(target=_serve_reverse_order, args=(listener, max_batch), daemon=True).start()
+        port: int = listener.getsockname()[1]
+        return port
+
+    yield start
+    for listener in listeners:
+        listener.close()
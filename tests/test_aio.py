@@ -0,0 +1,95 @@
+import asyncio
+import struct
+from pyhoff.aio import AsyncModbusClient, AsyncBusCoupler
+from pyhoff.devices import BK9050, KL1104, KL2404, KL3202, KL4002
+
+
+async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """
+    Minimal Modbus server: input registers return 2 * address, discrete
+    inputs return alternating bits, single writes are echoed, multiple
+    register writes are confirmed and all other functions return an
+    illegal function exception.
+    """
+    try:
+        while True:
+            transaction_id, _, length, unit_id = struct.unpack('>HHHB', await reader.readexactly(7))
+            pdu = await reader.readexactly(length - 1)
+            function_code = pdu[0]
+            if function_code == 0x04:
+                address, count = struct.unpack('>HH', pdu[1:5])
+                response = bytes([4, count * 2]) + b''.join(struct.pack('>H', (address + i) * 2) for i in range(count))
+            elif function_code == 0x02:
+                address, count = struct.unpack('>HH', pdu[1:5])
+                response = bytes([2, 1, 0b01010101 if address % 2 else 0b10101010])
+            elif function_code in (0x05, 0x06):
+                response = pdu
+            elif function_code == 0x10:
+                response = pdu[:5]
+            else:
+                response = bytes([function_code | 0x80, 0x01])
+            writer.write(struct.pack('>HHHB', transaction_id, 0, len(response) + 1, unit_id) + response)
+    except asyncio.IncompleteReadError:
+        writer.close()
+
+
+async def run_client_test(port: int) -> None:
+    client = AsyncModbusClient('127.0.0.1', port, timeout=2)
+    assert await client.read_input_registers(10, 3) == [20, 22, 24]
+    assert await client.write_single_register(5, 1234)
+    assert await client.write_multiple_registers(5, [1, 2])
+    assert await client.read_coils(0, 1) is None
+    assert client.last_error == 'return error: illegal function (1)'
+    assert client.last_exception_code == 0x01
+
+    results = await asyncio.gather(*(client.read_input_registers(i, 1) for i in range(50)))
+    assert results == [[i * 2] for i in range(50)]
+    await client.close()
+
+
+async def run_bus_coupler_test(port: int) -> None:
+    couplers = [AsyncBusCoupler(BK9050, '127.0.0.1', port, timeout=2) for _ in range(10)]
+    for bk in couplers:
+        bk.add_bus_terminals(KL3202, KL4002, KL1104)
+
+    temperatures = await asyncio.gather(*(bk.select(KL3202, 0).read_temperature(2) for bk in couplers))
+    assert temperatures == [0.6] * 10
+
+    for bk in couplers:
+        assert await bk.select(KL4002, 0).set_voltage(1, 5.0)
+        assert await bk.select(KL1104, 0).read_input(2) is True
+        await bk.close()
+
+    # reading outputs back, the server does not support reading coils
+    bk = AsyncBusCoupler(BK9050, '127.0.0.1', port, [KL2404], timeout=2)
+    assert await bk.select(KL2404, 0).write_coil(1, True)
+    assert bk.bus_coupler._written_bits == {0: True}
+    assert await bk.select(KL2404, 0).read_coil(1) is None
+    assert bk.get_error() == 'return error: illegal function (1)'
+
+    # the request after the unsupported function 0x17 depends on its response
+    assert await bk.exchange_registers(0x0800, [1], 1, 3) == [2, 4, 6]
+    assert not bk.bus_coupler._read_write_supported
+    assert bk.bus_coupler._written_words == {0x0800: 1}
+    assert await bk.exchange_registers(0x0800, [1], 1, 1) == [2]
+    await bk.close()
+
+
+def test_async_client():
+    async def main() -> None:
+        server = await asyncio.start_server(handle_client, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            await run_client_test(port)
+            await run_bus_coupler_test(port)
+
+    asyncio.run(main())
+
+
+def test_async_connection_failed():
+    async def main() -> None:
+        bk = AsyncBusCoupler(BK9050, 'localhost', 11255, [KL3202], timeout=0.01)
+        assert await bk.select(KL3202, 0).read_channel_word(1, 1337) == 1337
+        assert bk.get_error() == 'connection failed'
+
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+import socket
+import time
+from pyhoff.modbus import SimpleModbusClient
+
+
+def test_circuit_breaker():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    port = listener.getsockname()[1]
+
+    client = SimpleModbusClient('127.0.0.1', port, timeout=1, circuit_breaker=True,
+                                backoff_min=0.02, backoff_max=0.05)
+
+    assert client.read_input_registers(0, 1) is None
+    assert client.last_error.startswith('connection failed')
+    assert client.breaker_state == 'open'
+
+    start = time.monotonic()
+    for _ in range(100):
+        assert client.read_input_registers(0, 1) is None
+    assert time.monotonic() - start < 0.5
+    assert client.last_error == 'connection failed (circuit breaker open)'
+
+    # server becomes reachable, background thread reconnects
+    listener.listen(1)
+    for _ in range(100):
+        if client.breaker_state == 'closed':
+            break
+        time.sleep(0.01)
+    assert client.breaker_state == 'closed'
+    assert client._socket
+
+    client.close()
+    listener.close()
+
+
+def test_probe_after_reconnect():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(('127.0.0.1', 0))
+    port = listener.getsockname()[1]
+
+    client = SimpleModbusClient('127.0.0.1', port, timeout=1, circuit_breaker=True,
+                                backoff_min=0.02, backoff_max=0.05, probe_interval=0.05)
+    assert not client.connect()
+
+    # the connection of the background thread is probed like any other
+    listener.listen(1)
+    listener.settimeout(5)
+    conn, _ = listener.accept()
+    conn.settimeout(5)
+    frame = conn.recv(12)
+    assert frame[7] == 0x03
+    assert client.breaker_state == 'closed'
+
+    client.close()
+    conn.close()
+    listener.close()
+
+
+def test_circuit_breaker_close():
+    client = SimpleModbusClient('localhost', 11255, timeout=0.001, circuit_breaker=True)
+    assert not client.connect()
+    assert client.breaker_state == 'open'
+    client.close()
+    assert client.breaker_state == 'closed'
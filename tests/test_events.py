@@ -0,0 +1,42 @@
+from pyhoff import InputEvent
+from pyhoff.devices import BK9050, KL1104, KL1408, KL3202
+from pyhoff.simulator import Simulator
+
+
+def test_input_subscriptions():
+    with Simulator() as sim:
+        layout = [KL1104, KL3202] + [KL1408] * 50
+        coupler = sim.add_coupler(BK9050, layout)
+        sim_bk = coupler.bus_coupler
+        bk = coupler.connect_bus_coupler(timeout=2)
+
+        rising: list[InputEvent] = []
+        changes: list[InputEvent] = []
+        bk.subscribe(bk.select(KL1408, 49), 8, rising.append, falling=False)
+        bk.subscribe(bk.select(KL1104), 0, changes.append)
+
+        assert bk.poll_inputs()
+        assert not bk.events
+
+        coupler.set_input_bit(sim_bk.select(KL1408, 49), 8, True)
+        coupler.set_input_bit(sim_bk.select(KL1408, 3), 1, True)
+        coupler.set_input_bit(sim_bk.select(KL1104), 2, True)
+        assert bk.poll_inputs()
+        assert [(e.terminal, e.channel, e.value) for e in rising] == [(bk.select(KL1408, 49), 8, True)]
+        assert [(e.terminal, e.channel, e.value) for e in changes] == [(bk.select(KL1104), 2, True)]
+        assert [(e.channel, e.value) for e in bk.events] == [(2, True), (1, True), (8, True)]
+
+        coupler.set_input_bit(sim_bk.select(KL1408, 49), 8, False)
+        coupler.set_input_bit(sim_bk.select(KL1104), 2, False)
+        image = bk.read_process_image()
+        assert image and image.select(KL1408, 3).read_input(1) is True
+        assert len(rising) == 1
+        assert [e.value for e in changes] == [True, False]
+        assert len(bk.events) == 5
+        assert bk.events[-1].timestamp >= bk.events[0].timestamp
+
+        bk.unsubscribe(changes.append)
+        coupler.set_input_bit(sim_bk.select(KL1104), 2, True)
+        assert bk.poll_inputs()
+        assert len(changes) == 2 and len(bk.events) == 6
+        bk.modbus.close()
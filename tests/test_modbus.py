@@ -1,4 +1,6 @@
-from pyhoff.modbus import _get_bits, _get_words, _from_bits, _from_words
+from array import array
+from pyhoff.modbus import _get_bits, _get_words, _from_bits, _from_words, \
+    _get_bits_packed, _get_words_array, _from_bits_packed
 
 
 def test_get_bits():
@@ -30,3 +32,18 @@ def test_from_words():
     expected = bytes([0x12, 0x34, 0x56, 0x78])
     result = _from_words(values)
     assert result == expected
+
+
+def test_from_bits_partial_byte():
+    values = [True, False, True, True, False, False, False, False, False, True]
+    expected = bytes([0b00001101, 0b10])
+    assert _from_bits(values) == expected
+    assert _get_bits(expected, len(values)) == values
+
+
+def test_packed_and_array_variants():
+    data = bytes([0b11101010, 0b11010101, 0xFF])
+    assert _get_bits_packed(data, 16) == 0b1101010111101010
+    assert _from_bits_packed(0b1101010111101010, 16) == data[:2]
+    assert _get_words_array(memoryview(data)) == array('H', [0xEAD5])
+    assert _from_words(array('H', [0x1234, 0x5678])) == bytes([0x12, 0x34, 0x56, 0x78])
@@ -0,0 +1,39 @@
+import struct
+from pyhoff.modbus import SimpleModbusClient, _get_words
+
+
+def test_pipelined_requests(reverse_order_server):
+    client = SimpleModbusClient('127.0.0.1', reverse_order_server(4), timeout=2, max_in_flight=4)
+
+    results: list[bytes] = []
+    futures = [client.submit(0x04, struct.pack('>HH', address, 1), results.append)
+               for address in range(10)]
+
+    assert client.flush(), client.last_error
+    assert [_get_words(f.result()[1:])[0] for f in futures] == [address * 2 for address in range(10)]
+    assert len(results) == 10
+
+    # regular requests still work on the same connection
+    assert client.read_input_registers(21, 1) == [42]
+    client.close()
+
+
+def test_pipeline_connection_failed():
+    client = SimpleModbusClient('localhost', 11255, timeout=0.001)
+    futures = [client.submit(0x04, struct.pack('>HH', address, 1)) for address in range(3)]
+
+    assert not client.flush()
+    assert all(f.result() == b'' for f in futures)
+    assert client.last_error == 'connection failed'
+
+
+def test_prepared_request(reverse_order_server):
+    client = SimpleModbusClient('127.0.0.1', reverse_order_server(1), timeout=2)
+    request = client.prepare(0x04, 7, 1)
+    for _ in range(5):
+        assert request.execute() == [14], client.last_error
+
+    # response with unexpected size
+    assert client.prepare(0x04, 7, 2).execute() is None
+    assert client.last_error == 'received frame size mismatch'
+    client.close()
@@ -0,0 +1,78 @@
+import socket
+from pyhoff.modbus import SimpleModbusClient
+from pyhoff.poller import Poller
+
+
+def test_poll_many_clients(reverse_order_server):
+    clients = [SimpleModbusClient('127.0.0.1', reverse_order_server(4), timeout=2, max_in_flight=4)
+               for _ in range(5)]
+    poller = Poller(timeout=2)
+
+    results: dict[tuple[int, int], list[int] | None] = dict()
+    for i, client in enumerate(clients):
+        for address in range(10):
+            poller.add(client.prepare(0x04, address + i), lambda words, key=(i, address): results.update({key: words}))
+
+    for _ in range(3):
+        results.clear()
+        assert poller.poll(), [c.last_error for c in clients]
+        assert results == {(i, a): [(a + i) * 2] for i in range(5) for a in range(10)}
+
+    # clients still work for regular requests
+    assert clients[0].read_input_registers(21, 1) == [42]
+    for client in clients:
+        client.close()
+
+
+def test_poll_connection_failed():
+    poller = Poller(timeout=1)
+    client = SimpleModbusClient('localhost', 11255, timeout=0.001)
+    results: list[list[int] | None] = []
+    poller.add(client.prepare(0x04, 0, 2), results.append)
+    poller.add(client.prepare(0x04, 2, 2), results.append)
+
+    assert not poller.poll()
+    assert results == [None, None]
+    assert client.last_error == 'connection failed'
+
+
+def test_poll_next_address(reverse_order_server):
+    closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    closed.bind(('127.0.0.1', 0))
+
+    # the first resolved address refuses the connection
+    client = SimpleModbusClient('127.0.0.1', reverse_order_server(4), timeout=2)
+    client._addresses = socket.getaddrinfo('127.0.0.1', client.port, socket.AF_INET, socket.SOCK_STREAM)
+    af, st, pr, name, _ = client._addresses[0]
+    client._addresses.insert(0, (af, st, pr, name, closed.getsockname()))
+    poller = Poller(timeout=2)
+    results: list[list[int] | None] = []
+    poller.add(client.prepare(0x04, 3), results.append)
+
+    assert poller.poll(), client.last_error
+    assert results == [[6]]
+    client.close()
+    closed.close()
+
+
+def test_poll_dead_coupler(reverse_order_server):
+    # accepts connections by the backlog but never answers
+    silent = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    silent.bind(('127.0.0.1', 0))
+    silent.listen(1)
+
+    alive = SimpleModbusClient('127.0.0.1', reverse_order_server(4), timeout=2)
+    dead = SimpleModbusClient('127.0.0.1', silent.getsockname()[1], timeout=2)
+    poller = Poller(timeout=0.3)
+    results: dict[SimpleModbusClient, list[int] | None] = dict()
+    for client in (alive, dead):
+        poller.add(client.prepare(0x04, 3), lambda words, c=client: results.update({c: words}))
+
+    assert not poller.poll()
+    assert results == {alive: [6], dead: None}
+    assert dead.last_error == 'poll timeout'
+
+    # the connection of the alive client is kept for regular requests
+    assert alive.read_input_registers(21, 1) == [42]
+    alive.close()
+    silent.close()
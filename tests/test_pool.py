@@ -0,0 +1,52 @@
+import time
+from pyhoff.pool import ConnectionPool
+from pyhoff.devices import BK9050, KL3202
+
+
+def test_shared_clients():
+    pool = ConnectionPool(idle_timeout=0.05)
+
+    client1 = pool.acquire('localhost', 11255, timeout=0.001)
+    client2 = pool.acquire('localhost', 11255)
+    client3 = pool.acquire('localhost', 11255, unit_id=2)
+    assert client1 is client2
+    assert client1 is not client3
+    assert pool.get_ref_count('localhost', 11255) == 2
+
+    bk = BK9050('localhost', modbus=pool.acquire('localhost', 11255))
+    bk.add_bus_terminals(KL3202)
+    assert bk.modbus is client1
+    assert bk.select(KL3202).read_channel_word(1, 1337) == 1337
+    assert bk.get_error() == 'connection failed'
+
+    for client in (client1, client2, bk.modbus):
+        pool.release(client)
+    assert pool.get_ref_count('localhost', 11255) == 0
+
+    # reacquired before idle timeout
+    assert pool.acquire('localhost', 11255) is client1
+    pool.release(client1)
+
+    time.sleep(0.2)
+    assert pool.acquire('localhost', 11255) is not client1
+    pool.close_all()
+    assert pool.get_ref_count('localhost', 11255) == 0
+
+
+def test_idle_connection_closed(register_server):
+    pool = ConnectionPool(idle_timeout=0.05)
+    client = pool.acquire('127.0.0.1', register_server.port, timeout=2)
+    register_server.registers[3] = 7
+    assert client.read_input_registers(3, 1) == [7]
+    assert client._socket
+
+    # the connection of a referenced client is closed and reopened on demand
+    deadline = time.monotonic() + 5
+    while client._socket:
+        assert time.monotonic() < deadline, 'idle connection not closed'
+        time.sleep(0.01)
+    assert pool.get_ref_count('127.0.0.1', register_server.port) == 1
+    assert client.read_input_registers(3, 1) == [7]
+
+    pool.release(client)
+    pool.close_all()
@@ -0,0 +1,123 @@
+from pyhoff import BusCoupler
+from pyhoff.devices import BK9050, WAGO_750_352, KL1104, KL2404, KL3202, KL4002, \
+    WAGO_750_1405, WAGO_750_530, WAGO_750_600
+from pyhoff.modbus import SimpleModbusClient
+from pyhoff.simulator import Simulator
+
+
+def test_process_image():
+    with Simulator() as sim:
+        coupler = sim.add_coupler(BK9050, [KL1104, KL2404, KL3202, KL4002, KL3202, KL1104])
+        sim_bk = coupler.bus_coupler
+        coupler.set_input_word(sim_bk.select(KL3202, 0), 1, 215)
+        coupler.set_input_word(sim_bk.select(KL3202, 1), 2, -12)
+        coupler.set_input_bit(sim_bk.select(KL1104, 1), 3, True)
+
+        client = SimpleModbusClient('127.0.0.1', coupler.port, timeout=2, metrics=True)
+        bk = BK9050('127.0.0.1', modbus=client)
+        bk.add_bus_terminals(KL1104, KL2404, KL3202, KL4002, KL3202, KL1104)
+        assert client.stats
+        client.stats.reset()
+
+        image = bk.read_process_image()
+        assert image
+        assert client.stats.snapshot()['requests'] == 2
+        assert image.input_bits == (False,) * 6 + (True, False)
+        assert image.source is bk
+
+        # later changes do not affect the snapshot
+        coupler.set_input_word(sim_bk.select(KL3202, 0), 1, 0)
+        assert image.select(KL3202, 0).read_temperature(1) == 21.5
+        assert image.select(KL3202, 1).read_temperature(2) == -1.2
+        assert image.select(KL1104, 1).read_input(3) is True
+        assert image.select(KL1104, 0).read_input(3) is False
+        assert client.stats.snapshot()['requests'] == 2
+
+        # terminal views of the snapshot are created once per terminal
+        assert not isinstance(image, BusCoupler)
+        assert image.select(KL3202, 1) is image.bus_terminals[4]
+        assert image.select(KL3202, 1).bus_coupler is image
+        assert bk.select(KL3202, 1).bus_coupler is bk
+
+        # outputs are not part of the process image, writes are buffered
+        assert image.select(KL2404).read_coil(1) is None
+        assert image.get_error() == 'not part of the process image'
+        assert image.select(KL2404).write_coil(2, True)
+        assert image.select(KL2404).write_coil(3, True)
+        assert image.select(KL4002).set_voltage(2, 5.0)
+        assert coupler.get_output_bit(sim_bk.select(KL2404), 2) is False
+        assert image.write_outputs()
+        assert [coupler.get_output_bit(sim_bk.select(KL2404), c) for c in range(1, 5)] == \
+            [False, True, True, False]
+        assert coupler.get_output_word(sim_bk.select(KL4002), 2) == 0x3FFF
+        assert client.stats.snapshot()['requests'] == 4
+
+        assert bk.select(KL3202).read_temperature(1) == 0
+        client.close()
+        sim.stop_background()
+        assert bk.read_process_image() is None
+
+
+def test_process_image_wago():
+    with Simulator() as sim:
+        terminals = [WAGO_750_1405, WAGO_750_530, WAGO_750_600]
+        coupler = sim.add_coupler(WAGO_750_352, terminals)
+        coupler.set_input_bit(coupler.bus_coupler.select(WAGO_750_1405), 16, True)
+        wago = coupler.connect_bus_coupler(timeout=2)
+
+        image = wago.read_process_image()
+        assert image and image.input_words == ()
+        assert image.select(WAGO_750_1405).read_input(16) is True
+        wago.modbus.close()
+
+
+def test_output_shadow():
+    with Simulator() as sim:
+        layout = [KL2404, KL4002, KL2404]
+        coupler = sim.add_coupler(BK9050, layout)
+        sim_kl2404 = coupler.bus_coupler.select(KL2404, 1)
+        client = SimpleModbusClient('127.0.0.1', coupler.port, timeout=2, metrics=True)
+        bk = BK9050('127.0.0.1', modbus=client)
+        bk.add_bus_terminals(layout)
+        assert client.stats
+        client.stats.reset()
+
+        # immediate writes
+        assert bk.select(KL2404).write_coil(1, True)
+        assert bk.select(KL2404).write_coil(1, True)
+        assert client.stats.snapshot()['requests'] == 2
+
+        bk.buffer_outputs = True
+        for _ in range(3):
+            for channel in (1, 2, 4):
+                assert bk.select(KL2404, 1).write_coil(channel, True)
+            assert bk.select(KL2404).write_coil(1, True)
+            assert bk.select(KL4002).set_voltage(2, 5.0)
+            assert bk.flush_outputs()
+
+        # coil 1 is unchanged, channels 1, 2 merged, channel 4 separate
+        # since channel 3 is unknown, later flushes skip unchanged values
+        assert client.stats.snapshot()['requests'] == 2 + 3
+        assert [coupler.get_output_bit(sim_kl2404, c) for c in range(1, 5)] == [True, True, False, True]
+        assert coupler.get_output_word(coupler.bus_coupler.select(KL4002), 2) == 0x3FFF
+
+        # channels 2 and 4 are merged with the known channel 3
+        assert bk.select(KL2404, 1).write_coil(3, False)
+        assert bk.flush_outputs()
+        assert bk.select(KL2404, 1).write_coil(2, False)
+        assert bk.select(KL2404, 1).write_coil(4, False)
+        assert bk.flush_outputs()
+        assert client.stats.snapshot()['requests'] == 5 + 2
+        assert client.stats.snapshot()['function_codes'][0x0F]['requests'] == 2
+        assert [coupler.get_output_bit(sim_kl2404, c) for c in range(1, 5)] == [True, False, False, False]
+
+        bk.invalidate_outputs()
+        assert bk.flush_outputs()
+        assert client.stats.snapshot()['requests'] == 7 + 3
+
+        # failed writes are repeated by the next flush
+        bk.select(KL2404).write_coil(2, True)
+        client.close()
+        sim.stop_background()
+        assert not bk.flush_outputs()
+        assert bk._dirty_bits == {1}
@@ -0,0 +1,44 @@
+from pyhoff.devices import BK9050, KL3202, KL4002
+
+
+def run_exchange(server, read_write_supported: bool) -> list[int]:
+    server.read_write_supported = read_write_supported
+    server.registers[0x0005] = 215
+    server.registers[0x0007] = 230
+
+    bk = BK9050('127.0.0.1', server.port, timeout=2)
+    bk.add_bus_terminals(KL4002, KL3202)
+    for _ in range(2):
+        words = bk.exchange_channel_words(bk.select(KL4002), 2, 1234, bk.select(KL3202))
+        assert words == [215, 230], bk.get_error()
+    assert server.registers[0x0803] == 1234
+
+    bk.modbus.close()
+    return server.function_codes
+
+
+def test_read_write_multiple_registers(register_server):
+    # BK9050 init: 3 single register writes
+    assert run_exchange(register_server, True) == [0x06] * 3 + [0x17] * 2
+
+
+def test_read_write_fallback(register_server):
+    assert run_exchange(register_server, False) == [0x06] * 3 + [0x17, 0x10, 0x04, 0x10, 0x04]
+
+
+def test_exchange_updates_output_shadow(register_server):
+    bk = BK9050('127.0.0.1', register_server.port, timeout=2)
+    bk.add_bus_terminals(KL4002, KL3202)
+    bk.buffer_outputs = True
+    kl4002 = bk.select(KL4002)
+
+    assert kl4002.write_channel_word(2, 100)
+    assert bk.flush_outputs()
+    assert bk.exchange_channel_words(kl4002, 2, 500, bk.select(KL3202)) is not None
+    assert register_server.registers[0x0803] == 500
+
+    # writing the value of the last flush again is a change
+    assert kl4002.write_channel_word(2, 100)
+    assert bk.flush_outputs()
+    assert register_server.registers[0x0803] == 100
+    bk.modbus.close()
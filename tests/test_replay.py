@@ -0,0 +1,47 @@
+import time
+from pyhoff.devices import BK9050, KL3202, KL4002
+from pyhoff.modbus import SimpleModbusClient
+from pyhoff.replay import ReplayModbusClient
+from pyhoff.trace import RingTrace
+
+
+def scan(bk: BK9050) -> list[float | None]:
+    bk.add_bus_terminals(KL4002, KL3202)
+    bk.select(KL4002).set_voltage(1, 5.0)
+    return [bk.select(KL3202).read_temperature(channel) for channel in (1, 2)]
+
+
+def test_record_and_replay(register_server):
+    register_server.registers[0x0005] = 215
+    register_server.registers[0x0007] = 230
+    trace = RingTrace()
+
+    client = SimpleModbusClient('127.0.0.1', register_server.port, timeout=2, trace=trace)
+    recorded = scan(BK9050('127.0.0.1', modbus=client))
+    client.close()
+
+    assert recorded == [21.5, 23.0]
+
+    client = ReplayModbusClient(trace.records())
+    assert scan(BK9050('127.0.0.1', modbus=client)) == recorded
+    assert client.position == len(client.exchanges)
+    assert not client.mismatches
+
+    # original speed
+    client = ReplayModbusClient(trace.records(), realtime=True)
+    start = time.perf_counter()
+    assert scan(BK9050('127.0.0.1', modbus=client)) == recorded
+    assert time.perf_counter() - start >= sum(rtt for _, _, rtt in client.exchanges) / 1e9
+
+    # requests are matched by content, not by position
+    client.rewind()
+    bk = BK9050('127.0.0.1', modbus=client)
+    bk.add_bus_terminals(KL4002, KL3202)
+    assert bk.select(KL3202).read_temperature(2) == 23.0
+    assert bk.select(KL3202).read_temperature(1) == 21.5
+    assert not client.mismatches
+
+    # request not part of the recording
+    client.rewind()
+    assert client.read_input_registers(0, 1) is None
+    assert len(client.mismatches) == 1
@@ -0,0 +1,81 @@
+import time
+from typing import Callable
+from pyhoff import ProcessImage
+from pyhoff.devices import BK9050, KL1104, KL2404, KL3202, KL4002
+from pyhoff.simulator import Simulator
+from pyhoff.scan import ScanEngine
+
+
+def wait_until(condition: Callable[[], bool], timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not reached'
+        time.sleep(0.005)
+
+
+def test_scan_engine():
+    with Simulator() as sim:
+        layout = [KL1104, KL2404, KL3202, KL4002]
+        coupler = sim.add_coupler(BK9050, layout)
+        sim_bk = coupler.bus_coupler
+        coupler.set_input_word(sim_bk.select(KL3202), 2, 215)
+        bk = coupler.connect_bus_coupler(timeout=2)
+
+        def logic(image: ProcessImage) -> None:
+            # copy input bits to outputs and the temperature to a voltage
+            for channel in range(1, 5):
+                image.select(KL2404).write_coil(channel, bool(image.select(KL1104).read_input(channel)))
+            image.select(KL4002).set_voltage(1, image.select(KL3202).read_temperature(2) / 10)
+            image.select(KL4002).set_voltage(2, 1.0)
+
+        engine = ScanEngine(bk, 0.01, logic)
+        assert engine.run_cycle()
+        # inputs bits and words, merged coils, KL4002 channels are not adjacent
+        assert engine.snapshot()['transactions_last'] == 2 + 1 + 2
+
+        with engine:
+            coupler.set_input_bit(sim_bk.select(KL1104), 2, True)
+            coupler.set_input_bit(sim_bk.select(KL1104), 3, True)
+            cycles = engine.snapshot()['cycles']
+            # the inputs are seen by the second cycle after setting them at the latest
+            wait_until(lambda: engine.snapshot()['cycles'] >= max(cycles + 3, 10))
+            assert engine.running
+
+        stats = engine.snapshot()
+        assert stats['failed_cycles'] == 0
+        # unchanged outputs are not written again, the changed coils
+        # are written by up to two cycles with one request each
+        assert stats['transactions_last'] == 2
+        assert 2 < stats['transactions_mean'] <= (5 + 2 * 3 + 2 * (stats['cycles'] - 3)) / stats['cycles']
+        assert stats['cycle_time_last_us'] > 0
+        assert stats['cycle_time_max_us'] >= stats['cycle_time_mean_us'] > 0
+        assert stats['jitter_max_us'] >= stats['jitter_mean_us'] >= 0
+        assert [coupler.get_output_bit(sim_bk.select(KL2404), c) for c in range(1, 5)] == \
+            [False, True, True, False]
+        assert coupler.get_output_word(sim_bk.select(KL4002), 1) == int(2.15 / 10 * 0x7FFF)
+
+        def slow(image: ProcessImage) -> None:
+            time.sleep(0.025)
+
+        engine.reset()
+        engine.add_callback(slow)
+        with engine:
+            wait_until(lambda: engine.snapshot()['cycles'] >= 3)
+        # every cycle takes longer than the period
+        assert engine.snapshot()['overruns'] >= engine.snapshot()['cycles']
+        engine.remove_callback(slow)
+
+        def failing(image: ProcessImage) -> None:
+            raise ValueError('logic error')
+
+        engine.add_callback(failing)
+        engine.start()
+        wait_until(lambda: not engine.running)
+        assert isinstance(engine.exception, ValueError)
+        engine.stop()
+
+        bk.modbus.close()
+        sim.stop_background()
+        engine.remove_callback(failing)
+        assert not engine.run_cycle()
+        assert engine.last_error
@@ -0,0 +1,122 @@
+import asyncio
+import struct
+import time
+from pyhoff.devices import BK9050, WAGO_750_352, KL1104, KL2404, KL3202, KL4002, \
+    WAGO_750_1405, WAGO_750_530, WAGO_750_600
+from pyhoff.aio import AsyncBusCoupler
+from pyhoff.simulator import Simulator, SimulatedCoupler, _WAGO_WATCHDOG_BITS
+
+
+def test_bk9050():
+    with Simulator() as sim:
+        coupler = sim.add_coupler(BK9050, [KL1104, KL2404, KL3202, KL4002])
+        sim_kl3202 = coupler.bus_coupler.select(KL3202)
+        coupler.set_input_word(sim_kl3202, 1, 215)
+        coupler.set_input_word(sim_kl3202, 2, -12)
+        coupler.set_input_bit(coupler.bus_coupler.select(KL1104), 3, True)
+
+        bk = coupler.connect_bus_coupler(timeout=2)
+        assert bk.select(KL3202).read_temperature(1) == 21.5
+        assert bk.select(KL3202).read_temperature(2) == -1.2
+        assert [bk.select(KL1104).read_input(i) for i in range(1, 5)] == [False, False, True, False]
+
+        assert bk.select(KL2404).write_coil(2, True)
+        assert bk.select(KL2404).read_coil(2)
+        assert coupler.get_output_bit(coupler.bus_coupler.select(KL2404), 2)
+
+        assert bk.select(KL4002).set_voltage(2, 5.0)
+        kl4002 = coupler.bus_coupler.select(KL4002)
+        assert coupler.get_output_word(kl4002, 2) == 0x3FFF
+        # BK9000 channel spacing 2, offset 1 and output offset 0x0800
+        assert kl4002._output_word_addresses == [0x0800 + 5, 0x0800 + 7]
+        assert bk.modbus.read_holding_registers(0x0800 + 7, 1) == [0x3FFF]
+
+        # exception responses
+        assert bk.modbus.read_input_registers(0x0700, 1) is None
+        assert bk.modbus.last_exception_code == 0x02
+        assert bk.modbus.send_modbus_data(0x05, struct.pack('>HH', 0, 0x1234))
+        assert not bk.modbus.receive_modbus_data()
+        assert bk.modbus.last_exception_code == 0x03
+        assert bk.modbus.send_modbus_data(0x2B, bytes([0x0E, 1, 0]))
+        assert not bk.modbus.receive_modbus_data()
+        assert bk.modbus.last_exception_code == 0x01
+
+        # raw responses are not overwritten by the next receive
+        assert bk.modbus.send_modbus_data(0x03, struct.pack('>HH', 0x0800 + 7, 1))
+        response = bk.modbus.receive_modbus_data()
+        assert bk.modbus.read_holding_registers(0x0800 + 5, 1) == [0]
+        assert response == bytes([2, 0x3F, 0xFF])
+
+        coupler.inject_exception(0x06)
+        assert bk.select(KL3202).read_temperature(1) == -9999.9
+        assert bk.modbus.last_error == 'return error: slave device busy (6)'
+        assert bk.select(KL3202).read_temperature(1) == 21.5
+        bk.modbus.close()
+
+
+def test_wago_and_watchdog():
+    with Simulator() as sim:
+        terminals = [WAGO_750_1405, WAGO_750_530, KL4002, WAGO_750_600]
+        coupler = sim.add_coupler(WAGO_750_352, terminals)
+        wago = coupler.connect_bus_coupler(timeout=2, watchdog=0.1)
+        assert coupler.watchdog_timeout == 0.1
+
+        # split mapping with coils at 512
+        assert wago.select(WAGO_750_530)._output_bit_addresses[0] == 512
+        assert wago.select(WAGO_750_530).write_coil(1, True)
+        assert wago.select(KL4002).write_channel_word(2, 1234)
+        assert coupler.get_output_bit(coupler.bus_coupler.select(WAGO_750_530), 1)
+        assert coupler.get_output_word(coupler.bus_coupler.select(KL4002), 2) == 1234
+
+        # all function codes trigger the watchdog
+        for _ in range(4):
+            time.sleep(0.05)
+            assert wago.select(WAGO_750_1405).read_input(1) is False
+        assert coupler.watchdog_expirations == 0
+
+        time.sleep(0.2)
+        assert wago.select(WAGO_750_530).read_coil(1) is False
+        assert coupler.watchdog_expirations == 1
+        wago.modbus.close()
+
+
+def test_wago_watchdog_function_codes():
+    assert _WAGO_WATCHDOG_BITS[0x10] == (0x1001, 15)
+    assert _WAGO_WATCHDOG_BITS[0x17] == (0x1002, 6)
+
+    coupler = SimulatedCoupler(WAGO_750_352, [KL4002])
+    coupler._registers[0x1000] = 0  # no expiration
+    coupler._registers[0x1001] = 0x8000  # function code 16
+    coupler._registers[0x1002] = 0x0001  # function code 17
+    for function_code, triggered in ((0x03, False), (0x10, True), (0x17, False)):
+        coupler._watchdog_triggered = 0
+        coupler._check_watchdog(function_code)
+        assert (coupler._watchdog_triggered > 0) == triggered
+
+    # zero masks trigger on the write functions
+    coupler._registers[0x1001] = coupler._registers[0x1002] = 0
+    for function_code, triggered in ((0x03, False), (0x10, True), (0x17, True)):
+        coupler._watchdog_triggered = 0
+        coupler._check_watchdog(function_code)
+        assert (coupler._watchdog_triggered > 0) == triggered
+
+
+def test_many_couplers_asyncio():
+    async def main() -> None:
+        sim = Simulator()
+        couplers = [sim.add_coupler(BK9050, [KL3202]) for _ in range(200)]
+        await sim.start()
+        for i, coupler in enumerate(couplers):
+            coupler.set_input_word(coupler.bus_coupler.select(KL3202), 1, i)
+
+        bks = [AsyncBusCoupler(BK9050, '127.0.0.1', c.port, timeout=5) for c in couplers]
+        for bk in bks:
+            bk.add_bus_terminals(KL3202)
+        words = await asyncio.gather(*(bk.select(KL3202).read_channel_word(1) for bk in bks))
+        assert words == list(range(200))
+
+        for bk in bks:
+            await bk.close()
+        await sim.stop()
+
+    asyncio.run(main())
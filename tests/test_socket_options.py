@@ -0,0 +1,66 @@
+import socket
+import socketserver
+import threading
+import time
+from pyhoff.modbus import SimpleModbusClient
+
+
+class CountingHandler(socketserver.BaseRequestHandler):
+    """
+    Answers every request with an illegal function exception
+    """
+    requests = 0
+
+    def handle(self) -> None:
+        while header := self.request.recv(7):
+            transaction_id = header[0:2]
+            function_code = self.request.recv(header[5] - 1)[0]
+            CountingHandler.requests += 1
+            self.request.sendall(transaction_id + bytes([0, 0, 0, 3, header[6], function_code | 0x80, 1]))
+
+
+def test_socket_options(monkeypatch):
+    resolve_calls = []
+    getaddrinfo = socket.getaddrinfo
+
+    def counting_getaddrinfo(*args, **kwargs):  # type: ignore
+        resolve_calls.append(args)
+        return getaddrinfo(*args, **kwargs)
+
+    monkeypatch.setattr(socket, 'getaddrinfo', counting_getaddrinfo)
+
+    with socketserver.ThreadingTCPServer(('127.0.0.1', 0), CountingHandler) as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        client = SimpleModbusClient('127.0.0.1', server.server_address[1], timeout=1, keepalive_idle=30)
+        assert client.connect()
+        assert client._socket
+        assert client._socket.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+        assert client._socket.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+
+        client.close()
+        assert client.connect()
+        assert len(resolve_calls) == 1
+
+        client.close()
+        server.shutdown()
+
+
+def test_probe():
+    with socketserver.ThreadingTCPServer(('127.0.0.1', 0), CountingHandler) as server:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        client = SimpleModbusClient('127.0.0.1', server.server_address[1], timeout=1, probe_interval=0.05)
+        CountingHandler.requests = 0
+        assert client.connect()
+        time.sleep(0.3)
+        assert 3 <= CountingHandler.requests <= 7
+        assert client.last_error == ''
+
+        client.close()
+        time.sleep(0.1)
+        requests = CountingHandler.requests
+        time.sleep(0.2)
+        assert CountingHandler.requests == requests
+
+        server.shutdown()
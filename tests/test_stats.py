@@ -0,0 +1,77 @@
+import time
+from pyhoff.devices import BK9050, KL3202
+from pyhoff.modbus import SimpleModbusClient
+from pyhoff.simulator import Simulator
+from pyhoff.stats import _bucket, _bucket_limit
+
+
+def test_histogram_buckets():
+    for rtt_us in list(range(200)) + [1000, 12345, 10 ** 6]:
+        index = _bucket(rtt_us)
+        assert rtt_us < _bucket_limit(index)
+        assert index == 0 or rtt_us >= _bucket_limit(index - 1)
+
+
+def test_client_metrics(register_server):
+    register_server.read_write_supported = False
+    client = SimpleModbusClient('127.0.0.1', register_server.port, timeout=2, metrics=True)
+    results = [client.read_input_registers(i, 2) for i in range(10)]
+    results += [client.write_single_register(1, 5), client.read_write_multiple_registers(0, 1, 0, [1])]
+    client.close()
+
+    assert results == [[0, 0]] * 10 + [True, None]
+    assert client.stats
+    stats = client.stats.snapshot()
+    assert stats['requests'] == stats['responses'] == 12
+    assert stats['connects'] == 1 and stats['reconnects'] == 0
+    assert stats['exceptions'] == {0x01: 1}
+    assert stats['function_codes'][0x04]['requests'] == 10
+    assert stats['function_codes'][0x17]['exceptions'] == 1
+    assert stats['bytes_sent'] == 11 * 12 + 19
+    assert stats['bytes_received'] == 10 * 13 + 12 + 9
+    assert 0 < stats['rtt_p50_us'] <= stats['rtt_p99_us']
+
+    client.stats.reset()
+    assert client.stats.snapshot()['requests'] == 0
+
+
+def test_metrics_disabled():
+    client = SimpleModbusClient('localhost', 11255, timeout=0.001)
+    assert client.stats is None
+    assert client.read_input_registers(1, 1) is None
+
+
+def test_resync_after_timeout():
+    with Simulator() as sim:
+        coupler = sim.add_coupler(BK9050, [KL3202])
+        coupler.set_input_word(coupler.bus_coupler.select(KL3202), 1, 215)
+        client = SimpleModbusClient('127.0.0.1', coupler.port, timeout=0.1, metrics=True)
+        bk = BK9050('127.0.0.1', modbus=client)
+        bk.add_bus_terminals(KL3202)
+
+        coupler.response_delay = 0.2
+        assert client.read_input_registers(1, 1) is None
+        assert client.last_error == 'receiving return frame failed'
+        time.sleep(0.3)
+
+        # the late response is discarded and the connection kept
+        coupler.response_delay = 0
+        assert bk.select(KL3202).read_temperature(1) == 21.5
+        assert client.read_input_registers(1, 1) == [215]
+
+        # a second timeout in a row closes the connection
+        coupler.response_delay = 0.2
+        assert client.read_input_registers(1, 1) is None
+        assert client.read_input_registers(1, 1) is None
+        assert client._socket is None
+        client.close()
+
+    assert client.stats
+    stats = client.stats.snapshot()
+    assert stats['stale_frames'] == 1
+    assert stats['timeouts'] == 3
+    assert stats['connects'] == 1
+    # late responses are no responses and add no round trip time samples
+    assert stats['requests'] == 3 + 5
+    assert stats['responses'] == 3 + 2
+    assert stats['rtt_p99_us'] < 150000
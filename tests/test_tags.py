@@ -0,0 +1,51 @@
+import pytest
+from pyhoff import DigitalInputTerminal
+from pyhoff.devices import BK9050, KL1104, KL2404, KL3202, KL4002
+from pyhoff.modbus import OfflineModbusClient
+from pyhoff.simulator import Simulator
+
+
+def test_compiled_layout():
+    bk = BK9050('offline', modbus=OfflineModbusClient())
+    bk.add_bus_terminals([KL1104, KL3202, KL2404, KL3202])
+
+    assert bk.select(KL3202, 1) is bk.bus_terminals[3]
+    assert bk.select(DigitalInputTerminal) is bk.bus_terminals[0]
+    assert bk.channel(KL3202, 1, 2) == (bk.bus_terminals[3], 2)
+    with pytest.raises(AssertionError):
+        bk.channel(KL3202, 1, 3)
+
+    assert list(bk.input_bit_addresses) == [0, 1, 2, 3]
+    assert list(bk.output_bit_addresses) == [0, 1, 2, 3]
+    assert list(bk.input_word_addresses) == [1, 3, 5, 7]
+    assert list(bk.output_word_addresses) == []
+
+    # selections are updated when terminals are added
+    bk.add_bus_terminals(KL1104, KL3202, KL4002)
+    assert bk.select(KL3202, 2) is bk.bus_terminals[5]
+    assert bk.select(KL1104, 1) is bk.bus_terminals[4]
+    assert list(bk.input_bit_addresses) == [0, 1, 2, 3, 4, 5, 6, 7]
+    assert list(bk.input_word_addresses) == [1, 3, 5, 7, 9, 11]
+    assert list(bk.output_word_addresses) == [0x080D, 0x080F]
+
+    assert bk.add_tag('boiler.temp', KL3202, 1, 2) == (bk.bus_terminals[3], 2)
+    bk.add_tag('pump', KL2404, 0, 1)
+    assert bk.tag('boiler.temp') == (bk.bus_terminals[3], 2)
+    assert bk.tags == ['boiler.temp', 'pump']
+    with pytest.raises(KeyError):
+        bk.tag('missing')
+
+
+def test_tags_in_process_image():
+    with Simulator() as sim:
+        coupler = sim.add_coupler(BK9050, [KL3202, KL3202])
+        coupler.set_input_word(coupler.bus_coupler.select(KL3202, 1), 2, 456)
+        bk = coupler.connect_bus_coupler(timeout=2)
+        bk.add_tag('boiler.temp', KL3202, 1, 2)
+
+        image = bk.read_process_image()
+        assert image
+        terminal, channel = image.tag('boiler.temp')
+        assert terminal is image.select(KL3202, 1) and terminal.bus_coupler is image
+        assert terminal.read_temperature(channel) == 45.6
+        bk.modbus.close()
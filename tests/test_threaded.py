@@ -0,0 +1,77 @@
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from pyhoff.devices import BK9050, KL3202, KL4002
+from pyhoff.simulator import Simulator
+from pyhoff.threaded import ThreadedModbusClient
+
+
+def wait_until(condition: Callable[[], bool], timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not reached'
+        time.sleep(0.005)
+
+
+def test_concurrent_callers():
+    with Simulator() as sim:
+        coupler = sim.add_coupler(BK9050, [KL3202] * 8 + [KL4002])
+        for i, terminal in enumerate(coupler.bus_coupler.bus_terminals[:8]):
+            coupler.set_input_word(terminal, 1, i * 10)
+            coupler.set_input_word(terminal, 2, i * 10 + 1)
+        coupler.response_delay = 0.05
+
+        client = ThreadedModbusClient('127.0.0.1', coupler.port, timeout=2, max_in_flight=16)
+        bk = BK9050('127.0.0.1', modbus=client)
+        bk.add_bus_terminals([KL3202] * 8 + [KL4002])
+
+        def read(i: int) -> float:
+            return bk.select(KL3202, i // 2).read_temperature(i % 2 + 1)
+
+        with ThreadPoolExecutor(16) as executor:
+            temperatures = list(executor.map(read, range(16)))
+
+        assert temperatures == [(i // 2 * 10 + i % 2) / 10 for i in range(16)]
+        # requests of all threads share one pipelined connection
+        assert coupler.max_outstanding > 1
+
+        # errors are reported to the calling thread only
+        assert bk.modbus.read_input_registers(0x0700, 1) is None
+        assert bk.modbus.last_exception_code == 0x02
+        with ThreadPoolExecutor(1) as executor:
+            assert executor.submit(lambda: bk.modbus.last_exception_code).result() == 0
+
+        assert client.prepare(0x04, 1, 1).execute() == [0]
+        assert bk.select(KL4002).set_voltage(1, 5.0)
+        client.stop()
+        assert bk.select(KL3202).read_channel_word(1, 1337) == 1337
+        assert bk.get_error() == 'client stopped'
+
+
+def test_thread_local_pipeline_and_timeout():
+    with Simulator() as sim:
+        coupler = sim.add_coupler(BK9050, [KL3202])
+        coupler.set_input_word(coupler.bus_coupler.select(KL3202), 1, 215)
+        client = ThreadedModbusClient('127.0.0.1', coupler.port, timeout=0.2, metrics=True)
+
+        # each thread flushes only the requests it submitted
+        def submit_and_flush(address: int) -> list[bytes]:
+            futures = [client.submit(0x04, struct.pack('>HH', address, 1)) for _ in range(5)]
+            assert client.flush(), client.last_error
+            return [f.result() for f in futures]
+
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(submit_and_flush, [0, 1, 0, 1]))
+        assert results == [[bytes([2, 0, 0])] * 5, [bytes([2, 0, 215])] * 5] * 2
+
+        # a lost response expires while other responses arrive
+        coupler.drop_responses()
+        with ThreadPoolExecutor(1) as executor:
+            lost = executor.submit(client.read_input_registers, 1, 1)
+            wait_until(lambda: not coupler._dropped_responses)
+            assert client.stats
+            wait_until(lambda: client.read_input_registers(1, 1) == [215] and client.stats.timeouts == 1)
+            assert lost.result() is None
+        assert client.read_input_registers(1, 1) == [215]
+        client.stop()
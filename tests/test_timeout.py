@@ -0,0 +1,73 @@
+import time
+from pyhoff.devices import BK9050, KL3202
+from pyhoff.modbus import SimpleModbusClient
+from pyhoff.simulator import Simulator
+
+
+def test_adaptive_timeout():
+    with Simulator() as sim:
+        coupler = sim.add_coupler(BK9050, [KL3202])
+        coupler.set_input_word(coupler.bus_coupler.select(KL3202), 1, 215)
+        client = SimpleModbusClient('127.0.0.1', coupler.port, timeout=2,
+                                    adaptive_timeout=True, timeout_min=0.05)
+        assert client.response_timeout == 2
+
+        coupler.response_delay = 0.01
+        for _ in range(20):
+            assert client.read_input_registers(1, 1) == [215]
+        # the measured round trip can be slightly shorter than the delay timer
+        assert 0.005 <= client.srtt < 0.1
+        assert 0.05 <= client.response_timeout < 0.5
+        assert client._socket and client._socket.gettimeout() == client.response_timeout
+
+        # a lost response stalls the caller only for the adaptive timeout
+        response_timeout = client.response_timeout
+        coupler.response_delay = 1
+        start = time.monotonic()
+        assert client.read_input_registers(1, 1) is None
+        assert time.monotonic() - start < 0.5
+        assert client.response_timeout == min(response_timeout * 2, 2)
+        client.close()
+
+        client = SimpleModbusClient('127.0.0.1', coupler.port, timeout=0.5)
+        coupler.response_delay = 0
+        assert client.read_input_registers(1, 1) == [215]
+        assert client.response_timeout == 0.5 and client.srtt == 0
+        client.close()
+
+
+def test_retry_policy():
+    with Simulator() as sim:
+        coupler = sim.add_coupler(BK9050, [KL3202])
+        coupler.set_input_word(coupler.bus_coupler.select(KL3202), 1, 215)
+        client = SimpleModbusClient('127.0.0.1', coupler.port, timeout=0.1, metrics=True,
+                                    retries=2, busy_backoff=0.02)
+
+        # busy requests were not executed and are retried for all functions
+        coupler.inject_exception(0x06, 2)
+        start = time.monotonic()
+        assert client.write_multiple_registers(0x0800, [1, 2])
+        assert time.monotonic() - start >= 0.02 + 0.04
+        coupler.inject_exception(0x06, 3)
+        assert client.prepare(0x04, 1, 1).execute() is None
+        assert client.last_exception_code == 0x06
+        coupler.inject_exception(0x02)
+        assert client.read_input_registers(1, 1) is None
+        assert client.stats and client.stats.retries == 4
+
+        # lost responses are only retried for idempotent functions
+        coupler.response_delay = 0.35
+        assert client.write_multiple_registers(0x0800, [1, 2]) is False
+        assert client.stats.retries == 4
+        time.sleep(0.3)
+        assert client.read_input_registers(1, 1) is None
+        assert client.stats.retries == 6
+
+        # no retry that can not finish before the deadline
+        with client.deadline(0.15):
+            assert client.read_input_registers(1, 1) is None
+        assert client.stats.retries == 6
+
+        coupler.response_delay = 0
+        assert client.read_input_registers(1, 1) == [215]
+        client.close()
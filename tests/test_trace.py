@@ -0,0 +1,39 @@
+import os
+import tempfile
+from pyhoff.modbus import SimpleModbusClient
+from pyhoff.trace import RingTrace, FileTrace, read_trace, format_trace, TRACE_SEND, TRACE_RECEIVE
+
+
+def test_ring_and_file_trace(register_server):
+    register_server.registers[3] = 0x1234
+    ring = RingTrace(capacity=4)
+    path = os.path.join(tempfile.mkdtemp(), 'modbus.trace')
+    file_trace = FileTrace(path)
+
+    client = SimpleModbusClient('127.0.0.1', register_server.port, timeout=2, trace=ring)
+    results = [client.read_input_registers(3, 1) for _ in range(3)]
+    client.trace = file_trace
+    results.append(client.read_input_registers(3, 1))
+    client.close()
+    file_trace.close()
+
+    assert results == [[0x1234]] * 4
+
+    # oldest records are dropped
+    records = ring.records()
+    assert [direction for _, direction, _ in records] == [TRACE_SEND, TRACE_RECEIVE] * 2
+    assert records[0][0] <= records[1][0]
+    assert records[0][2][6:] == bytes([1, 4, 0, 3, 0, 1])
+    assert records[1][2][6:] == bytes([1, 4, 2, 0x12, 0x34])
+    assert ring.dump().splitlines()[1].endswith('<- ' + records[1][2].hex(' '))
+
+    file_records = read_trace(path)
+    assert len(file_records) == 2
+    assert file_records[1][2][6:] == bytes([1, 4, 2, 0x12, 0x34])
+    assert '->' in format_trace(file_records)
+
+
+def test_debug_prints_frames(capsys):
+    client = SimpleModbusClient('localhost', 11255, timeout=0.001, debug=True)
+    client.trace.record(TRACE_SEND, bytes([1, 2]))  # type: ignore[union-attr]
+    assert capsys.readouterr().out == '-> Send:     0x1 0x2\n'
@@ -0,0 +1,41 @@
+import struct
+from pyhoff.devices import WAGO_750_352, WAGO_750_1405, WAGO_750_530, KL4002
+from pyhoff.modbus import SimpleModbusClient
+from pyhoff.simulator import Simulator
+
+
+def test_wago_udp():
+    with Simulator() as sim:
+        coupler = sim.add_coupler(WAGO_750_352, [WAGO_750_1405, WAGO_750_530, KL4002])
+        coupler.set_input_bit(coupler.bus_coupler.select(WAGO_750_1405), 2, True)
+
+        wago = WAGO_750_352('127.0.0.1', coupler.port, timeout=0.2, udp=True)
+        wago.add_bus_terminals(WAGO_750_1405, WAGO_750_530, KL4002)
+        assert wago.modbus.udp
+        assert wago.select(WAGO_750_1405).read_input(2) is True
+        assert wago.select(WAGO_750_530).write_coil(3, True)
+        assert wago.select(KL4002).write_channel_word(1, 4321)
+        assert wago.select(KL4002).read_channel_word(1) == 4321
+        assert coupler.get_output_bit(coupler.bus_coupler.select(WAGO_750_530), 3)
+
+        # lost requests are retransmitted
+        coupler.drop_datagrams(2)
+        assert wago.select(WAGO_750_1405).read_input(2) is True
+        coupler.drop_datagrams(3)
+        assert wago.select(WAGO_750_1405).read_input(2) is None
+        assert wago.get_error() == 'receiving return frame failed'
+        assert wago.select(WAGO_750_1405).read_input(2) is True
+        wago.modbus.close()
+
+
+def test_udp_pipelining():
+    with Simulator() as sim:
+        coupler = sim.add_coupler(WAGO_750_352, [KL4002] * 10)
+        client = SimpleModbusClient('127.0.0.1', coupler.port, timeout=0.2, udp=True, max_in_flight=4)
+        assert client.write_multiple_registers(0, list(range(100, 120)))
+
+        coupler.drop_datagrams(1)
+        futures = [client.submit(0x03, struct.pack('>HH', address, 1)) for address in range(20)]
+        assert client.flush(), client.last_error
+        assert [f.result() for f in futures] == [struct.pack('>BH', 2, 100 + a) for a in range(20)]
+        client.close()